@@ -0,0 +1,37 @@
+import argparse
+import logging
+import sys
+import pandas as pd
+from config.watchlist import WATCHLIST
+from database.db_manager import DBManager
+from core.backtest import Backtester
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the built-in strategies on stored daily candles.")
+    parser.add_argument("symbols", nargs="*", help="Symbols to test (default: WATCHLIST)")
+    parser.add_argument("--from-date", help="First candle date (YYYY-MM-DD)")
+    parser.add_argument("--trades", help="Write every simulated trade to this CSV file")
+    args = parser.parse_args()
+
+    db = DBManager()
+    db.init_db()
+    report = Backtester().run_db(db, args.symbols or WATCHLIST, from_date=args.from_date)
+
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.4f}".format):
+        print("\n=== By Strategy ===")
+        print(report.by_strategy)
+        print("\n=== By Symbol ===")
+        print(report.by_symbol)
+
+    if args.trades:
+        report.trades.to_csv(args.trades, index=False)
+        print(f"\nTrades written to {args.trades}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Single-process vs process-pool indicator recompute (core/parallel_analysis.py).
+
+A synthetic panel of --symbols x --days bars is run through strategy.compute_indicators in-process
+and through compute_indicators_parallel with each --workers count (best of --repeat runs, pool
+start-up included). Every parallel result is checked to be identical to the in-process one
+(exit code 1 otherwise).
+
+    python benchmarks/analysis_bench.py --symbols 900 --days 750 --workers 2,4,8,16
+    python benchmarks/analysis_bench.py --snapshot   # latest_indicators (analyze_batch) instead of all bars
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def best_of(repeat: int, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-process vs process-pool indicator recompute.")
+    parser.add_argument("--symbols", type=int, default=900, help="Symbols in the panel (default: 900, about the IDX listing)")
+    parser.add_argument("--days", type=int, default=750, help="Business days per symbol (default: 750, about 3 years)")
+    parser.add_argument("--workers", default=f"2,4,{os.cpu_count() or 1}", help="Comma-separated process counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per setup; the best one counts")
+    parser.add_argument("--snapshot", action="store_true", help="Benchmark latest_indicators (last bar per symbol)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    import pandas as pd
+    from benchmarks.synthetic import candles, make_symbols
+    from core import parallel_analysis
+    from core.strategy import compute_indicators
+
+    symbols = make_symbols(args.symbols)
+    panel = pd.concat([pd.DataFrame(candles(symbol, days=args.days)).assign(symbol=symbol) for symbol in symbols],
+                      ignore_index=True).sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+    print(f"Panel: {len(symbols)} symbols x {args.days} days = {len(panel)} bars, {os.cpu_count()} CPUs")
+
+    if args.snapshot:
+        serial = lambda: compute_indicators(panel).groupby("symbol", sort=False).tail(1)
+        parallel = lambda workers: parallel_analysis.latest_indicators(panel, workers)
+    else:
+        serial = lambda: compute_indicators(panel, point_in_time=True)
+        parallel = lambda workers: parallel_analysis.compute_indicators_parallel(panel, point_in_time=True, workers=workers)
+
+    # Force the requested process counts: the row threshold is for production, not for this comparison
+    parallel_analysis.ANALYSIS_MIN_ROWS_PER_WORKER = 1
+    baseline_s, expected = best_of(args.repeat, serial)
+    results = [{"workers": 1, "seconds": round(baseline_s, 3), "speedup": 1.0, "identical": True}]
+    print(f"  1 process : {baseline_s:7.2f}s")
+
+    for workers in (int(w) for w in args.workers.split(",") if w.strip()):
+        if workers <= 1:
+            continue
+        seconds, frame = best_of(args.repeat, lambda: parallel(workers))
+        try:
+            pd.testing.assert_frame_equal(expected, frame, check_exact=True)
+            identical = True
+        except AssertionError:
+            identical = False
+        results.append({"workers": workers, "seconds": round(seconds, 3),
+                        "speedup": round(baseline_s / seconds, 2), "identical": identical})
+        print(f"{workers:>3} processes: {seconds:7.2f}s  x{baseline_s / seconds:5.2f}" + ("" if identical else "  RESULTS DIFFER"))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"symbols": len(symbols), "days": args.days, "bars": len(panel), "cpus": os.cpu_count(),
+                       "snapshot": args.snapshot, "results": results}, f, indent=2)
+    if not all(result["identical"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Circuit breaker transitions (core/provider_health.py) on a fake clock.
+
+Replays the races the fetch pipeline produces: calls admitted before a trip that report back
+during the cooldown (other fetch workers, the losing GoAPI call of a hedged request) or while
+the half-open probe is in flight. Only the probe may close or re-open the circuit; every other
+outcome just feeds the health window. Exit code 1 on any unexpected transition.
+
+    python benchmarks/breaker_check.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+COOLDOWN = 60.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def tripped_health(clock: FakeClock):
+    """Two calls admitted, the first one fails and trips the breaker; the second is still in flight."""
+    from core.provider_health import ProviderHealth
+    health = ProviderHealth("goapi", failures=1, cooldown=COOLDOWN, clock=clock)
+    health.allow()
+    health.allow()
+    clock.now += 0.5
+    health.record_failure(0.5)
+    return health
+
+
+def scenarios():
+    """name -> function(clock) returning a list of failed expectations."""
+    from core.provider_health import CLOSED, HALF_OPEN, OPEN
+
+    def expect(problems, label, got, wanted):
+        if got != wanted:
+            problems.append(f"{label}: {got!r}, expected {wanted!r}")
+
+    def late_success_while_open(clock):
+        problems = []
+        health = tripped_health(clock)
+        clock.now += 1.0
+        expect(problems, "record_success() of the call started before the trip", health.record_success(1.5), False)
+        expect(problems, "state", health.state, OPEN)
+        expect(problems, "allow() during the cooldown", health.allow(), False)
+        return problems
+
+    def late_outcomes_during_probe(clock):
+        problems = []
+        health = tripped_health(clock)
+        clock.now += COOLDOWN
+        expect(problems, "allow() after the cooldown (probe)", health.allow(), True)
+        expect(problems, "allow() while the probe is in flight", health.allow(), False)
+        clock.now += 0.2
+        expect(problems, "record_failure() of a call started before the trip", health.record_failure(COOLDOWN + 0.7), False)
+        expect(problems, "record_success() of a call started before the trip", health.record_success(COOLDOWN + 0.7), False)
+        expect(problems, "state", health.state, HALF_OPEN)
+        expect(problems, "record_success() of the probe", health.record_success(0.2), True)
+        expect(problems, "state", health.state, CLOSED)
+        expect(problems, "trips", health.trips, 1)
+        return problems
+
+    def failed_probe(clock):
+        problems = []
+        health = tripped_health(clock)
+        clock.now += COOLDOWN
+        health.allow()
+        clock.now += 0.3
+        expect(problems, "record_failure() of the probe", health.record_failure(0.3), True)
+        expect(problems, "state", health.state, OPEN)
+        expect(problems, "trips", health.trips, 2)
+        return problems
+
+    def lost_probe(clock):
+        problems = []
+        health = tripped_health(clock)
+        clock.now += COOLDOWN
+        health.allow()
+        clock.now += COOLDOWN
+        expect(problems, "allow() once the probe has been silent for a cooldown", health.allow(), True)
+        return problems
+
+    return {
+        "late success while open": late_success_while_open,
+        "late outcomes during the probe": late_outcomes_during_probe,
+        "failed probe": failed_probe,
+        "probe that never reports": lost_probe,
+    }
+
+
+def main():
+    failures = []
+    for name, scenario in scenarios().items():
+        problems = scenario(FakeClock())
+        print(f"{name:<32} {'ok' if not problems else 'FAIL'}")
+        failures.extend(f"{name}: {problem}" for problem in problems)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("Circuit breaker transitions as expected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Import-time regression guard.
+
+Each entry module is imported in a fresh interpreter and the import itself is timed (best of
+--repeat runs; the whole process time is reported alongside). The run fails (exit code 1) when an import exceeds its budget or loads a heavy
+dependency that should stay lazy.
+
+    python benchmarks/import_time.py [--repeat 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ["pandas", "numpy", "pandas_ta", "numba", "yfinance", "sqlmodel", "sqlalchemy", "requests", "pyarrow"]
+
+# module -> (import budget in ms, modules that must not be imported)
+CASES = {
+    "main": (50, HEAVY),
+    "status": (50, HEAVY),
+    "config.settings": (20, HEAVY),
+    "core.pipeline": (50, HEAVY),
+    "core.strategy": (1500, ["pandas_ta", "numba", "yfinance"]),
+    "core.data_provider": (2500, ["pandas_ta", "numba", "yfinance"]),
+}
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(set(name.split(".")[0] for name in sys.modules))}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    best, modules = None, []
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - start
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = {"seconds": result["seconds"], "wall": wall}
+        modules = result["modules"]
+    return {**best, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard import times of the entry points.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results, failures = {}, []
+    for module, (budget_ms, forbidden) in CASES.items():
+        result = measure(module, args.repeat)
+        import_ms = 1000 * result["seconds"]
+        leaked = [name for name in forbidden if name in result["modules"]]
+        ok = import_ms <= budget_ms and not leaked
+        results[module] = {"import_ms": round(import_ms, 1), "process_ms": round(1000 * result["wall"], 1),
+                           "budget_ms": budget_ms, "leaked": leaked, "ok": ok}
+        print(f"{module:<20} {import_ms:8.1f} ms (budget {budget_ms} ms, process {1000 * result['wall']:.0f} ms)"
+              + (f"  LEAKED: {', '.join(leaked)}" if leaked else "") + ("" if ok else "  FAIL"))
+        if not ok:
+            failures.append(module)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        print(f"Import-time regressions: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
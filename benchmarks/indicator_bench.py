@@ -0,0 +1,140 @@
+"""
+core/indicators.py kernels vs pandas_ta: numerical equivalence and speed.
+
+Equivalence: EMA 200/50/20, RSI 14, ATR 14 and SMA 20 are compared per symbol on a corpus of
+synthetic histories shaped like IDX daily candles (random-walk OHLCV, breakout last bars, a few
+flat/zero-range bars, lengths around every warm-up edge). The 2-D kernels must also give the same
+rows as the 1-D ones with the histories right-aligned in one (symbols x time) matrix.
+Any difference above --rtol (or a NaN mismatch) fails the run with exit code 1.
+
+Speed: best of --repeat runs per indicator, pandas_ta on one Series vs the 1-D kernel, and
+pandas_ta in a loop over all symbols vs one 2-D kernel call.
+
+    poetry install --with bench   # pandas_ta, the reference implementation
+    python benchmarks/indicator_bench.py [--symbols 300] [--days 750] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Lengths around the warm-up edges of every indicator, then longer histories
+EDGE_LENGTHS = [1, 2, 5, 14, 15, 16, 19, 20, 21, 49, 50, 51, 199, 200, 201]
+
+
+def best_of(repeat: int, fn) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def corpus(count: int, days: int):
+    """{symbol: column arrays}: edge lengths first, the rest `days` long; every 7th gets flat bars."""
+    from benchmarks.synthetic import candles, make_symbols
+    histories = {}
+    for index, symbol in enumerate(make_symbols(count)):
+        length = EDGE_LENGTHS[index] if index < len(EDGE_LENGTHS) else days
+        data = {key: value.astype(float) for key, value in candles(symbol, days=length).items() if key != "date"}
+        if index % 7 == 0 and length > 3:
+            # Suspended / limit-locked days: open = high = low = close, unchanged close
+            for key in ("open", "high", "low", "close"):
+                data[key][1:3] = data["close"][0]
+        histories[symbol] = data
+    return histories
+
+
+def cases(ind, ta):
+    """name -> (kernel(data), pandas_ta(frame))"""
+    return {
+        "ema_200": (lambda d: ind.ema(d["close"], 200), lambda f: ta.ema(f["close"], length=200)),
+        "ema_50": (lambda d: ind.ema(d["close"], 50), lambda f: ta.ema(f["close"], length=50)),
+        "ema_20": (lambda d: ind.ema(d["close"], 20), lambda f: ta.ema(f["close"], length=20)),
+        "rsi_14": (lambda d: ind.rsi(d["close"], 14), lambda f: ta.rsi(f["close"], length=14)),
+        "atr_14": (lambda d: ind.atr(d["high"], d["low"], d["close"], 14),
+                   lambda f: ta.atr(f["high"], f["low"], f["close"], length=14)),
+        "sma_20": (lambda d: ind.sma(d["volume"], 20), lambda f: ta.sma(f["volume"], length=20)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy indicator kernels vs pandas_ta: equivalence and speed.")
+    parser.add_argument("--symbols", type=int, default=300, help="Symbols in the corpus (default: 300)")
+    parser.add_argument("--days", type=int, default=750, help="History length of the non-edge symbols (default: 750)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per timing; the best one counts")
+    parser.add_argument("--rtol", type=float, default=1e-9, help="Allowed relative difference (default: 1e-9)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        import pandas_ta as ta
+    except ImportError:
+        sys.exit("This benchmark compares against pandas_ta, which is not a runtime dependency: "
+                 "poetry install --with bench (or pip install pandas-ta)")
+    import numpy as np
+    import pandas as pd
+    from core import indicators
+
+    histories = corpus(max(args.symbols, len(EDGE_LENGTHS) + 1), args.days)
+    frames = {symbol: pd.DataFrame(data) for symbol, data in histories.items()}
+    width = max(len(data["close"]) for data in histories.values())
+
+    def matrix(key: str) -> np.ndarray:
+        values = np.full((len(histories), width), np.nan)
+        for row, data in enumerate(histories.values()):
+            values[row, width - len(data[key]):] = data[key]
+        return values
+
+    columns = {key: matrix(key) for key in ("open", "high", "low", "close", "volume")}
+    failures, results = [], {}
+    print(f"Corpus: {len(histories)} symbols, up to {width} bars")
+    print(f"{'indicator':<9} {'max rel diff':>12} {'pandas_ta 1-D':>14} {'kernel 1-D':>11} {'x':>6}"
+          f" {'pandas_ta loop':>15} {'kernel 2-D':>11} {'x':>6}")
+
+    for name, (kernel, reference) in cases(indicators, ta).items():
+        worst = 0.0
+        stacked = kernel(columns)
+        for row, (symbol, data) in enumerate(histories.items()):
+            ours, theirs = kernel(data), reference(frames[symbol])
+            theirs = np.full(len(ours), np.nan) if theirs is None else theirs.to_numpy(dtype=float)
+            if not np.array_equal(np.isnan(ours), np.isnan(theirs)):
+                failures.append(f"{name} {symbol} ({len(ours)} bars): NaN positions differ")
+                continue
+            if not np.array_equal(stacked[row, width - len(ours):], ours, equal_nan=True):
+                failures.append(f"{name} {symbol} ({len(ours)} bars): 2-D row differs from 1-D")
+            valid = ~np.isnan(ours)
+            if valid.any():
+                worst = max(worst, float(np.max(np.abs(ours[valid] - theirs[valid]) / np.maximum(1.0, np.abs(theirs[valid])))))
+        if worst > args.rtol:
+            failures.append(f"{name}: max relative difference {worst:.2e} > {args.rtol:.0e}")
+
+        symbol = next(s for s, data in histories.items() if len(data["close"]) == width)
+        one_ta = best_of(args.repeat, lambda: reference(frames[symbol]))
+        one_kernel = best_of(args.repeat, lambda: kernel(histories[symbol]))
+        all_ta = best_of(max(1, args.repeat // 2), lambda: [reference(frame) for frame in frames.values()])
+        all_kernel = best_of(args.repeat, lambda: kernel(columns))
+        results[name] = {"max_rel_diff": worst, "pandas_ta_1d_ms": 1000 * one_ta, "kernel_1d_ms": 1000 * one_kernel,
+                         "pandas_ta_loop_ms": 1000 * all_ta, "kernel_2d_ms": 1000 * all_kernel}
+        print(f"{name:<9} {worst:>12.1e} {1000 * one_ta:>12.3f}ms {1000 * one_kernel:>9.3f}ms {one_ta / one_kernel:>6.1f}"
+              f" {1000 * all_ta:>13.1f}ms {1000 * all_kernel:>9.1f}ms {all_ta / all_kernel:>6.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"symbols": len(histories), "bars": width, "results": results, "failures": failures}, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("All kernels match pandas_ta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Offline end-to-end benchmark of main.main().
+
+The stub services (benchmarks/stub_services.py) run in this process; every run of main.main()
+happens in a fresh worker process pointed at them, with its own temporary database, so nothing
+touches the network or the real market_data.db. For each universe size two runs are timed:
+- cold: empty database, every symbol's history is seeded through /historical
+- warm: the next run on the same database (bulk daily append through /prices)
+
+Per run the worker reports the whole main.main() wall time and, per stage, the number of calls,
+the summed call time (busy_s, summed across worker threads) and first-start-to-last-end span (span_s):
+fetch (DataProvider network calls), upsert (DBManager.upsert_candles), analyze (analyze_state),
+prefilter (universe mode), ai (AIEngine) and notify (signal emit + Telegram sendMessage).
+A run fails (and so does the benchmark) when it logs an ERROR or analyzes fewer symbols than the
+scanned ones with stored history, so a broken pipeline cannot pass as a fast one. Request-failure
+errors of a service with an --error-rate are expected and only counted (expected_errors).
+yfinance fallbacks are answered from the same synthetic data, so an error rate that trips the
+GoAPI circuit breaker stays offline too.
+
+    python benchmarks/pipeline_bench.py --sizes 16,256,1024 --json results.json
+    python benchmarks/pipeline_bench.py --save-baseline baseline.json
+    python benchmarks/pipeline_bench.py --baseline baseline.json   # exit code 1 on regression
+    python benchmarks/pipeline_bench.py --latency deepseek=800 --error-rate goapi=0.02 --env CANDLE_BACKEND=parquet
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+STAGES = ("fetch", "upsert", "analyze", "prefilter", "ai", "notify")
+PHASES = ("cold", "warm")
+
+# Service latencies (ms) in the ballpark of the real APIs; override with --latency
+DEFAULT_LATENCY = {"goapi": 15.0, "deepseek": 300.0, "telegram": 30.0}
+
+# Settings for every worker (before --env overrides). The Telegram rate limit is lifted so the notify
+# stage measures delivery rather than the 1 msg/s pacing.
+BENCH_ENV = {
+    "GOAPI_KEY": "bench", "DEEPSEEK_API_KEY": "bench",
+    "TELEGRAM_BOT_TOKEN": "bench", "TELEGRAM_CHAT_ID": "1",
+    "TELEGRAM_RATE_PER_SEC": "1000", "TELEGRAM_BURST": "1000",
+    "SCAN_UNIVERSE": "false",
+}
+
+# ERROR records a service's injected failures explain: service -> [(logger, message prefixes)]
+EXPECTED_ERRORS = {
+    "goapi": [("core.goapi_client", ("API ", "GoAPI ")), ("core.data_provider", ("GoAPI ",))],
+    "deepseek": [("core.ai_engine", ("AI Request Failed", "AI Batch Request Failed"))],
+    "telegram": [("core.notifier", ("Failed to send Telegram alert",))],
+}
+
+
+class StageTimer:
+    """Thread-safe per-stage call timing. Nested calls of the same stage on one thread count once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {stage: {"calls": 0, "busy_s": 0.0, "start": None, "end": None} for stage in STAGES}
+
+    def wrap(self, owner, name: str, stage: str):
+        """Replace owner.name with a timed version (class attribute, so every instance is timed)."""
+        original = getattr(owner, name)
+        timer = self
+
+        def timed(*args, **kwargs):
+            depth = getattr(timer._local, stage, 0)
+            if depth:
+                return original(*args, **kwargs)
+            setattr(timer._local, stage, 1)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                setattr(timer._local, stage, 0)
+                timer._record(stage, start, end)
+
+        timed.__name__ = getattr(original, "__name__", name)
+        setattr(owner, name, timed)
+
+    def _record(self, stage: str, start: float, end: float):
+        with self._lock:
+            stat = self.stats[stage]
+            stat["calls"] += 1
+            stat["busy_s"] += end - start
+            stat["start"] = start if stat["start"] is None else min(stat["start"], start)
+            stat["end"] = end if stat["end"] is None else max(stat["end"], end)
+
+    def report(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                stage: {"calls": stat["calls"], "busy_s": round(stat["busy_s"], 4),
+                        "span_s": round(stat["end"] - stat["start"], 4) if stat["calls"] else 0.0}
+                for stage, stat in self.stats.items()
+            }
+
+
+# --- Worker (one main.main() run in a fresh process) ---
+class _ErrorLog(logging.Handler):
+    """Collects ERROR (and worse) records of the run, except those explained by the failing services."""
+
+    def __init__(self, failing_services: List[str]):
+        super().__init__(level=logging.ERROR)
+        self.expected = [pattern for service in failing_services for pattern in EXPECTED_ERRORS.get(service, [])]
+        self.messages: List[str] = []
+        self.expected_count = 0
+
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage()
+        if any(record.name == name and message.startswith(prefixes) for name, prefixes in self.expected):
+            self.expected_count += 1
+        else:
+            self.messages.append(f"{record.name}: {message}")
+
+
+def _install_offline_yfinance(options: dict):
+    """Serve yfinance fallbacks from the synthetic data instead of Yahoo."""
+    import pandas as pd
+    from benchmarks import synthetic
+    from core.yfinance_client import YFinanceClient
+    from database.db_manager import empty_candle_frame, to_candle_frame
+
+    def get_historical_data(self, symbol, from_date=None, to_date=None):
+        return get_historical_data_batch(self, [symbol], from_date, to_date)
+
+    def get_historical_data_batch(self, symbols, from_date=None, to_date=None):
+        rows = [{**row, "symbol": symbol} for symbol in symbols
+                for row in synthetic.history_records(symbol, from_date, to_date, **options)]
+        return to_candle_frame(pd.DataFrame(rows)) if rows else empty_candle_frame()
+
+    YFinanceClient.get_historical_data = get_historical_data
+    YFinanceClient.get_historical_data_batch = get_historical_data_batch
+
+
+def run_worker(spec: dict) -> dict:
+    import_start = time.perf_counter()
+    import main as app
+    from core.ai_engine import AIEngine
+    from core.data_provider import DataProvider
+    from core.notifier import TelegramNotifier
+    from core.pipeline import ScanPipeline
+    from core.strategy import TechnicalAnalyzer
+    from database.db_manager import DBManager
+    import_s = time.perf_counter() - import_start
+
+    _install_offline_yfinance(spec["data"])
+    timer = StageTimer()
+    for name in ("get_historical_data", "get_historical_data_batch", "get_daily_append"):
+        timer.wrap(DataProvider, name, "fetch")
+    timer.wrap(DBManager, "upsert_candles", "upsert")
+    timer.wrap(DBManager, "prefilter_symbols", "prefilter")
+    timer.wrap(TechnicalAnalyzer, "analyze_state", "analyze")
+    timer.wrap(AIEngine, "analyze_signals", "ai")
+    timer.wrap(AIEngine, "analyze_signal", "ai")
+    timer.wrap(ScanPipeline, "_emit", "notify")
+    timer.wrap(TelegramNotifier, "_post", "notify")
+
+    # Symbols handed to the analysis (the watchlist, or the prefilter survivors in universe mode)
+    scanned = []
+    original_run = ScanPipeline.run
+
+    def run(self, tickers, *args, **kwargs):
+        scanned.extend(tickers)
+        return original_run(self, tickers, *args, **kwargs)
+
+    ScanPipeline.run = run
+    app.configure_logging() # Before main(), so its own setup keeps these handlers
+    errors = _ErrorLog(spec.get("failing_services", []))
+    logging.getLogger().addHandler(errors)
+
+    app.WATCHLIST = spec["symbols"]
+    start = time.perf_counter()
+    app.main()
+    total_s = time.perf_counter() - start
+
+    # Every scanned symbol with history must have been analyzed (the pipeline skips the others)
+    db = DBManager(write_queue=False)
+    states = db.get_indicator_states(list(dict.fromkeys(scanned)))
+    expected = sum(1 for state in states.values() if state["bars"] >= 2)
+    return {"total_s": round(total_s, 4), "import_s": round(import_s, 4), "stages": timer.report(),
+            "analyzable": expected, "errors": errors.messages, "expected_errors": errors.expected_count}
+
+
+def worker_problems(result: dict) -> List[str]:
+    """Reasons a worker run does not count as a valid measurement."""
+    problems = [f"ERROR logged: {message}" for message in result["errors"][:10]]
+    if len(result["errors"]) > 10:
+        problems.append(f"... {len(result['errors']) - 10} more ERROR records")
+    analyzed = result["stages"]["analyze"]["calls"]
+    if analyzed < result["analyzable"]:
+        problems.append(f"analyze ran for {analyzed} of {result['analyzable']} symbols with history")
+    return problems
+
+
+# --- Parent ---
+def _parse_services(values: List[str], defaults: Dict[str, float], option: str) -> Dict[str, float]:
+    """["goapi=20", "deepseek=500"] or ["50"] (every service) -> {service: value}."""
+    from benchmarks.stub_services import SERVICES
+    parsed = dict(defaults)
+    for value in values or []:
+        service, _, number = value.rpartition("=")
+        targets = [service] if service else list(SERVICES)
+        for target in targets:
+            if target not in SERVICES:
+                raise SystemExit(f"{option}: unknown service {target!r} (expected one of {', '.join(SERVICES)})")
+            parsed[target] = float(number)
+    return parsed
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(stub, size: int, args, env_overrides: Dict[str, str]) -> Dict[str, dict]:
+    from benchmarks import synthetic
+    symbols = synthetic.make_symbols(size)
+    stub.state.universe = symbols
+    workdir = tempfile.mkdtemp(prefix=f"saftrade-bench-{size}-")
+    env = {
+        **os.environ, **BENCH_ENV, **stub.env(),
+        "PYTHONPATH": ROOT,
+        "DB_PATH": os.path.join(workdir, "market_data.db"),
+        "SIGNALS_CSV": os.path.join(workdir, "signals.csv"),
+        "PARQUET_DIR": os.path.join(workdir, "market_data_parquet"),
+        "SCAN_UNIVERSE": "true" if args.universe else "false",
+        **env_overrides,
+    }
+    spec = {"symbols": symbols, "data": {"days": args.days, "signal_rate": args.signal_rate},
+            "failing_services": [name for name, config in stub.state.config.items() if config.error_rate > 0]}
+    runs = {}
+    try:
+        for phase in PHASES:
+            stub.reset()
+            out = os.path.join(workdir, f"{phase}.json")
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec), "--out", out],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            if process.returncode != 0 or not os.path.exists(out):
+                tail = "\n".join((process.stderr or process.stdout).splitlines()[-20:])
+                raise RuntimeError(f"Worker for {size} symbols ({phase}) failed:\n{tail}")
+            with open(out) as f:
+                result = json.load(f)
+            result["service_calls"] = dict(sorted(stub.state.calls.items()))
+            result["telegram_messages"] = stub.state.messages
+            runs[phase] = result
+            print(_format_run(size, phase, result))
+    finally:
+        if args.keep:
+            print(f"Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return runs
+
+
+def _format_run(size: int, phase: str, result: dict) -> str:
+    stages = "  ".join(
+        f"{stage} {stat['busy_s']:.2f}s/{stat['calls']}" for stage, stat in result["stages"].items() if stat["calls"]
+    )
+    return f"{size:>6} {phase:<5} total {result['total_s']:7.2f}s  {stages}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float) -> List[str]:
+    """
+    Regressions: total_s and per-stage busy_s slower than baseline by > tolerance and > min_delta seconds,
+    and any stage called fewer times than in the baseline (work skipped looks faster, not slower).
+    """
+    regressions = []
+    for size, runs in results["runs"].items():
+        for phase, run in runs.items():
+            base = baseline.get("runs", {}).get(size, {}).get(phase)
+            if base is None:
+                continue
+            for stage, stat in run["stages"].items():
+                before = base["stages"].get(stage, {}).get("calls", 0)
+                if stat["calls"] < before:
+                    regressions.append(f"{size} {phase} {stage}: {before} -> {stat['calls']} calls")
+            pairs = [("total", run["total_s"], base["total_s"])]
+            pairs += [(stage, stat["busy_s"], base["stages"].get(stage, {}).get("busy_s", 0.0))
+                      for stage, stat in run["stages"].items()]
+            for name, now, before in pairs:
+                if now - before > min_delta and now > before * (1 + tolerance):
+                    regressions.append(f"{size} {phase} {name}: {before:.3f}s -> {now:.3f}s (+{100 * (now / before - 1) if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of main.main() against local stub services.")
+    parser.add_argument("--sizes", default="16,256", help="Comma-separated universe sizes (default: 16,256)")
+    parser.add_argument("--days", type=int, default=300, help="Synthetic history length in business days")
+    parser.add_argument("--signal-rate", type=float, default=0.1, help="Fraction of symbols ending on a breakout bar")
+    parser.add_argument("--latency", action="append", metavar="[SERVICE=]MS", help="Service latency, e.g. deepseek=800 (repeatable)")
+    parser.add_argument("--jitter", action="append", metavar="[SERVICE=]MS", help="Uniform extra latency (repeatable)")
+    parser.add_argument("--error-rate", action="append", metavar="[SERVICE=]RATE", help="Error rate, e.g. goapi=0.02 (repeatable)")
+    parser.add_argument("--universe", action="store_true", help="Run with SCAN_UNIVERSE=true (companies listing + prefilter)")
+    parser.add_argument("--env", action="append", metavar="KEY=VALUE", help="Extra setting for the runs (repeatable)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this results file (exit code 1 on regression)")
+    parser.add_argument("--save-baseline", help="Write the results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline (default: 0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.1, help="Ignore slowdowns below this many seconds")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary databases and logs")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(json.loads(args.worker))
+        with open(args.out, "w") as f:
+            json.dump(result, f)
+        problems = worker_problems(result)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        return
+
+    from benchmarks.stub_services import SERVICES, StubServices, StubState
+    latency = _parse_services(args.latency, DEFAULT_LATENCY, "--latency")
+    jitter = _parse_services(args.jitter, {name: 0.0 for name in SERVICES}, "--jitter")
+    error_rate = _parse_services(args.error_rate, {name: 0.0 for name in SERVICES}, "--error-rate")
+    env_overrides = dict(item.split("=", 1) for item in args.env or [])
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    state = StubState(days=args.days, signal_rate=args.signal_rate)
+    for name, config in state.config.items():
+        config.latency_ms, config.jitter_ms, config.error_rate = latency[name], jitter[name], error_rate[name]
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "days": args.days, "signal_rate": args.signal_rate, "universe": args.universe,
+            "latency_ms": latency, "jitter_ms": jitter, "error_rate": error_rate, "env": env_overrides,
+        },
+        "runs": {},
+    }
+    with StubServices(state) as stub:
+        for size in sizes:
+            results["runs"][str(size)] = run_size(stub, size, args, env_overrides)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("latency_ms") != latency or baseline["meta"].get("error_rate") != error_rate:
+            print("Warning: baseline was recorded with different service latencies / error rates")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print("Regressions vs baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
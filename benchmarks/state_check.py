@@ -0,0 +1,120 @@
+"""
+Incremental indicator state vs a full rebuild (DBManager._refresh_indicator_state).
+
+Seeds a throwaway database with synthetic history, then upserts the newest candles in the ways
+daily runs can deliver them: one new bar, the same new bar twice in one batch (a provider
+returning an overlapping page), a revised bar already in the state, and the same new bar from
+several threads at once through the write queue (merged into one batch by the writer). After each
+upsert the stored state must equal rebuild_indicator_state() from the table; exit code 1 otherwise.
+
+    python benchmarks/state_check.py [--symbols 8] [--days 260] [--backend sqlite|parquet]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def rows_for(symbol: str, data, indexes, bump: float = 0.0):
+    return [
+        {"symbol": symbol, "date": str(data["date"][i]), "open": float(data["open"][i]),
+         "high": float(data["high"][i]) + bump, "low": float(data["low"][i]),
+         "close": float(data["close"][i]) + bump, "volume": int(data["volume"][i])}
+        for i in indexes
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental indicator state vs a full rebuild.")
+    parser.add_argument("--symbols", type=int, default=8, help="Symbols to seed (default: 8)")
+    parser.add_argument("--days", type=int, default=260, help="Business days per symbol (default: 260)")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "parquet"], help="Candle backend")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="saftrade-statecheck-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "state.db")
+    os.environ["PARQUET_DIR"] = os.path.join(workdir, "parquet")
+    os.environ["DB_WRITE_LINGER_MS"] = "50" # Let the concurrent upserts land in one batch
+    try:
+        failures = check(args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("Incremental states match a full rebuild")
+
+
+def check(args):
+    from benchmarks.synthetic import candles, make_symbols
+    from database.db_manager import DBManager
+
+    db = DBManager(backend=args.backend, write_queue=False)
+    db.init_db()
+    symbols = make_symbols(args.symbols)
+    histories = {symbol: candles(symbol, days=args.days) for symbol in symbols}
+    seeded = args.days - 7
+    db.upsert_candles([row for s in symbols for row in rows_for(s, histories[s], range(seeded))])
+    db.get_indicator_states(symbols) # Persist the starting states
+
+    # (label, rows per symbol) applied in order on top of the seeded history
+    scenarios = [
+        ("one new bar", lambda s, d: rows_for(s, d, [seeded])),
+        ("same new bar twice", lambda s, d: rows_for(s, d, [seeded + 1, seeded + 1])),
+        ("new bar twice, last revised", lambda s, d: rows_for(s, d, [seeded + 2]) + rows_for(s, d, [seeded + 2], bump=7.0)),
+        ("revised stored bar", lambda s, d: rows_for(s, d, [seeded + 1], bump=3.0)),
+        ("two new bars, unsorted", lambda s, d: rows_for(s, d, [seeded + 4, seeded + 3, seeded + 4])),
+    ]
+    failures = []
+    for label, make_rows in scenarios:
+        db.upsert_candles([row for s in symbols for row in make_rows(s, histories[s])])
+        if not compare(db, symbols, label, failures):
+            return failures
+
+    # Fetch workers upserting the same bars at once: the writer merges them into one call
+    queued = DBManager(backend=args.backend, write_queue=True)
+    for label, index in (("concurrent same new bar", seeded + 5), ("concurrent revised bar", seeded + 6)):
+        threads = 4
+        barrier = threading.Barrier(threads)
+
+        def upsert(bump: float):
+            barrier.wait()
+            queued.upsert_candles([row for s in symbols for row in rows_for(s, histories[s], [index], bump=bump)])
+
+        batches = queued.writer.batches
+        workers = [threading.Thread(target=upsert, args=(float(i),)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        queued.flush()
+        if not compare(queued, symbols, f"{label} ({threads} upserts in {queued.writer.batches - batches} batches)", failures):
+            break
+    queued.close()
+    return failures
+
+
+def compare(db, symbols, label: str, failures) -> bool:
+    """Stored states vs rebuilds; appends a line per mismatching symbol. True when all match."""
+    stored = db.get_indicator_states(symbols)
+    found = []
+    for symbol in symbols:
+        expected = db.rebuild_indicator_state(symbol)
+        if stored.get(symbol) != expected:
+            got = stored.get(symbol) or {}
+            found.append(f"{label}: {symbol} bars={got.get('bars')} ema_20={got.get('ema_20')}"
+                         f" (rebuild: bars={expected['bars']} ema_20={expected['ema_20']})")
+    print(f"{label:<50} {'ok' if not found else 'MISMATCH'}")
+    failures.extend(found)
+    return not found
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local stand-ins for the external services, so the pipeline can be benchmarked offline.
+
+One threaded HTTP server answers, in the real response formats:
+- GoAPI:    GET  /stock/idx/{symbol}/historical, /stock/idx/prices, /stock/idx/companies
+- DeepSeek: POST /v1/chat/completions (single and batched prompts; every setup is approved)
+- Telegram: POST /bot{token}/sendMessage
+
+Each service has its own latency (+ uniform jitter) and error rate; failed calls return
+`error_status` (429 carries a Telegram-style retry_after). Candles come from benchmarks.synthetic.
+Point the app at it with API_BASE_URL=url, DEEPSEEK_API_URL=url/v1/chat/completions, TELEGRAM_API_URL=url.
+
+    python benchmarks/stub_services.py --port 8765 --symbols 900   # serve until Ctrl+C
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks import synthetic
+
+SERVICES = ("goapi", "deepseek", "telegram")
+
+
+@dataclass
+class ServiceConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0 # Fraction of calls answered with error_status
+    error_status: int = 503
+
+
+@dataclass
+class StubState:
+    universe: List[str] = field(default_factory=list) # /stock/idx/companies listing
+    days: int = 300                                   # Synthetic history length per symbol
+    signal_rate: float = 0.1                          # Fraction of symbols ending on a breakout bar
+    config: Dict[str, ServiceConfig] = field(default_factory=lambda: {name: ServiceConfig() for name in SERVICES})
+    calls: Counter = field(default_factory=Counter)   # "service" / "service:error" -> count
+    messages: int = 0                                  # Telegram messages accepted
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    rng: random.Random = field(default_factory=lambda: random.Random(0))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs (the clients pool connections)
+    server: "_Server"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/stock/idx/companies":
+            self._answer("goapi", lambda: self._goapi([{"symbol": s, "name": f"PT {s} Tbk"} for s in self.server.state.universe]))
+        elif url.path == "/stock/idx/prices":
+            symbols = [s for s in params.get("symbols", "").split(",") if s]
+            self._answer("goapi", lambda: self._goapi([synthetic.latest_record(s, **self._options()) for s in symbols]))
+        elif re.fullmatch(r"/stock/idx/[A-Z0-9.\-]+/historical", url.path):
+            symbol = url.path.split("/")[3]
+            self._answer("goapi", lambda: self._goapi(
+                synthetic.history_records(symbol, params.get("from"), params.get("to"), **self._options())))
+        else:
+            self._send(404, {"status": "error", "message": "Not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        path = urlsplit(self.path).path
+        if path == "/v1/chat/completions":
+            self._answer("deepseek", lambda: self._chat(json.loads(body)))
+        elif re.fullmatch(r"/bot[^/]+/sendMessage", path):
+            self._answer("telegram", lambda: self._telegram(json.loads(body)))
+        else:
+            self._send(404, {"ok": False, "description": "Not Found"})
+
+    def log_message(self, format, *args):
+        pass # Quiet: the benchmark reports call counts instead
+
+    # --- Responses ---
+    def _answer(self, service: str, build):
+        state = self.server.state
+        config = state.config[service]
+        with state.lock:
+            delay = config.latency_ms + state.rng.uniform(0, config.jitter_ms)
+            failed = state.rng.random() < config.error_rate
+            state.calls[service] += 1
+            if failed:
+                state.calls[f"{service}:error"] += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if failed:
+            self._send(config.error_status, {"ok": False, "error_code": config.error_status, "description": "Stub error",
+                                             "parameters": {"retry_after": 1}, "status": "error", "message": "Stub error"})
+            return
+        self._send(200, build())
+
+    def _options(self) -> dict:
+        return {"days": self.server.state.days, "signal_rate": self.server.state.signal_rate}
+
+    @staticmethod
+    def _goapi(results: list) -> dict:
+        return {"status": "success", "message": "OK", "data": {"results": results}}
+
+    @staticmethod
+    def _chat(request: dict) -> dict:
+        prompt = request["messages"][-1]["content"]
+        tickers = re.findall(r"Ticker: (\S+)", prompt)
+        closes = [float(value) for value in re.findall(r"- Close: ([0-9.eE+-]+)", prompt)]
+        verdicts = [
+            {"ticker": ticker, "valid": True, "analysis": "Synthetic approval.",
+             "trade_plan": {"entry": close, "stop_loss": round(close * 0.97, 2), "take_profit": round(close * 1.06, 2), "risk_reward": "1:2"}}
+            for ticker, close in zip(tickers, closes)
+        ]
+        if '"verdicts"' in prompt:
+            content = {"verdicts": verdicts}
+        else:
+            content = {key: value for key, value in verdicts[0].items() if key != "ticker"} if verdicts else {"valid": False}
+        tokens = len(prompt) // 4
+        return {
+            "id": "stub", "object": "chat.completion", "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(content)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": 60 * len(verdicts), "total_tokens": tokens + 60 * len(verdicts)},
+        }
+
+    def _telegram(self, request: dict) -> dict:
+        with self.server.state.lock:
+            self.server.state.messages += 1
+            message_id = self.server.state.messages
+        return {"ok": True, "result": {"message_id": message_id, "chat": {"id": request.get("chat_id")}, "text": request.get("text")}}
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    state: StubState
+
+
+class StubServices:
+    """The stub server on a background thread. Use as a context manager or start()/stop()."""
+
+    def __init__(self, state: Optional[StubState] = None, host: str = "127.0.0.1", port: int = 0):
+        self.state = state or StubState()
+        self._server = _Server((host, port), _Handler)
+        self._server.state = self.state
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Settings that point the app's clients at this server."""
+        return {
+            "API_BASE_URL": self.url,
+            "DEEPSEEK_API_URL": f"{self.url}/v1/chat/completions",
+            "TELEGRAM_API_URL": self.url,
+        }
+
+    def reset(self):
+        with self.state.lock:
+            self.state.calls.clear()
+            self.state.messages = 0
+
+    def start(self) -> "StubServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServices":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the GoAPI / DeepSeek / Telegram stand-ins.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=16, help="Size of the /stock/idx/companies listing")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency of every service")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Error rate of every service")
+    args = parser.parse_args()
+
+    state = StubState(universe=synthetic.make_symbols(args.symbols))
+    for config in state.config.values():
+        config.latency_ms, config.error_rate = args.latency_ms, args.error_rate
+    stub = StubServices(state, port=args.port)
+    print(f"Serving on {stub.url}; set:")
+    for key, value in stub.env().items():
+        print(f"  {key}={value}")
+    stub.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
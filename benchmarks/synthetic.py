@@ -0,0 +1,103 @@
+"""
+Synthetic IDX-like daily candles for the offline benchmarks.
+
+Every symbol's series is derived from its name (crc32 seed), so the stub servers, the benchmark
+workers and repeated runs all see exactly the same data without passing it around.
+A fraction of symbols (signal_rate) ends on a volume breakout bar, so the AI and notify stages
+get work proportional to the universe size.
+"""
+import string
+import zlib
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.watchlist import WATCHLIST
+
+DATE_FMT = "%Y-%m-%d"
+
+
+def last_session(today: Optional[date] = None) -> date:
+    """Latest weekday on or before today (the synthetic market never has holidays)."""
+    day = today or date.today()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def make_symbols(count: int) -> List[str]:
+    """The watchlist first, then four-letter codes (AAAA, AAAB, ...) up to `count` symbols."""
+    symbols = list(WATCHLIST[:count])
+    taken = set(symbols)
+    for letters in product(string.ascii_uppercase, repeat=4):
+        if len(symbols) >= count:
+            break
+        code = "".join(letters)
+        if code not in taken:
+            symbols.append(code)
+    return symbols
+
+
+def is_signal(symbol: str, signal_rate: float) -> bool:
+    return (zlib.crc32(symbol.encode()) % 10_000) / 10_000 < signal_rate
+
+
+@lru_cache(maxsize=None)
+def candles(symbol: str, days: int = 300, end: Optional[date] = None, signal_rate: float = 0.1) -> Dict[str, np.ndarray]:
+    """
+    `days` business days of OHLCV ending at last_session(end): a geometric random walk with
+    prices of a few hundred to a few thousand rupiah and ~1e9+ daily traded value.
+    Returned as column arrays (dates as YYYY-MM-DD strings); treat them as read-only (cached).
+    """
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    end_day = last_session(end)
+    dates = np.busday_offset(np.datetime64(end_day, "D"), np.arange(-days + 1, 1), roll="backward")
+
+    close = rng.uniform(200, 5000) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))
+    open_ = close * (1 + rng.normal(0, 0.008, days))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.015, days))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.015, days))
+    volume = rng.integers(200_000, 5_000_000, days)
+
+    if is_signal(symbol, signal_rate) and days > 1:
+        # Last bar: +5% green candle closing at the high on 3x volume (volatility breakout + BSJP)
+        close[-1] = close[-2] * 1.05
+        open_[-1] = close[-2] * 1.005
+        high[-1] = close[-1]
+        low[-1] = open_[-1] * 0.995
+        volume[-1] = int(volume[-21:-1].mean() * 3)
+
+    change = np.diff(close, prepend=close[0])
+    return {
+        "date": np.datetime_as_string(dates, unit="D"),
+        "open": np.round(open_, 0), "high": np.round(high, 0), "low": np.round(low, 0),
+        "close": np.round(close, 0), "volume": volume,
+        "change": np.round(change, 0), "change_pct": np.round(100 * change / np.roll(close, 1), 2),
+    }
+
+
+def history_records(symbol: str, from_date: Optional[str] = None, to_date: Optional[str] = None, **options) -> List[dict]:
+    """GoAPI /historical-style rows in [from_date, to_date] (both optional, inclusive)."""
+    data = candles(symbol, **options)
+    dates = data["date"]
+    start = np.searchsorted(dates, from_date, side="left") if from_date else 0
+    stop = np.searchsorted(dates, to_date, side="right") if to_date else len(dates)
+    return [
+        {"date": str(dates[i]), "open": float(data["open"][i]), "high": float(data["high"][i]),
+         "low": float(data["low"][i]), "close": float(data["close"][i]), "volume": int(data["volume"][i])}
+        for i in range(start, stop)
+    ]
+
+
+def latest_record(symbol: str, **options) -> dict:
+    """GoAPI /prices-style row for the latest session."""
+    data = candles(symbol, **options)
+    return {
+        "symbol": symbol, "date": str(data["date"][-1]),
+        "open": float(data["open"][-1]), "high": float(data["high"][-1]), "low": float(data["low"][-1]),
+        "close": float(data["close"][-1]), "volume": int(data["volume"][-1]),
+        "change": float(data["change"][-1]), "change_pct": float(data["change_pct"][-1]),
+    }
@@ -0,0 +1,14 @@
+# IDX non-trading days (national holidays + cuti bersama), YYYY-MM-DD.
+# Check against the official IDX trading calendar each year; extra dates can be added via the IDX_EXTRA_HOLIDAYS env var.
+IDX_HOLIDAYS = [
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29",
+    "2025-03-28", "2025-03-31", "2025-04-01", "2025-04-02", "2025-04-03", "2025-04-04", "2025-04-07",
+    "2025-04-18", "2025-05-01", "2025-05-12", "2025-05-13", "2025-05-29", "2025-05-30",
+    "2025-06-06", "2025-06-09", "2025-06-27", "2025-08-18", "2025-09-05",
+    "2025-12-25", "2025-12-26", "2025-12-31",
+    # 2026
+    "2026-01-01", "2026-01-16", "2026-02-17", "2026-03-19", "2026-03-20",
+    "2026-04-03", "2026-05-01", "2026-05-14", "2026-05-27", "2026-06-01", "2026-06-16",
+    "2026-08-17", "2026-08-25", "2026-12-25", "2026-12-31",
+]
@@ -1,43 +1,169 @@
+"""
+Configuration, resolved once from the environment (and .env) into a cached Settings object.
+
+Nothing happens at import: the first `get_settings()` call, or the first
+`from config.settings import NAME` (module __getattr__), loads .env and reads the environment.
+A missing GOAPI_KEY is reported by DataProvider, which switches to fallback mode.
+"""
 import os
-from pathlib import Path
-from dotenv import load_dotenv
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+class Settings(SimpleNamespace):
+    """Resolved configuration values (UPPER_CASE attributes, as listed in get_settings)."""
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
+    # API Configuration
+    GOAPI_KEY = os.getenv("GOAPI_KEY")
+    API_BASE_URL = os.getenv("API_BASE_URL", "https://api.goapi.io")
+    GOAPI_BULK_CHUNK_SIZE = 50 # Max symbols per /stock/idx/prices request
+
+    # Provider Routing (GoAPI -> YFinance)
+    PROVIDER_HEALTH_WINDOW = int(os.getenv("PROVIDER_HEALTH_WINDOW", 50))              # Recent calls kept per provider (latency / error rate)
+    PROVIDER_BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", 1))         # Consecutive GoAPI failures that open the circuit
+    PROVIDER_BREAKER_ERROR_RATE = float(os.getenv("PROVIDER_BREAKER_ERROR_RATE", 0.5)) # ...or this error rate over the window
+    PROVIDER_BREAKER_MIN_CALLS = int(os.getenv("PROVIDER_BREAKER_MIN_CALLS", 10))      # Calls needed before the error rate counts
+    PROVIDER_BREAKER_COOLDOWN = float(os.getenv("PROVIDER_BREAKER_COOLDOWN", 60))      # Seconds on YFinance before GoAPI is probed again
+    PROVIDER_HEDGE = os.getenv("PROVIDER_HEDGE", "false").lower() == "true"             # Race YFinance against slow GoAPI history calls
+    PROVIDER_HEDGE_QUANTILE = float(os.getenv("PROVIDER_HEDGE_QUANTILE", 0.95))        # Hedge once GoAPI is slower than this latency percentile
+    PROVIDER_HEDGE_MIN_DELAY_MS = float(os.getenv("PROVIDER_HEDGE_MIN_DELAY_MS", 500)) # ...but never sooner than this
+    PROVIDER_HEDGE_MIN_SAMPLES = int(os.getenv("PROVIDER_HEDGE_MIN_SAMPLES", 20))      # GoAPI calls observed before hedging starts
+
+    # HTTP Response Cache (GoAPI history / prices / companies, YFinance downloads)
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "false").lower() == "true" # Serve repeated provider requests from disk
+    HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "http_cache.db")        # SQLite file holding the compressed responses
+    HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", 256))          # Least recently used entries are evicted above this
+    HTTP_CACHE_LIVE_TTL = float(os.getenv("HTTP_CACHE_LIVE_TTL", 0))        # Seconds to keep responses covering today (0 = until the next close)
+
+    # Database Configuration
+    # Default to a local SQLite file if not specified
+    DB_PATH = os.getenv("DB_PATH", "market_data.db")
+    SQLITE_URL = f"sqlite:///{DB_PATH}"
+    CANDLE_BACKEND = os.getenv("CANDLE_BACKEND", "sqlite")                # "sqlite" (daily_candles table) or "parquet"
+    PARQUET_DIR = os.getenv("PARQUET_DIR", "market_data_parquet")         # Root of the Parquet candle store
+    PARQUET_PARTITION = os.getenv("PARQUET_PARTITION", "year")            # "year" (fast universe reads) or "symbol" (cheap per-symbol writes)
+
+    # SQLite Concurrency
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")         # WAL: readers never block on the writer
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")        # NORMAL is crash-safe with WAL (fsync at checkpoints)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 10000)) # Wait for another process's write lock instead of "database is locked"
+    SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", 64))               # Page cache per connection
+    DB_WRITE_QUEUE = os.getenv("DB_WRITE_QUEUE", "true").lower() == "true" # Send all writes through one batching writer thread
+    DB_WRITE_BATCH_MAX = int(os.getenv("DB_WRITE_BATCH_MAX", 256))        # Max queued writes committed in one transaction
+    DB_WRITE_LINGER_MS = float(os.getenv("DB_WRITE_LINGER_MS", 5))        # Wait this long for more writes before committing
+
+    # History Configuration
+    HISTORY_LOOKBACK_DAYS = int(os.getenv("HISTORY_LOOKBACK_DAYS", 365)) # Analysis window (calendar days)
+    MAX_GAP_WEEKDAYS = int(os.getenv("MAX_GAP_WEEKDAYS", 5))            # Missing weekdays tolerated before a hole is refetched (holidays)
+
+    # Pipeline Concurrency
+    FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 4))            # Fetch + analyze workers
+    AI_WORKERS = int(os.getenv("AI_WORKERS", 4))                  # AI validation workers
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 32))
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 0))      # Processes for full indicator recomputes (0 = one per CPU, 1 = in-process)
+    ANALYSIS_MIN_ROWS_PER_WORKER = int(os.getenv("ANALYSIS_MIN_ROWS_PER_WORKER", 150_000)) # Smaller panels use fewer processes (or none)
+    SIGNALS_CSV = os.getenv("SIGNALS_CSV", "signals.csv")
+    DAILY_APPEND = os.getenv("DAILY_APPEND", "true").lower() == "true" # Bulk-fetch today's candle when only the latest day is missing
+
+    # Universe Mode (scan the whole IDX listing instead of the watchlist)
+    SCAN_UNIVERSE = os.getenv("SCAN_UNIVERSE", "false").lower() == "true"
+    UNIVERSE_CHUNK_SIZE = int(os.getenv("UNIVERSE_CHUNK_SIZE", 200))              # Symbols fetched/stored per chunk (bounds memory)
+    UNIVERSE_MIN_PRICE = float(os.getenv("UNIVERSE_MIN_PRICE", 100))              # Last close (IDR); skips sub-100 "gocap" names
+    UNIVERSE_MIN_AVG_VALUE = float(os.getenv("UNIVERSE_MIN_AVG_VALUE", 1_000_000_000)) # Avg daily traded value (IDR) over UNIVERSE_LIQUIDITY_DAYS
+    UNIVERSE_LIQUIDITY_DAYS = int(os.getenv("UNIVERSE_LIQUIDITY_DAYS", 20))       # Same window as VOLUME_SMA_LENGTH
+
+    # Per-service concurrency limits
+    GOAPI_MAX_CONCURRENCY = int(os.getenv("GOAPI_MAX_CONCURRENCY", 4))
+    YFINANCE_MAX_CONCURRENCY = int(os.getenv("YFINANCE_MAX_CONCURRENCY", 1)) # yf.download shares global state across threads
+    DEEPSEEK_MAX_CONCURRENCY = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", 4))
+    TELEGRAM_MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", 1))
+
+    # Market Calendar / Daemon Scheduling (IDX, Asia/Jakarta)
+    MARKET_TIMEZONE = "Asia/Jakarta"
+    IDX_PRECLOSE_TIME = "15:50" # End of continuous trading, pre-closing auction starts
+    IDX_CLOSE_TIME = "16:00"    # Closing price is fixed
+    IDX_EXTRA_HOLIDAYS = [d.strip() for d in os.getenv("IDX_EXTRA_HOLIDAYS", "").split(",") if d.strip()]
+    BSJP_SCAN_LEAD_MINUTES = int(os.getenv("BSJP_SCAN_LEAD_MINUTES", 15))   # Pre-close BSJP scan, minutes before IDX_PRECLOSE_TIME
+    FULL_SCAN_DELAY_MINUTES = int(os.getenv("FULL_SCAN_DELAY_MINUTES", 30)) # Post-close full scan, minutes after IDX_CLOSE_TIME
+    INTRADAY_MODE = os.getenv("INTRADAY_MODE", "true").lower() == "true" # Poll bulk prices before the close for BSJP (needs GoAPI)
+    INTRADAY_START_TIME = os.getenv("INTRADAY_START_TIME", "14:00")       # Last session (Friday's session II opens at 14:00)
+    INTRADAY_POLL_MINUTES = float(os.getenv("INTRADAY_POLL_MINUTES", 5))
+    DAEMON_POLL_SECONDS = int(os.getenv("DAEMON_POLL_SECONDS", 5))
+    DAEMON_TRIGGER_FILE = os.getenv("DAEMON_TRIGGER_FILE", "scan.trigger") # Create this file to run a full scan now
+
+    # AI Configuration
+    DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+    DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions") # OpenAI-compatible chat endpoint
+    AI_CACHE_TTL_HOURS = float(os.getenv("AI_CACHE_TTL_HOURS", 24))      # Cached verdicts older than this are refetched
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 5000))  # Least recently used verdicts beyond this are evicted
+    AI_FORCE_REFRESH = os.getenv("AI_FORCE_REFRESH", "false").lower() == "true" # Ignore cached verdicts (still refreshes them)
+    AI_BATCH_MODE = os.getenv("AI_BATCH_MODE", "false").lower() == "true"    # Opt in: validate several signals per chat completion (token budgets below)
+    AI_REQUEST_TOKEN_BUDGET = int(os.getenv("AI_REQUEST_TOKEN_BUDGET", 6000)) # Estimated prompt + completion tokens per batched request
+    AI_RUN_TOKEN_BUDGET = int(os.getenv("AI_RUN_TOKEN_BUDGET", 60000))        # Estimated tokens for all batched requests of one run
+    AI_OUTPUT_TOKENS_PER_SIGNAL = 250 # Completion tokens reserved per verdict
+
+    # Telegram Configuration
+    TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org") # Bot API base URL
+    TELEGRAM_RATE_PER_SEC = float(os.getenv("TELEGRAM_RATE_PER_SEC", 1.0)) # Telegram allows ~1 message/sec per chat
+    TELEGRAM_BURST = int(os.getenv("TELEGRAM_BURST", 3))
+    TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", 5))    # Per message, across restarts
+    TELEGRAM_DIGEST_MODE = os.getenv("TELEGRAM_DIGEST_MODE", "false").lower() == "true" # One digest per run instead of one message per alert
+    TELEGRAM_FLUSH_TIMEOUT = float(os.getenv("TELEGRAM_FLUSH_TIMEOUT", 60)) # Seconds to wait for delivery at exit
 
-# Load environment variables
-load_dotenv()
+    # Instrumentation
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true" # Record stage/client metrics (near-zero cost when off)
+    METRICS_DIR = os.getenv("METRICS_DIR", "metrics") # run_report.json + metrics.prom (Prometheus textfile collector)
 
-# API Configuration
-GOAPI_KEY = os.getenv("GOAPI_KEY")
-API_BASE_URL = os.getenv("API_BASE_URL", "https://api.goapi.io")
+    # Strategy Constants
+    RSI_OVERSOLD = 30
+    VOLUME_SPIKE_FACTOR = 1.2
+    EMA_LONG = 200
+    EMA_MEDIUM = 50
+    EMA_SHORT = 20
+    RSI_LENGTH = 14
+    ATR_LENGTH = 14
+    VOLUME_SMA_LENGTH = 20
 
-# Database Configuration
-# Default to a local SQLite file if not specified
-DB_PATH = os.getenv("DB_PATH", "market_data.db")
-SQLITE_URL = f"sqlite:///{DB_PATH}"
+    # Volatility Breakout Constants
+    VOL_BREAKOUT_FACTOR = 2.0 # 2x Average Volume
+    MIN_PRICE_CHANGE = 0.03   # 3% Price Increase
 
-# Validation
-if not GOAPI_KEY:
-    # Changed to warning instead of error to allow fallback mode
-    print("WARNING: GOAPI_KEY is not set. Bot will run in Fallback Mode (YFinance Only).")
+    # BSJP Constants
+    BSJP_CLOSE_THRESHOLD = 0.90 # Close must be in top 10% of candle range
+    BSJP_MIN_VOLUME = 1.0       # Volume > 1.0x Average
 
-# AI Configuration
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+    # Backtest Constants (mirror the trade plan rules given to the AI)
+    BACKTEST_SWING_ATR_SL = 2.0      # Swing stop loss: 2x ATR below entry
+    BACKTEST_BREAKOUT_SL_PCT = 0.03  # Breakout stop loss: Low of Day or -3%, whichever is tighter
+    BACKTEST_RISK_REWARD = 2.0       # Take profit at 1:2 risk-reward
+    BACKTEST_MAX_HOLD_DAYS = int(os.getenv("BACKTEST_MAX_HOLD_DAYS", 10)) # Swing/breakout time exit (bars)
+    BACKTEST_BUY_FEE = float(os.getenv("BACKTEST_BUY_FEE", 0.0015))   # IDX broker fee
+    BACKTEST_SELL_FEE = float(os.getenv("BACKTEST_SELL_FEE", 0.0025)) # IDX broker fee + sales tax
 
-# Telegram Configuration
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    return Settings(**{name: value for name, value in locals().items() if name.isupper()})
 
-# Strategy Constants
-RSI_OVERSOLD = 30
-VOLUME_SPIKE_FACTOR = 1.2
-EMA_LONG = 200
-EMA_MEDIUM = 50
-EMA_SHORT = 20
 
-# Volatility Breakout Constants
-VOL_BREAKOUT_FACTOR = 2.0 # 2x Average Volume
-MIN_PRICE_CHANGE = 0.03   # 3% Price Increase
+def reload_settings() -> Settings:
+    """Re-read the environment (values already imported by other modules keep their old value)."""
+    get_settings.cache_clear()
+    return get_settings()
 
-# BSJP Constants
-BSJP_CLOSE_THRESHOLD = 0.90 # Close must be in top 10% of candle range
-BSJP_MIN_VOLUME = 1.0       # Volume > 1.0x Average
 
+def __getattr__(name: str):
+    # `from config.settings import NAME` keeps working; values come from the cached Settings
+    if name.isupper():
+        try:
+            return getattr(get_settings(), name)
+        except AttributeError:
+            pass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
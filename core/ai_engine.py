@@ -1,52 +1,69 @@
+import hashlib
 import json
 import logging
+import threading
+import time
 import requests
-from typing import Dict, Any, Optional
-from config.settings import DEEPSEEK_API_KEY
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Optional, Tuple
+from config.settings import (
+    DEEPSEEK_API_KEY, DEEPSEEK_API_URL, DEEPSEEK_MAX_CONCURRENCY,
+    AI_CACHE_TTL_HOURS, AI_CACHE_MAX_ENTRIES, AI_FORCE_REFRESH,
+    AI_REQUEST_TOKEN_BUDGET, AI_RUN_TOKEN_BUDGET, AI_OUTPUT_TOKENS_PER_SIGNAL
+)
+from core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+MODEL = "deepseek-chat"
+SYSTEM_PROMPT = "You are a Senior Hedge Fund Analyst. You are skeptical, risk-averse, and only approve high-probability setups."
+CHARS_PER_TOKEN = 4 # Rough estimate for English prompts, no tokenizer dependency
+
 class AIEngine:
-    def __init__(self):
+    def __init__(self, db=None, force_refresh: bool = AI_FORCE_REFRESH,
+                 request_token_budget: int = AI_REQUEST_TOKEN_BUDGET, run_token_budget: int = AI_RUN_TOKEN_BUDGET):
         self.api_key = DEEPSEEK_API_KEY
-        self.api_url = "https://api.deepseek.com/v1/chat/completions" # Standard OpenAI-compatible endpoint for DeepSeek usually
+        self.api_url = DEEPSEEK_API_URL
+        self.session = self._create_session()
+        self._limiter = threading.BoundedSemaphore(DEEPSEEK_MAX_CONCURRENCY)
+        self.db = db # DBManager for the verdict cache; None disables caching
+        self.force_refresh = force_refresh
+        self.cache_ttl = AI_CACHE_TTL_HOURS * 3600
+        self.request_token_budget = request_token_budget # Estimated prompt + completion tokens per batched request
+        self.run_token_budget = run_token_budget         # Estimated tokens for all batched requests of one run
+
+    def _create_session(self) -> requests.Session:
+        """Pooled keep-alive session sized to the DeepSeek concurrency limit."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DEEPSEEK_MAX_CONCURRENCY)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
-    def analyze_signal(self, ticker: str, technical_data: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_signal(self, ticker: str, technical_data: Dict[str, Any], force_refresh: Optional[bool] = None) -> Dict[str, Any]:
         """
         Send technical data to DeepSeek AI for validation and trade planning.
+        Verdicts are cached per (ticker, candle date, signal type, input hash); a cache hit skips the HTTP call.
+        force_refresh (default: AI_FORCE_REFRESH) ignores the cached verdict and overwrites it.
         """
         if not self.api_key:
             logger.warning("DeepSeek API Key missing. Skipping AI validation.")
             return {"valid": True, "reason": "AI Skipped (No Key)", "plan": {}}
 
-        prompt = self._construct_prompt(ticker, technical_data)
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": "You are a Senior Hedge Fund Analyst. You are skeptical, risk-averse, and only approve high-probability setups."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.3,
-            "response_format": {"type": "json_object"} # Ensure JSON output if supported, else rely on prompt
-        }
-        
+        payload = self._payload(self._construct_prompt(ticker, technical_data))
+        cache_entry = self._cache_entry(ticker, technical_data, payload)
+
+        cached = self._get_cached(ticker, cache_entry, force_refresh)
+        if cached is not None:
+            return cached
+
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=20)
-            response.raise_for_status()
-            
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            
+            content, _ = self._post(payload)
+
             # Parse JSON from content
             try:
                 ai_analysis = json.loads(content)
-                return ai_analysis
             except json.JSONDecodeError:
                 logger.error("Failed to parse AI response as JSON")
                 return {"valid": False, "reason": "AI JSON Parse Error", "raw": content}
@@ -55,12 +72,207 @@ class AIEngine:
             logger.error(f"AI Request Failed: {e}")
             return {"valid": False, "reason": f"AI Error: {e}"}
 
-    def _construct_prompt(self, ticker: str, data: Dict[str, Any]) -> str:
+        # Only well-formed verdicts are cached; errors and parse failures are retried next run
+        if isinstance(ai_analysis, dict):
+            self._put_cached(ticker, cache_entry, ai_analysis)
+        return ai_analysis
+
+    def analyze_signals(self, signals: Dict[str, Dict[str, Any]], force_refresh: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Batched validation: several tickers per chat completion, one shared system prompt.
+
+        Cached verdicts are served first. The rest are pre-ranked (rank_signals) and packed in rank order
+        into requests of at most request_token_budget estimated tokens, until run_token_budget is spent;
+        lower-ranked signals beyond the run budget are skipped. Each verdict in the returned JSON array
+        must name a ticker of its batch, otherwise that ticker gets an error result.
+        Returns {ticker: verdict} for every input ticker, in input order.
+        """
+        if not signals:
+            return {}
+        if not self.api_key:
+            logger.warning("DeepSeek API Key missing. Skipping AI validation.")
+            return {ticker: {"valid": True, "reason": "AI Skipped (No Key)", "plan": {}} for ticker in signals}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        entries: Dict[str, Tuple[str, str, str, str]] = {}
+        pending = []
+        for ticker, technical_data in signals.items():
+            # Same cache entry as analyze_signal, so both modes share verdicts
+            entries[ticker] = self._cache_entry(ticker, technical_data, self._payload(self._construct_prompt(ticker, technical_data)))
+            cached = self._get_cached(ticker, entries[ticker], force_refresh)
+            if cached is not None:
+                results[ticker] = cached
+            else:
+                pending.append(ticker)
+
+        batches, skipped = self._plan_batches([(t, signals[t]) for t in self.rank_signals({t: signals[t] for t in pending})])
+        for ticker in skipped:
+            results[ticker] = {"valid": False, "reason": "AI Skipped (Token Budget)"}
+        if skipped:
+            logger.warning(f"AI run token budget ({self.run_token_budget}) reached, skipped: {skipped}")
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(DEEPSEEK_MAX_CONCURRENCY, len(batches))) as executor:
+                for verdicts, errors in executor.map(self._validate_batch, batches):
+                    for ticker, verdict in verdicts.items():
+                        results[ticker] = verdict
+                        self._put_cached(ticker, entries[ticker], verdict)
+                    results.update(errors)
+        return {ticker: results[ticker] for ticker in signals}
+
+    @staticmethod
+    def rank_signals(signals: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Order tickers by how much AI budget they deserve: signal strength first
+        (number of confirming signals from analyze()), then volume ratio.
+        """
+        def score(ticker: str):
+            data = signals[ticker]
+            strength = sum(bool(flag) for flag in data.get("signals", {}).values())
+            volume_ratio = data.get("indicators", {}).get("volume_ratio") or 0.0
+            volume_ratio = volume_ratio if volume_ratio == volume_ratio else 0.0 # NaN -> 0
+            return (strength, volume_ratio)
+        return sorted(signals, key=score, reverse=True)
+
+    def _plan_batches(self, ranked: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[List[Tuple[str, Dict[str, Any]]]], List[str]]:
+        """Greedy packing in rank order under the per-request and per-run token budgets."""
+        overhead = self._estimate_tokens(SYSTEM_PROMPT + self._construct_batch_prompt([]))
+        batches, skipped = [], []
+        batch, batch_tokens, run_tokens = [], overhead, 0
+        for ticker, technical_data in ranked:
+            cost = self._estimate_tokens(self._technical_block(ticker, technical_data)) + AI_OUTPUT_TOKENS_PER_SIGNAL
+            if batch and batch_tokens + cost > self.request_token_budget:
+                batches.append(batch)
+                run_tokens += batch_tokens
+                batch, batch_tokens = [], overhead
+            if run_tokens + batch_tokens + cost > self.run_token_budget:
+                skipped.append(ticker)
+                continue
+            batch.append((ticker, technical_data))
+            batch_tokens += cost
+        if batch:
+            batches.append(batch)
+        return batches, skipped
+
+    def _validate_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        One chat completion for a batch; maps the verdict array back to tickers.
+        Returns (verdicts, errors): errors hold results for tickers without a usable verdict (never cached).
+        """
+        tickers = {ticker.upper(): ticker for ticker, _ in batch}
+        payload = self._payload(self._construct_batch_prompt(batch))
+        payload["max_tokens"] = AI_OUTPUT_TOKENS_PER_SIGNAL * len(batch)
+        logger.info(f"Requesting batched AI validation for {list(tickers.values())}...")
+
+        try:
+            content, usage = self._post(payload)
+            if usage:
+                logger.info(f"AI batch of {len(batch)} used {usage.get('total_tokens')} tokens")
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse batched AI response as JSON for {list(tickers.values())}")
+                return {}, {t: {"valid": False, "reason": "AI JSON Parse Error", "raw": content} for t in tickers.values()}
+        except Exception as e:
+            logger.error(f"AI Batch Request Failed for {list(tickers.values())}: {e}")
+            return {}, {t: {"valid": False, "reason": f"AI Error: {e}"} for t in tickers.values()}
+
+        verdicts = data.get("verdicts", []) if isinstance(data, dict) else data
+        results = {}
+        for verdict in verdicts if isinstance(verdicts, list) else []:
+            if not isinstance(verdict, dict):
+                continue
+            named = str(verdict.pop("ticker", "")).strip()
+            ticker = tickers.get(named.upper())
+            if ticker is None or ticker in results or not isinstance(verdict.get("valid"), bool):
+                logger.warning(f"Discarding AI verdict that does not map to the batch: {named or 'NO TICKER'}")
+                continue
+            results[ticker] = verdict
+
+        errors = {}
+        for ticker in tickers.values():
+            if ticker not in results:
+                logger.error(f"[{ticker}] No verdict in batched AI response")
+                errors[ticker] = {"valid": False, "reason": "AI Batch: Missing Verdict"}
+        return results, errors
+
+    # --- Request / Cache helpers ---
+    def _payload(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"} # Ensure JSON output if supported, else rely on prompt
+        }
+
+    def _post(self, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """POST a chat completion; returns (message content, usage)."""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        response = None
+        with self._limiter:
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.api_url, headers=headers, json=payload, timeout=20)
+            finally:
+                metrics.record_request("deepseek", "chat_completions", start, response)
+        response.raise_for_status()
+
+        result = response.json()
+        usage = result.get("usage") or {}
+        metrics.inc("ai_tokens_total", usage.get("total_tokens") or 0)
+        return result['choices'][0]['message']['content'], usage
+
+    @staticmethod
+    def _cache_entry(ticker: str, technical_data: Dict[str, Any], payload: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        """(cache_key, candle_date, signal_type, input_hash) for a single-ticker request payload."""
+        # The payload holds every technical input (via the prompt) plus model settings
+        input_hash = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        candle_date = str(technical_data.get("date", "today"))
+        signal_type = str(technical_data.get("signal_type", "None"))
+        cache_key = hashlib.sha256(f"{ticker}|{candle_date}|{signal_type}|{input_hash}".encode()).hexdigest()
+        return cache_key, candle_date, signal_type, input_hash
+
+    def _get_cached(self, ticker: str, cache_entry: Tuple[str, str, str, str], force_refresh: Optional[bool]) -> Optional[Dict[str, Any]]:
+        force_refresh = self.force_refresh if force_refresh is None else force_refresh
+        if self.db is None or force_refresh:
+            return None
+        cache_key, candle_date, signal_type, _ = cache_entry
+        try:
+            cached = self.db.get_ai_verdict(cache_key, self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"AI cache read failed for {ticker}: {e}")
+            return None
+        metrics.inc("ai_cache_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            logger.info(f"[{ticker}] AI verdict served from cache ({candle_date}, {signal_type})")
+        return cached
+
+    def _put_cached(self, ticker: str, cache_entry: Tuple[str, str, str, str], verdict: Dict[str, Any]):
+        if self.db is None:
+            return
+        cache_key, candle_date, signal_type, input_hash = cache_entry
+        try:
+            self.db.put_ai_verdict(cache_key, ticker, candle_date, signal_type, input_hash,
+                                   verdict, self.cache_ttl, AI_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            logger.warning(f"AI cache write failed for {ticker}: {e}")
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    # --- Prompts ---
+    def _technical_block(self, ticker: str, data: Dict[str, Any]) -> str:
         return f"""
-        Analyze this trading setup for {ticker} (Indonesian Stock).
-        
+        Ticker: {ticker}
         Signal Type: {data.get('signal_type', 'Standard Swing')}
-        
+
         Technical Data:
         - Close: {data['close']}
         - EMA200: {data['indicators']['ema_200']} (Trend: {'Up' if data['signals']['uptrend'] else 'Down'})
@@ -68,29 +280,38 @@ class AIEngine:
         - ATR: {data['indicators']['atr']}
         - Volume Ratio: {data['indicators']['volume_ratio']}x vs Avg (Breakout: {data['signals']['vol_breakout']})
         - Price Change: {data['indicators'].get('price_change', 0) * 100:.2f}%
-        
+        """
+
+    def _task_rules(self) -> str:
+        return """
         Task:
-        1. Validate the setup. 
+        1. Validate the setup.
            - If "BSJP (Overnight Gap)":
              * This is a "Buy Sore Jual Pagi" strategy (Buy Close, Sell Open).
              * Verify strong closing momentum.
              * IGNORE high RSI (it MUST be high for this strat).
              * Plan MUST target selling tomorrow morning.
-           - If "Volatility Breakout": 
+           - If "Volatility Breakout":
              * ACCEPT the trade even if it looks risky/overbought, UNLESS it is essentially a guaranteed loss (e.g. falling knife).
              * If risky, set Valid=True but include "WARNING: High Risk" in the analysis.
              * Focus on managing the risk via Stop Loss rather than rejecting the trade.
            - If "Trend Swing": Is the trend healthy?
         2. If Valid == true, provide a Trade Plan.
            - Entry: Current Close
-           - Stop Loss: 
+           - Stop Loss:
              * For BSJP: -2% to -3% hard stop.
              * For Breakouts: TIGHT SL (e.g., Low of Day or -3% from entry).
              * For Swing: ATR-based (2x ATR).
-           - Take Profit: 
+           - Take Profit:
              * For BSJP: "OPEN PRICE NEXT DAY" (approx +3% target).
              * Others: 1:2 Risk-Reward minimum.
-        
+        """
+
+    def _construct_prompt(self, ticker: str, data: Dict[str, Any]) -> str:
+        return f"""
+        Analyze this trading setup for {ticker} (Indonesian Stock).
+        {self._technical_block(ticker, data)}
+        {self._task_rules()}
         Output JSON Format ONLY:
         {{
             "valid": boolean,
@@ -103,3 +324,27 @@ class AIEngine:
             }}
         }}
         """
+
+    def _construct_batch_prompt(self, batch: List[Tuple[str, Dict[str, Any]]]) -> str:
+        blocks = "".join(self._technical_block(ticker, data) for ticker, data in batch)
+        return f"""
+        Analyze each of these trading setups (Indonesian Stocks) independently.
+        {blocks}
+        {self._task_rules()}
+        Output JSON Format ONLY, with exactly one verdict per ticker above:
+        {{
+            "verdicts": [
+                {{
+                    "ticker": string,
+                    "valid": boolean,
+                    "analysis": "Short concise reasoning (max 2 sentences). Start with 'WARNING:' if high risk.",
+                    "trade_plan": {{
+                        "entry": float,
+                        "stop_loss": float,
+                        "take_profit": float,
+                        "risk_reward": string
+                    }}
+                }}
+            ]
+        }}
+        """
@@ -0,0 +1,186 @@
+"""
+Vectorized backtest of the built-in strategies (Trend Swing, Volatility Breakout, BSJP).
+
+The rule set from core.strategy is evaluated on every historical bar in one pass
+(grouped indicators + boolean column expressions), then all trades of a strategy
+are simulated at once on a (signals x holding days) matrix. No per-bar Python loop.
+
+Trade rules follow the plan the AI is asked to produce:
+- Entry at the signal bar's close.
+- Swing: stop loss 2x ATR below entry, take profit at 1:2 risk-reward.
+- Breakout: stop loss at Low of Day or -3% (whichever is tighter), take profit at 1:2 risk-reward.
+- Swing/Breakout exit on the first bar touching the stop (checked first, conservative) or the target,
+  otherwise at the close after BACKTEST_MAX_HOLD_DAYS bars. Gaps through a level fill at the open.
+- BSJP: sell at the next bar's open.
+Trades without enough following bars to exit (end of data) are left out.
+"""
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    BACKTEST_SWING_ATR_SL, BACKTEST_BREAKOUT_SL_PCT, BACKTEST_RISK_REWARD,
+    BACKTEST_MAX_HOLD_DAYS, BACKTEST_BUY_FEE, BACKTEST_SELL_FEE, ANALYSIS_WORKERS
+)
+from core.parallel_analysis import compute_indicators_parallel
+from core.strategy import _evaluate_rules
+
+logger = logging.getLogger(__name__)
+
+# Strategy name -> rule column from _evaluate_rules
+STRATEGIES = {"swing": "swing", "breakout": "vol_breakout", "bsjp": "bsjp"}
+
+TRADE_COLUMNS = [
+    "strategy", "symbol", "entry_date", "exit_date", "entry", "stop_loss", "take_profit",
+    "exit", "exit_reason", "bars_held", "return",
+]
+
+
+@dataclass
+class BacktestReport:
+    trades: pd.DataFrame      # One row per simulated trade (TRADE_COLUMNS)
+    by_strategy: pd.DataFrame # Metrics per strategy
+    by_symbol: pd.DataFrame   # Metrics per (strategy, symbol)
+
+
+class Backtester:
+    def __init__(self, max_hold_days: int = BACKTEST_MAX_HOLD_DAYS,
+                 buy_fee: float = BACKTEST_BUY_FEE, sell_fee: float = BACKTEST_SELL_FEE, workers: int = ANALYSIS_WORKERS):
+        self.max_hold_days = max(1, max_hold_days)
+        self.workers = workers # Indicator recompute processes (core/parallel_analysis.py)
+        self.buy_fee = buy_fee
+        self.sell_fee = sell_fee
+
+    def run_db(self, db, symbols: List[str], from_date: Optional[str] = None, lookback: int = 100_000) -> BacktestReport:
+        """Backtest straight from daily_candles (one DBManager.get_panel read)."""
+        return self.run(db.get_panel(symbols, lookback=lookback, from_date=from_date))
+
+    def run(self, panel: pd.DataFrame) -> BacktestReport:
+        """Backtest a long-format (symbol, date) candle panel."""
+        if "symbol" not in panel.columns:
+            panel = panel.reset_index()
+        if panel.empty:
+            return _report(pd.DataFrame(columns=TRADE_COLUMNS))
+
+        panel = panel.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+        bars = _evaluate_rules(compute_indicators_parallel(panel, point_in_time=True, workers=self.workers))
+
+        frames = [self._simulate(bars, strategy, column) for strategy, column in STRATEGIES.items()]
+        frames = [frame for frame in frames if not frame.empty]
+        trades = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TRADE_COLUMNS)
+        logger.info(f"Backtest: {len(trades)} trades over {bars['symbol'].nunique()} symbols / {len(bars)} bars")
+        return _report(trades)
+
+    def _simulate(self, bars: pd.DataFrame, strategy: str, column: str) -> pd.DataFrame:
+        entry_idx = np.flatnonzero(bars[column].to_numpy(dtype=bool))
+        if len(entry_idx) == 0:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+
+        n = len(bars)
+        codes = pd.factorize(bars["symbol"])[0]
+        open_ = bars["open"].to_numpy(dtype=float)
+        high = bars["high"].to_numpy(dtype=float)
+        low = bars["low"].to_numpy(dtype=float)
+        close = bars["close"].to_numpy(dtype=float)
+        entry = close[entry_idx]
+
+        # Forward window: the next `hold` bars of the same symbol
+        hold = 1 if strategy == "bsjp" else self.max_hold_days
+        fwd = entry_idx[:, None] + np.arange(1, hold + 1)
+        in_range = fwd < n
+        fwd = np.minimum(fwd, n - 1)
+        available = in_range & (codes[fwd] == codes[entry_idx][:, None])
+
+        # Only trades that can be closed within the data
+        complete = available.all(axis=1)
+        entry_idx, fwd, entry = entry_idx[complete], fwd[complete], entry[complete]
+        if len(entry_idx) == 0:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+
+        if strategy == "bsjp":
+            # Beli Sore Jual Pagi: buy the close, sell the next open
+            exit_pos = np.zeros(len(entry_idx), dtype=int)
+            exit_price = open_[fwd[:, 0]]
+            reason = np.full(len(entry_idx), "next_open", dtype=object)
+            stop_loss = np.full(len(entry_idx), np.nan)
+            take_profit = np.full(len(entry_idx), np.nan)
+        else:
+            if strategy == "swing":
+                stop_loss = entry - BACKTEST_SWING_ATR_SL * bars["atr"].to_numpy(dtype=float)[entry_idx]
+            else:
+                stop_loss = np.maximum(low[entry_idx], entry * (1 - BACKTEST_BREAKOUT_SL_PCT))
+            take_profit = entry + BACKTEST_RISK_REWARD * (entry - stop_loss)
+
+            stop_hit = low[fwd] <= stop_loss[:, None]
+            target_hit = high[fwd] >= take_profit[:, None]
+            touched = stop_hit | target_hit
+            exited = touched.any(axis=1)
+            exit_pos = np.where(exited, touched.argmax(axis=1), hold - 1)
+
+            rows = np.arange(len(entry_idx))
+            exit_bar = fwd[rows, exit_pos]
+            by_stop = exited & stop_hit[rows, exit_pos] # Stop checked first when both are touched the same day
+            by_target = exited & ~by_stop
+            exit_price = np.select(
+                [by_stop, by_target],
+                [np.minimum(open_[exit_bar], stop_loss), np.maximum(open_[exit_bar], take_profit)],
+                default=close[exit_bar],
+            )
+            reason = np.select([by_stop, by_target], ["stop_loss", "take_profit"], default="time").astype(object)
+
+        exit_bar = fwd[np.arange(len(entry_idx)), exit_pos]
+        returns = exit_price * (1 - self.sell_fee) / (entry * (1 + self.buy_fee)) - 1
+
+        return pd.DataFrame({
+            "strategy": strategy,
+            "symbol": bars["symbol"].to_numpy()[entry_idx],
+            "entry_date": bars["date"].to_numpy()[entry_idx],
+            "exit_date": bars["date"].to_numpy()[exit_bar],
+            "entry": entry,
+            "stop_loss": stop_loss,
+            "take_profit": take_profit,
+            "exit": exit_price,
+            "exit_reason": reason,
+            "bars_held": exit_pos + 1,
+            "return": returns,
+        }, columns=TRADE_COLUMNS)
+
+
+def _report(trades: pd.DataFrame) -> BacktestReport:
+    trades = trades.sort_values(["exit_date", "entry_date"], kind="stable").reset_index(drop=True)
+    return BacktestReport(
+        trades=trades,
+        by_strategy=_metrics(trades, ["strategy"]),
+        by_symbol=_metrics(trades, ["strategy", "symbol"]),
+    )
+
+
+def _metrics(trades: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Hit rate, average/total return and max drawdown per group.
+    The equity curve compounds trade returns in exit order (all-in per trade), so drawdown stays within [-1, 0].
+    """
+    columns = ["trades", "hit_rate", "avg_return", "total_return", "max_drawdown", "avg_bars_held"]
+    if trades.empty:
+        return pd.DataFrame(columns=keys + columns).set_index(keys)
+
+    by = [trades[k] for k in keys]
+    ret = trades["return"].astype(float)
+    equity = (1 + ret).groupby(by).cumprod()
+    peak = equity.groupby(by).cummax().clip(lower=1.0) # Starting capital is a peak too
+    drawdown = (equity - peak) / peak
+
+    grouped = ret.groupby(by)
+    out = pd.DataFrame({
+        "trades": grouped.size(),
+        "hit_rate": (ret > 0).groupby(by).mean(),
+        "avg_return": grouped.mean(),
+        "total_return": equity.groupby(by).last() - 1,
+        "max_drawdown": drawdown.groupby(by).min(),
+        "avg_bars_held": trades["bars_held"].astype(float).groupby(by).mean(),
+    })
+    out.index.names = keys
+    return out
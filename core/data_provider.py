@@ -1,51 +1,226 @@
 import logging
-from typing import List
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from config.settings import (
+    GOAPI_KEY, GOAPI_MAX_CONCURRENCY, YFINANCE_MAX_CONCURRENCY, PROVIDER_BREAKER_COOLDOWN,
+    PROVIDER_HEDGE, PROVIDER_HEDGE_QUANTILE, PROVIDER_HEDGE_MIN_DELAY_MS, PROVIDER_HEDGE_MIN_SAMPLES
+)
 from core.goapi_client import GoApiClient
+from core.metrics import metrics
+from core.provider_health import ProviderHealth, CLOSED
 from core.yfinance_client import YFinanceClient
-from database.db_manager import DailyCandle
+from database.db_manager import empty_candle_frame
 
 logger = logging.getLogger(__name__)
 
 class DataProvider:
-    def __init__(self):
-        from config.settings import GOAPI_KEY # Import here to check
+    """
+    GoAPI first, YFinance as fallback, routed by provider health (core/provider_health.py):
+    GoAPI failures open a circuit breaker, YFinance serves everything during the cooldown,
+    then one half-open probe decides whether GoAPI is back.
+    With hedging, a GoAPI history call slower than its recent PROVIDER_HEDGE_QUANTILE latency
+    also fires YFinance, and the first usable answer wins.
+    """
+
+    def __init__(self, hedge: bool = PROVIDER_HEDGE):
         self.goapi = GoApiClient()
         self.yfinance = YFinanceClient()
-        
-        # Circuit Breaker State
-        # If no key, trip immediately
-        self.use_fallback_mode = False if GOAPI_KEY else True
-        
-        if self.use_fallback_mode:
+        self.health: Dict[str, ProviderHealth] = {"goapi": ProviderHealth("goapi"), "yfinance": ProviderHealth("yfinance")}
+        self.hedge = hedge
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+        # No key: GoAPI is never tried
+        self.goapi_disabled = not GOAPI_KEY
+        if self.goapi_disabled:
             logger.warning("GOAPI_KEY missing. Initializing DataProvider in FALLBACK MODE (YFinance Only).")
-    
-    def get_historical_data(self, symbol: str, from_date: str = None, to_date: str = None) -> List[DailyCandle]:
+
+    @property
+    def use_fallback_mode(self) -> bool:
+        """True while GoAPI is unusable: no key, or its circuit is open and cooling down."""
+        return self.goapi_disabled or not self.health["goapi"].available
+
+    def get_historical_data(self, symbol: str, from_date: str = None, to_date: str = None) -> pd.DataFrame:
         """
-        Try GoAPI first. If it fails (returns empty or error logs inside client), switch to YFinance.
-        If Circuit Breaker is tripped (use_fallback_mode = True), skip GoAPI entirely.
+        Try GoAPI first. If it fails (returns empty or raises), switch to YFinance.
+        While the circuit breaker is open, skip GoAPI entirely.
         """
         # 1. Check Circuit Breaker
-        if self.use_fallback_mode:
+        if not self._allow_goapi():
             logger.info(f"Circuit Breaker Active: Skipping GoAPI for {symbol}, using YFinance.")
-            return self.yfinance.get_historical_data(symbol, from_date, to_date)
+            return self._yfinance_history(symbol, from_date, to_date)
 
-        # 2. Try GoAPI
+        # 2. Try GoAPI (hedged with YFinance when it is slow)
+        logger.info(f"Attempting fetch from GoAPI for {symbol}...")
+        delay = self._hedge_delay()
+        if delay is not None:
+            return self._hedged_history(symbol, from_date, to_date, delay)
         try:
-            logger.info(f"Attempting fetch from GoAPI for {symbol}...")
-            data = self.goapi.get_historical_data(symbol, from_date, to_date)
-            
-            if data:
+            data = self._goapi_history(symbol, from_date, to_date)
+            if not data.empty:
                 return data
-            else:
-                logger.warning(f"GoAPI returned no data for {symbol}. Switching to Fallback.")
-                # Optional: Decide if empty data triggers circuit breaker? 
-                # Let's say NO for specific stock missing, YES for API error.
-                # But here we are in the 'data is None' block which might vary.
-                # safely just fall through for now. 
-        except Exception as e:
-            logger.error(f"GoAPI Exception: {e}. TRIPPING CIRCUIT BREAKER.")
-            self.use_fallback_mode = True # Trip the break
-            
+            # Missing symbol, not an API error: fall through without tripping the breaker
+            logger.warning(f"GoAPI returned no data for {symbol}. Switching to Fallback.")
+        except Exception:
+            pass # Logged and recorded (maybe tripping the breaker) by _goapi_history
+
         # 3. Fallback to YFinance
         logger.info(f"FALLBACK: Fetching from YFinance for {symbol}...")
-        return self.yfinance.get_historical_data(symbol, from_date, to_date)
+        return self._yfinance_history(symbol, from_date, to_date)
+
+    @property
+    def batch_preferred(self) -> bool:
+        """In fallback mode one multi-ticker yfinance download beats N single downloads."""
+        return self.use_fallback_mode
+
+    def get_historical_data_batch(self, symbols: List[str], from_date: str = None, to_date: str = None) -> pd.DataFrame:
+        """
+        History for many symbols over the same range.
+        GoAPI not healthy (open or half-open): one batched yfinance download. Otherwise per-symbol with the usual routing.
+        """
+        if self.use_fallback_mode or self.health["goapi"].state != CLOSED:
+            logger.info(f"Circuit Breaker Active: batch-fetching {len(symbols)} symbols from YFinance.")
+            return self._yfinance_history_batch(symbols, from_date, to_date)
+
+        frames = [self.get_historical_data(symbol, from_date, to_date) for symbol in symbols]
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else empty_candle_frame()
+
+    def get_daily_append(self, symbols: List[str]) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Fetch today's candle for many symbols through GoAPI bulk prices (ceil(N/50) requests).
+        Returns (candles, missing): symbols absent from the response should be retried
+        individually through get_historical_data. In fallback mode every symbol is reported missing.
+        """
+        if not symbols or not self._allow_goapi():
+            return empty_candle_frame(), list(symbols)
+
+        start = time.perf_counter()
+        try:
+            candles, succeeded, failed = self.goapi.get_bulk_prices_with_failures(symbols)
+        except Exception as e:
+            self._goapi_failed(start, f"GoAPI Bulk Exception: {e}")
+            return empty_candle_frame(), list(symbols)
+        # One health outcome per chunk request, so partial outages count too
+        for _ in range(failed):
+            self._goapi_failed(start, f"GoAPI bulk prices request failed ({failed}/{succeeded + failed} chunks)")
+        if candles.empty:
+            if not failed:
+                # Answered, but nothing at all back still counts as a failure
+                self._goapi_failed(start, f"GoAPI bulk prices returned nothing for {len(symbols)} symbols")
+            return candles, list(symbols)
+        for _ in range(succeeded):
+            self._goapi_ok(start)
+
+        returned = set(candles["symbol"])
+        missing = [s for s in symbols if s not in returned]
+        if missing:
+            logger.warning(f"GoAPI bulk prices missing {len(missing)}/{len(symbols)} symbols: {missing}")
+        return candles, missing
+
+    def health_report(self) -> List[Dict[str, object]]:
+        """Rolling latency / error rate / breaker state per provider (for logs and status output)."""
+        return [health.snapshot() for health in self.health.values()]
+
+    # --- GoAPI with health accounting ---
+    def _allow_goapi(self) -> bool:
+        if self.goapi_disabled:
+            return False
+        health = self.health["goapi"]
+        state = health.state
+        allowed = health.allow()
+        if allowed and state != CLOSED:
+            logger.info("GoAPI cooldown over, probing it again (half-open)")
+        return allowed
+
+    def _goapi_history(self, symbol: str, from_date: Optional[str], to_date: Optional[str]) -> pd.DataFrame:
+        """GoAPI history; request failures are recorded (and may trip the breaker) before re-raising."""
+        start = time.perf_counter()
+        try:
+            data = self.goapi.get_historical_data(symbol, from_date, to_date)
+        except Exception as e:
+            self._goapi_failed(start, f"GoAPI Exception for {symbol}: {e}")
+            raise
+        self._goapi_ok(start)
+        return data
+
+    def _goapi_ok(self, start: float):
+        if self.health["goapi"].record_success(time.perf_counter() - start):
+            logger.info("GoAPI probe succeeded, circuit breaker closed")
+
+    def _goapi_failed(self, start: float, message: str):
+        if self.health["goapi"].record_failure(time.perf_counter() - start):
+            metrics.inc("circuit_breaker_trips_total", provider="goapi")
+            logger.error(f"{message}. TRIPPING CIRCUIT BREAKER for {PROVIDER_BREAKER_COOLDOWN:.0f}s.")
+        else:
+            logger.error(message)
+
+    # --- YFinance with health accounting ---
+    def _yfinance_history(self, symbol: str, from_date: Optional[str], to_date: Optional[str]) -> pd.DataFrame:
+        return self._yfinance_history_batch([symbol], from_date, to_date)
+
+    def _yfinance_history_batch(self, symbols: List[str], from_date: Optional[str], to_date: Optional[str]) -> pd.DataFrame:
+        start = time.perf_counter()
+        data = self.yfinance.get_historical_data_batch(symbols, from_date, to_date)
+        # YFinance errors come back as an empty frame
+        if data.empty:
+            self.health["yfinance"].record_failure(time.perf_counter() - start)
+        else:
+            self.health["yfinance"].record_success(time.perf_counter() - start)
+        return data
+
+    # --- Hedged requests ---
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for GoAPI before hedging; None when hedging is off or GoAPI has too few samples."""
+        if not self.hedge:
+            return None
+        quantile = self.health["goapi"].latency_quantile(PROVIDER_HEDGE_QUANTILE, PROVIDER_HEDGE_MIN_SAMPLES)
+        if quantile is None:
+            return None
+        return max(quantile, PROVIDER_HEDGE_MIN_DELAY_MS / 1000)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Room for every in-flight GoAPI call plus its hedge (the clients' limiters still cap each service)
+                workers = 2 * (GOAPI_MAX_CONCURRENCY + YFINANCE_MAX_CONCURRENCY)
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+            return self._pool
+
+    def _hedged_history(self, symbol: str, from_date: Optional[str], to_date: Optional[str], delay: float) -> pd.DataFrame:
+        """
+        GoAPI, plus YFinance if GoAPI has not answered within `delay`; the first non-empty answer wins.
+        A losing GoAPI call keeps running in the background so its latency still feeds the health window.
+        """
+        pool = self._executor()
+        primary = pool.submit(self._goapi_history, symbol, from_date, to_date)
+        try:
+            data = primary.result(timeout=delay)
+            if not data.empty:
+                return data
+            logger.warning(f"GoAPI returned no data for {symbol}. Switching to Fallback.")
+        except FuturesTimeout:
+            return self._race(symbol, primary, pool.submit(self._yfinance_history, symbol, from_date, to_date), delay)
+        except Exception:
+            pass # Logged and recorded (maybe tripping the breaker) by _goapi_history
+
+        logger.info(f"FALLBACK: Fetching from YFinance for {symbol}...")
+        return self._yfinance_history(symbol, from_date, to_date)
+
+    def _race(self, symbol: str, primary, hedge, delay: float) -> pd.DataFrame:
+        logger.info(f"[{symbol}] GoAPI slower than {1000 * delay:.0f} ms, hedging with YFinance")
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and not future.result().empty:
+                    winner = "goapi" if future is primary else "yfinance"
+                    metrics.inc("provider_hedges_total", winner=winner)
+                    logger.info(f"[{symbol}] Hedged fetch won by {winner}")
+                    return future.result()
+        metrics.inc("provider_hedges_total", winner="none")
+        logger.warning(f"No data for {symbol} from GoAPI or YFinance")
+        return empty_candle_frame()
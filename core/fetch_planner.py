@@ -0,0 +1,207 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import HISTORY_LOOKBACK_DAYS, MAX_GAP_WEEKDAYS
+from database.db_manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+DATE_FMT = "%Y-%m-%d"
+
+
+@dataclass
+class FetchPlan:
+    """
+    Date ranges that must be requested for one symbol.
+    Each range is (from_date, to_date) with to_date EXCLUSIVE (yfinance convention).
+    """
+    symbol: str
+    window_start: str
+    ranges: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.ranges
+
+
+class FetchPlanner:
+    """
+    Gap-aware history fetcher.
+    Looks at what `daily_candles` already holds for a symbol and only requests
+    the missing tail, interior holes and (if needed) the head of the analysis window.
+    The full window is then read back from SQLite.
+    Head and hole requests that come back without candles inside the gap (late listing,
+    suspension) are remembered in `empty_ranges` and not requested again.
+    """
+
+    def __init__(self, db: DBManager, client, lookback_days: int = HISTORY_LOOKBACK_DAYS):
+        self.db = db
+        self.client = client  # DataProvider (or anything with get_historical_data)
+        self.lookback_days = lookback_days
+
+    def plan(self, symbol: str, today: Optional[date] = None) -> FetchPlan:
+        today = today or datetime.now().date()
+        window_start = today - timedelta(days=self.lookback_days)
+        tomorrow = today + timedelta(days=1)
+        plan = FetchPlan(symbol=symbol, window_start=window_start.strftime(DATE_FMT))
+
+        latest = self.db.get_latest_candle(symbol)
+        if latest is None:
+            # Nothing stored yet -> seed the whole window
+            plan.ranges.append((plan.window_start, tomorrow.strftime(DATE_FMT)))
+            return plan
+
+        ranges = []
+
+        # 1. Tail: re-fetch from the latest stored candle (it may have been partial) up to today
+        ranges.append((latest.date, tomorrow.strftime(DATE_FMT)))
+
+        # 2. Gap scan over what we already hold inside the window
+        stored = self.db.get_candle_dates(symbol, from_date=plan.window_start)
+        if stored:
+            gaps = []
+            # Head: window start is not covered
+            if self._weekdays_between(plan.window_start, stored[0]) > MAX_GAP_WEEKDAYS:
+                gaps.append((plan.window_start, stored[0]))
+
+            # Interior holes: consecutive stored dates too far apart (weekends/short holidays are tolerated)
+            gaps.extend(self._find_holes(stored))
+
+            # Gaps the provider already answered empty (listed later, suspended) are not asked again
+            empty = self.db.get_empty_ranges(symbol) if gaps else []
+            for start, end in gaps:
+                if not any(known_start <= start and end <= known_end for known_start, known_end in empty):
+                    # Range end is exclusive, so ask up to (and including) the stored candle after the gap
+                    ranges.append((start, self._day_after(end)))
+        else:
+            # Latest candle is older than the window
+            ranges.append((plan.window_start, latest.date))
+
+        plan.ranges = self._merge_ranges(ranges)
+        return plan
+
+    def update(self, symbol: str, today: Optional[date] = None) -> int:
+        """
+        Fetch only what is missing and store it (indicator state is advanced by the upsert).
+        Returns the number of candles written.
+        """
+        plan = self.plan(symbol, today)
+        written = 0
+        for from_date, to_date in plan.ranges:
+            logger.info(f"Fetching {symbol} {from_date} -> {to_date}")
+            candles = self.client.get_historical_data(symbol, from_date=from_date, to_date=to_date)
+            if not candles.empty:
+                written += self.db.upsert_candles(candles)
+                self._remember_empty(symbol, from_date, candles["date"].tolist())
+        return written
+
+    def update_many(self, symbols: List[str], today: Optional[date] = None) -> int:
+        """
+        update() for many symbols, batching history requests that share the same date range
+        (on a normal daily run every symbol has the same tail range -> one request).
+        Returns the number of candles written.
+        """
+        by_range: Dict[Tuple[str, str], List[str]] = {}
+        for symbol in symbols:
+            for date_range in self.plan(symbol, today).ranges:
+                by_range.setdefault(date_range, []).append(symbol)
+
+        written = 0
+        for (from_date, to_date), range_symbols in by_range.items():
+            logger.info(f"Batch fetching {len(range_symbols)} symbols {from_date} -> {to_date}")
+            candles = self.client.get_historical_data_batch(range_symbols, from_date=from_date, to_date=to_date)
+            if not candles.empty:
+                written += self.db.upsert_candles(candles)
+                for symbol, dates in candles.groupby("symbol", sort=False)["date"]:
+                    self._remember_empty(symbol, from_date, dates.tolist())
+        return written
+
+    def daily_append(self, symbols: List[str], today: Optional[date] = None) -> List[str]:
+        """
+        Daily-append mode: symbols whose only missing piece is the latest trading day
+        are refreshed with one bulk request per 50 symbols instead of one history request each.
+        Returns the symbols that still need a per-symbol update() (not eligible, or missing from the bulk response).
+        """
+        today = today or datetime.now().date()
+        eligible, remaining = [], []
+        for symbol in symbols:
+            (eligible if self._is_tail_only(self.plan(symbol, today), today) else remaining).append(symbol)
+
+        if eligible:
+            logger.info(f"Daily append: bulk-fetching {len(eligible)} symbols")
+            candles, missing = self.client.get_daily_append(eligible)
+            if not candles.empty:
+                self.db.upsert_candles(candles)
+            remaining.extend(missing)
+
+        # Keep the caller's order
+        remaining = set(remaining)
+        return [s for s in symbols if s in remaining]
+
+    @staticmethod
+    def _is_tail_only(plan: FetchPlan, today: date) -> bool:
+        """True when the plan is a single tail range starting at most one business day before today."""
+        if len(plan.ranges) != 1:
+            return False
+        start, _ = plan.ranges[0]
+        return int(np.busday_count(start, today.strftime(DATE_FMT))) <= 1
+
+    def sync(self, symbol: str, today: Optional[date] = None) -> pd.DataFrame:
+        """
+        Fetch only what is missing, store it, and return the full analysis window from SQLite
+        as a candle frame.
+        """
+        today = today or datetime.now().date()
+        self.update(symbol, today)
+        window_start = (today - timedelta(days=self.lookback_days)).strftime(DATE_FMT)
+        return self.db.get_history_frame(symbol, limit=self.lookback_days, from_date=window_start)
+
+    def _remember_empty(self, symbol: str, from_date: str, dates: List[str]):
+        """
+        After a provider answered a request starting at from_date with candles on `dates`: store the
+        head gap and holes it left, which plan() would otherwise request again on every run.
+        A request answered with no candles at all proves nothing (the provider may have failed).
+        """
+        dates = sorted(set(dates))
+        gaps = self._find_holes(dates)
+        if self._weekdays_between(from_date, dates[0]) > MAX_GAP_WEEKDAYS:
+            gaps.insert(0, (from_date, dates[0]))
+        if gaps:
+            logger.info(f"{symbol}: no candles from the provider in {gaps}, not requesting them again")
+            self.db.add_empty_ranges(symbol, gaps)
+
+    # --- Helpers ---
+    @staticmethod
+    def _weekdays_between(start: str, end: str) -> int:
+        """Number of weekdays in [start, end)."""
+        return int(np.busday_count(start, end))
+
+    @staticmethod
+    def _day_after(day: str) -> str:
+        return (datetime.strptime(day, DATE_FMT) + timedelta(days=1)).strftime(DATE_FMT)
+
+    def _find_holes(self, dates: List[str]) -> List[Tuple[str, str]]:
+        """(previous, next) pairs of consecutive dates with more than MAX_GAP_WEEKDAYS weekdays between them."""
+        if len(dates) < 2:
+            return []
+        starts = np.array(dates[:-1], dtype="datetime64[D]")
+        ends = np.array(dates[1:], dtype="datetime64[D]")
+        # Weekdays strictly between two stored candles
+        missing = np.busday_count(starts, ends) - 1
+        holes = np.nonzero(missing > MAX_GAP_WEEKDAYS)[0]
+        return [(dates[i], dates[i + 1]) for i in holes]
+
+    @staticmethod
+    def _merge_ranges(ranges: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        merged: List[Tuple[str, str]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
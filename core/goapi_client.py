@@ -1,19 +1,30 @@
+import pandas as pd
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import logging
-from typing import List, Dict, Any, Optional
-from config.settings import GOAPI_KEY, API_BASE_URL
-from database.db_manager import DailyCandle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from config.settings import GOAPI_KEY, API_BASE_URL, GOAPI_MAX_CONCURRENCY, GOAPI_BULK_CHUNK_SIZE
+from core.metrics import metrics
+from core.response_cache import get_response_cache
+from database.db_manager import empty_candle_frame, to_candle_frame
 
 # Configure Logging
 logger = logging.getLogger(__name__)
 
+HISTORY_FIELDS = ["date", "open", "high", "low", "close", "volume"]
+BULK_FIELDS = ["symbol"] + HISTORY_FIELDS + ["change", "change_pct"]
+
 class GoApiClient:
     def __init__(self):
         self.api_key = GOAPI_KEY
         self.base_url = API_BASE_URL
         self.session = self._create_session()
+        self._limiter = threading.BoundedSemaphore(GOAPI_MAX_CONCURRENCY)
+        self.cache = get_response_cache() # None unless HTTP_CACHE_ENABLED
 
     def _create_session(self) -> requests.Session:
         """Create a requests session with exponential backoff retry."""
@@ -24,23 +35,80 @@ class GoApiClient:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["GET"]
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=GOAPI_MAX_CONCURRENCY)
         session.mount("https://", adapter)
         session.mount("http://", adapter)
         return session
 
-    def get_bulk_prices(self, symbols: List[str]) -> List[DailyCandle]:
+    def _get(self, endpoint: str, url: str, params: Dict[str, Any]) -> requests.Response:
+        """Rate-limited GET, timed per endpoint (the limiter wait is not counted)."""
+        response = None
+        with self._limiter:
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=10)
+            finally:
+                metrics.record_request("goapi", endpoint, start, response)
+        return response
+
+    def _get_json(self, endpoint: str, url: str, params: Dict[str, Any], to_date: Optional[str] = None,
+                  use_cache: bool = True) -> Dict[str, Any]:
         """
-        Fetch latest prices for up to 50 symbols in one request.
+        GET and decode. Successful answers with data are kept in the response cache (when enabled)
+        until the range ending at `to_date` can change: never for past ranges, else the next close.
+        An empty answer may be transient, so it is never cached.
         """
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            key = cache.key("goapi", endpoint, url=url, **{k: v for k, v in params.items() if k != "api_key"})
+            cached = cache.get(key, "goapi")
+            if cached is not None:
+                return cached
+
+        response = self._get(endpoint, url, params)
+        response.raise_for_status()
+        data_json = response.json()
+        if cache is not None and data_json.get("status") == "success" and self._results(data_json):
+            cache.put(key, "goapi", endpoint, data_json, cache.expires_at(to_date))
+        return data_json
+
+    @staticmethod
+    def _results(data_json: Dict[str, Any]) -> List[Any]:
+        """Items of a response: the API might return `data` as a list OR a dict with 'results'."""
+        raw_data = data_json.get("data", [])
+        if isinstance(raw_data, dict):
+            raw_data = raw_data.get("results", [])
+        return raw_data if isinstance(raw_data, list) else []
+
+    def get_bulk_prices(self, symbols: List[str], use_cache: bool = True) -> pd.DataFrame:
+        """
+        Fetch latest prices for any number of symbols.
+        The list is split into chunks of GOAPI_BULK_CHUNK_SIZE (GoAPI allows 50 per request),
+        chunks are requested concurrently and the results merged.
+        Symbols missing from the response are simply absent; callers diff against their list.
+        use_cache=False always asks GoAPI (intraday polling needs live prices).
+        """
+        return self.get_bulk_prices_with_failures(symbols, use_cache)[0]
+
+    def get_bulk_prices_with_failures(self, symbols: List[str], use_cache: bool = True) -> Tuple[pd.DataFrame, int, int]:
+        """get_bulk_prices() plus (succeeded, failed) chunk request counts, for provider health accounting."""
         if not symbols:
-            return []
-            
-        # Limit to 50 per batch as per GoAPI Spec
-        if len(symbols) > 50:
-            logger.warning("Symbol list > 50. Splitting is not implemented in MVP. Truncating to 50.")
-            symbols = symbols[:50]
-            
+            return empty_candle_frame(), 0, 0
+
+        chunks = [symbols[i:i + GOAPI_BULK_CHUNK_SIZE] for i in range(0, len(symbols), GOAPI_BULK_CHUNK_SIZE)]
+        if len(chunks) == 1:
+            results = [self._get_bulk_chunk(chunks[0], use_cache)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(GOAPI_MAX_CONCURRENCY, len(chunks))) as executor:
+                # map() keeps chunk order, so the merged frame follows the input order
+                results = list(executor.map(lambda chunk: self._get_bulk_chunk(chunk, use_cache), chunks))
+        frames = [frame for frame, ok in results if not frame.empty]
+        failed = sum(1 for _, ok in results if not ok)
+        candles = pd.concat(frames, ignore_index=True) if frames else empty_candle_frame()
+        return candles, len(results) - failed, failed
+
+    def _get_bulk_chunk(self, symbols: List[str], use_cache: bool = True) -> Tuple[pd.DataFrame, bool]:
+        """Fetch latest prices for up to 50 symbols in one request. Returns (candles, request succeeded)."""
         endpoint = f"{self.base_url}/stock/idx/prices"
         symbols_str = ",".join(symbols)
         
@@ -50,45 +118,58 @@ class GoApiClient:
         }
         
         try:
-            response = self.session.get(endpoint, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data_json = response.json()
+            data_json = self._get_json("prices", endpoint, params, use_cache=use_cache)
             
             if data_json.get("status") != "success":
                 logger.error(f"GoAPI Error: {data_json.get('message')}")
-                return []
+                return empty_candle_frame(), False
                 
-            results = data_json.get("data", [])
-            
-            candles = []
-            for item in results:
-                # Map API response to DB Model
-                # API format: {'date': '2025-01-01', 'symbol': 'BBCA', 'close': 1000, ...}
-                try:
-                    candle = DailyCandle(
-                        symbol=item['symbol'],
-                        date=item['date'],
-                        open=float(item['open']),
-                        high=float(item['high']),
-                        low=float(item['low']),
-                        close=float(item['close']),
-                        volume=int(item['volume']),
-                        change=float(item.get('change', 0)),
-                        change_pct=float(item.get('change_pct', 0))
-                    )
-                    candles.append(candle)
-                except KeyError as e:
-                    logger.error(f"Missing field in API response for {item.get('symbol', 'UNKNOWN')}: {e}")
-                    continue
-                    
-            return candles
+            return self._bulk_frame(self._results(data_json)), True
 
         except requests.exceptions.RequestException as e:
             logger.error(f"API Request Failed: {e}")
+            return empty_candle_frame(), False
+
+    @staticmethod
+    def _bulk_frame(results: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Map the bulk API response to a candle frame, dropping items with missing fields."""
+        # API format: {'date': '2025-01-01', 'symbol': 'BBCA', 'close': 1000, ...}
+        items = [item for item in results if isinstance(item, dict)]
+        if not items:
+            return empty_candle_frame()
+        df = pd.DataFrame(items).reindex(columns=BULK_FIELDS)
+
+        incomplete = df[HISTORY_FIELDS + ["symbol"]].isna().any(axis=1)
+        if incomplete.any():
+            logger.error(f"Missing fields in API response for {df.loc[incomplete, 'symbol'].fillna('UNKNOWN').tolist()}")
+            df = df.loc[~incomplete]
+        df[["change", "change_pct"]] = df[["change", "change_pct"]].fillna(0)
+        return to_candle_frame(df)
+
+    def get_companies(self) -> List[str]:
+        """
+        All listed IDX symbols (the scan universe).
+        Returns an empty list on failure; callers fall back to stored symbols / the watchlist.
+        """
+        endpoint = f"{self.base_url}/stock/idx/companies"
+        try:
+            data_json = self._get_json("companies", endpoint, {"api_key": self.api_key})
+            if data_json.get("status") != "success":
+                logger.error(f"GoAPI Companies Error: {data_json.get('message')}")
+                return []
+
+            raw_data = data_json.get("data", [])
+            results = raw_data.get("results", []) if isinstance(raw_data, dict) else raw_data
+            if not isinstance(results, list):
+                return []
+            symbols = [item.get("symbol") for item in results if isinstance(item, dict)]
+            return list(dict.fromkeys(s for s in symbols if s))
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API Companies Request Failed: {e}")
             return []
 
-    def get_historical_data(self, symbol: str, from_date: Optional[str] = None, to_date: Optional[str] = None) -> List[DailyCandle]:
+    def get_historical_data(self, symbol: str, from_date: Optional[str] = None, to_date: Optional[str] = None) -> pd.DataFrame:
         """
         Fetch historical data for a single symbol.
         Used for initial seeding.
@@ -101,43 +182,22 @@ class GoApiClient:
             params['to'] = to_date
             
         try:
-            response = self.session.get(endpoint, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data_json = response.json()
+            data_json = self._get_json("historical", endpoint, params, to_date)
              
             if data_json.get("status") != "success":
                 logger.error(f"GoAPI History Error for {symbol}: {data_json.get('message')}")
-                return []
+                return empty_candle_frame()
                 
-            raw_data = data_json.get("data", [])
-            logger.debug(f"Historical Data Type: {type(raw_data)}")
-            
-            # Defensive handling: API might return list OR dict with 'results'
-            if isinstance(raw_data, dict):
-                results = raw_data.get("results", [])
-            elif isinstance(raw_data, list):
-                results = raw_data
-            else:
-                results = []
-            
-            candles = []
-            for item in results:
-                if not isinstance(item, dict):
-                    logger.warning(f"Unexpected item type in history: {type(item)} - {item}")
-                    continue
-                    
-                candle = DailyCandle(
-                    symbol=symbol, 
-                    date=item['date'],
-                    open=float(item['open']),
-                    high=float(item['high']),
-                    low=float(item['low']),
-                    close=float(item['close']),
-                    volume=int(item['volume'])
-                )
-                candles.append(candle)
-            return candles
+            results = self._results(data_json)
+            items = [item for item in results if isinstance(item, dict)]
+            if len(items) != len(results):
+                logger.warning(f"Skipping {len(results) - len(items)} unexpected items in {symbol} history")
+            if not items:
+                return empty_candle_frame()
+
+            df = pd.DataFrame(items)
+            df["symbol"] = symbol
+            return to_candle_frame(df[HISTORY_FIELDS + ["symbol"]])
 
         except requests.exceptions.RequestException as e:
             logger.error(f"API History Request Failed for {symbol}: {e}")
@@ -0,0 +1,215 @@
+"""
+Streaming (recursive) indicator state.
+
+EMA200/EMA50/EMA20, Wilder RSI(14), ATR(14) and the 20-day volume SMA are updated
+one candle at a time from a small state, using the same definitions as pandas_ta
+(SMA-seeded EMA/ATR, RMA-smoothed RSI). A daily update is O(1) per symbol.
+"""
+from typing import Any, Dict, Iterable, Optional
+import numpy as np
+import pandas as pd
+from config.settings import (
+    EMA_LONG, EMA_MEDIUM, EMA_SHORT,
+    RSI_LENGTH, ATR_LENGTH, VOLUME_SMA_LENGTH
+)
+
+EMA_LENGTHS = {"ema_200": EMA_LONG, "ema_50": EMA_MEDIUM, "ema_20": EMA_SHORT}
+
+# Same order as strategy.SNAPSHOT_COLUMNS (strategy imports this module, so it is not imported back)
+SNAPSHOT_COLUMNS = [
+    "open", "high", "low", "close", "volume",
+    "ema_200", "ema_50", "ema_20", "rsi", "atr", "vol_avg",
+    "prev_close", "prev_rsi", "prev_ema_20", "prev_ema_50",
+]
+
+
+def new_state(symbol: str) -> Dict[str, Any]:
+    return {
+        "symbol": symbol,
+        "last_date": None,
+        "bars": 0,
+        # Latest candle
+        "open": None, "high": None, "low": None, "close": None, "volume": None,
+        "prev_close": None,
+        # EMA seeds use the running close sum until each EMA has `length` bars
+        "close_sum": 0.0,
+        "ema_200": None, "ema_50": None, "ema_20": None,
+        "prev_ema_20": None, "prev_ema_50": None,
+        # RSI (RMA of gains / losses)
+        "avg_gain": None, "avg_loss": None,
+        "rsi": None, "prev_rsi": None,
+        # ATR (SMA-seeded RMA of true range)
+        "tr_sum": 0.0, "atr": None,
+        # Volume SMA
+        "volume_window": [], "vol_avg": None,
+    }
+
+
+def step(state: Dict[str, Any], candle: Dict[str, Any]) -> Dict[str, Any]:
+    """Advance the state by one candle (dict with date, open, high, low, close, volume). Mutates and returns state."""
+    i = state["bars"]
+    close = float(candle["close"])
+    high = float(candle["high"])
+    low = float(candle["low"])
+    prev_close = state["close"]
+
+    state["prev_close"] = prev_close
+    state["prev_ema_20"] = state["ema_20"]
+    state["prev_ema_50"] = state["ema_50"]
+    state["prev_rsi"] = state["rsi"]
+
+    # EMA
+    state["close_sum"] += close
+    for key, length in EMA_LENGTHS.items():
+        if i == length - 1:
+            state[key] = state["close_sum"] / length
+        elif i >= length:
+            state[key] += (2.0 / (length + 1)) * (close - state[key])
+
+    # RSI
+    if i >= 1:
+        change = close - prev_close
+        gain, loss = max(change, 0.0), min(change, 0.0)
+        if i == 1:
+            state["avg_gain"], state["avg_loss"] = gain, loss
+        else:
+            state["avg_gain"] += (gain - state["avg_gain"]) / RSI_LENGTH
+            state["avg_loss"] += (loss - state["avg_loss"]) / RSI_LENGTH
+        denominator = state["avg_gain"] + abs(state["avg_loss"])
+        state["rsi"] = 100 * state["avg_gain"] / denominator if denominator else None
+
+    # ATR
+    if i == 0:
+        true_range = high - low
+    else:
+        true_range = max(high - low, abs(high - prev_close), abs(prev_close - low))
+    if i < ATR_LENGTH - 1:
+        state["tr_sum"] += true_range
+    elif i == ATR_LENGTH - 1:
+        state["atr"] = (state["tr_sum"] + true_range) / ATR_LENGTH
+    else:
+        state["atr"] += (true_range - state["atr"]) / ATR_LENGTH
+
+    # Volume SMA
+    window = (list(state["volume_window"]) + [int(candle["volume"])])[-VOLUME_SMA_LENGTH:]
+    state["volume_window"] = window
+    state["vol_avg"] = sum(window) / VOLUME_SMA_LENGTH if len(window) == VOLUME_SMA_LENGTH else None
+
+    state["open"] = float(candle["open"])
+    state["high"] = high
+    state["low"] = low
+    state["close"] = close
+    state["volume"] = int(candle["volume"])
+    state["last_date"] = candle["date"]
+    state["bars"] = i + 1
+    return state
+
+
+def build_state(symbol: str, candles: Iterable[Dict[str, Any]], state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fold candles (sorted by date ASC) into a state, starting fresh unless one is given."""
+    state = state or new_state(symbol)
+    for candle in candles:
+        step(state, candle)
+    return state
+
+
+def snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Latest/previous indicator values in the shape the rule set reads (strategy.SNAPSHOT_COLUMNS).
+    Mirrors analyze(): EMA200 is a 0 placeholder below EMA_LONG bars, RSI/ATR need length + 1 bars.
+    """
+    bars = state["bars"]
+    has_rsi = bars > RSI_LENGTH
+    return {
+        "open": state["open"],
+        "high": state["high"],
+        "low": state["low"],
+        "close": state["close"],
+        "volume": state["volume"],
+        "ema_200": state["ema_200"] if bars >= EMA_LONG else 0,
+        "ema_50": state["ema_50"],
+        "ema_20": state["ema_20"],
+        "rsi": state["rsi"] if has_rsi else None,
+        "atr": state["atr"] if bars > ATR_LENGTH else None,
+        "vol_avg": state["vol_avg"],
+        "prev_close": state["prev_close"],
+        "prev_rsi": state["prev_rsi"] if has_rsi else None,
+        "prev_ema_20": state["prev_ema_20"],
+        "prev_ema_50": state["prev_ema_50"],
+    }
+
+
+# --- Vectorized (many symbols, one new candle each) ---
+PRIOR_COLUMNS = [
+    "bars", "close", "close_sum", "ema_200", "ema_50", "ema_20",
+    "avg_gain", "avg_loss", "rsi", "tr_sum", "atr", "vol_tail_sum", "vol_tail_count",
+]
+
+
+def prior_frame(states: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    States as a float frame indexed by symbol (None -> NaN), with the volume window reduced to the
+    sum/count of the volumes that stay in the SMA window after one more candle.
+    """
+    rows = []
+    for state in states:
+        tail = state["volume_window"][-(VOLUME_SMA_LENGTH - 1):] if VOLUME_SMA_LENGTH > 1 else []
+        rows.append({**{col: state.get(col) for col in PRIOR_COLUMNS[:-2]},
+                     "vol_tail_sum": float(sum(tail)), "vol_tail_count": len(tail), "symbol": state["symbol"]})
+    return pd.DataFrame(rows, columns=PRIOR_COLUMNS + ["symbol"]).set_index("symbol").astype(float)
+
+
+def snapshot_frame(prior: pd.DataFrame, candles: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized step() + snapshot(): the rule-set snapshot each symbol would have if `candles`
+    (indexed by symbol: open, high, low, close, volume) were appended to its prior state.
+    Nothing is mutated; used to re-evaluate an in-progress intraday candle on every poll.
+    """
+    prior = prior.reindex(candles.index)
+    i = prior["bars"].to_numpy()
+    open_ = candles["open"].to_numpy(dtype=float)
+    high = candles["high"].to_numpy(dtype=float)
+    low = candles["low"].to_numpy(dtype=float)
+    close = candles["close"].to_numpy(dtype=float)
+    volume = candles["volume"].to_numpy(dtype=float)
+    prev_close = prior["close"].to_numpy()
+    bars = i + 1
+
+    out = {"open": open_, "high": high, "low": low, "close": close, "volume": volume, "prev_close": prev_close}
+
+    # EMA
+    close_sum = prior["close_sum"].to_numpy() + close
+    ema = {}
+    for key, length in EMA_LENGTHS.items():
+        previous = prior[key].to_numpy()
+        ema[key] = np.where(i == length - 1, close_sum / length,
+                            np.where(i >= length, previous + (2.0 / (length + 1)) * (close - previous), np.nan))
+    out["ema_200"] = np.where(bars >= EMA_LONG, ema["ema_200"], 0)
+    out["ema_50"] = ema["ema_50"]
+    out["ema_20"] = ema["ema_20"]
+    out["prev_ema_20"] = prior["ema_20"].to_numpy()
+    out["prev_ema_50"] = prior["ema_50"].to_numpy()
+
+    # RSI
+    change = close - prev_close
+    gain, loss = np.maximum(change, 0.0), np.minimum(change, 0.0)
+    avg_gain = np.where(i == 1, gain, prior["avg_gain"].to_numpy() + (gain - prior["avg_gain"].to_numpy()) / RSI_LENGTH)
+    avg_loss = np.where(i == 1, loss, prior["avg_loss"].to_numpy() + (loss - prior["avg_loss"].to_numpy()) / RSI_LENGTH)
+    denominator = avg_gain + np.abs(avg_loss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(denominator != 0, 100 * avg_gain / denominator, np.nan)
+    has_rsi = bars > RSI_LENGTH
+    out["rsi"] = np.where(has_rsi, rsi, np.nan)
+    out["prev_rsi"] = np.where(has_rsi, prior["rsi"].to_numpy(), np.nan)
+
+    # ATR
+    true_range = np.where(i == 0, high - low, np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(prev_close - low))))
+    atr = np.where(i == ATR_LENGTH - 1, (prior["tr_sum"].to_numpy() + true_range) / ATR_LENGTH,
+                   prior["atr"].to_numpy() + (true_range - prior["atr"].to_numpy()) / ATR_LENGTH)
+    out["atr"] = np.where(bars > ATR_LENGTH, atr, np.nan)
+
+    # Volume SMA
+    count = prior["vol_tail_count"].to_numpy() + 1
+    out["vol_avg"] = np.where(count == VOLUME_SMA_LENGTH, (prior["vol_tail_sum"].to_numpy() + volume) / VOLUME_SMA_LENGTH, np.nan)
+
+    return pd.DataFrame(out, index=candles.index)[SNAPSHOT_COLUMNS]
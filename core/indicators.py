@@ -0,0 +1,159 @@
+"""
+NumPy indicator kernels with the pandas_ta definitions the strategy uses (its defaults, without TA-Lib):
+
+- sma:  simple moving average, NaN until `length` values are available.
+- ema:  EMA seeded with the SMA of the first `length` values (pandas_ta presma=True).
+- rma:  Wilder's moving average, pandas ewm(alpha=1/length, adjust=False) from the first value.
+- rsi:  100 * RMA(gains) / (RMA(gains) + RMA(losses)) of the close-to-close change.
+- atr:  RMA of the true range, seeded with the SMA of its first `length` values.
+
+Every kernel takes a 1-D series or a 2-D (symbols x time) array and works along the last axis.
+Rows of a 2-D array may start with NaN padding (shorter histories right-aligned to a common end);
+each row then behaves like its own shorter series. Where pandas_ta returns None (fewer values than
+it needs) the result is all-NaN. NaN inside a row's history is not supported.
+
+The recursive averages loop over time only (vectorized across symbols); a 1-D series runs the
+loop on Python floats, which beats per-element NumPy indexing by an order of magnitude.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def sma(values, length: int) -> np.ndarray:
+    x, one_d = _as_2d(values)
+    out = np.full(x.shape, np.nan)
+    if length <= x.shape[1]:
+        out[:, length - 1:] = _window_means(x, length)
+    return _shape(out, one_d)
+
+
+def ema(close, length: int) -> np.ndarray:
+    x, one_d = _as_2d(close)
+    start = _first_valid(x) + length - 1
+    seed = _seed_means(x, length, start)
+    return _shape(_ewm(x, _span_alpha(length), start, seed), one_d)
+
+
+def rma(values, length: int) -> np.ndarray:
+    x, one_d = _as_2d(values)
+    start = _first_valid(x)
+    seed = _at(x, start)
+    return _shape(_ewm(x, _wilder_alpha(length), start, seed), one_d)
+
+
+def rsi(close, length: int) -> np.ndarray:
+    x, one_d = _as_2d(close)
+    change = np.diff(x, axis=1, prepend=np.nan)
+    gain = rma(np.where(change < 0, 0.0, change), length) # NaN (no previous close) stays NaN
+    loss = np.abs(rma(np.where(change > 0, 0.0, change), length))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 * gain / (gain + loss)
+    out[_valid_count(x) < length + 1] = np.nan # pandas_ta needs length + 1 closes
+    return _shape(out, one_d)
+
+
+def true_range(high, low, close) -> np.ndarray:
+    h, one_d = _as_2d(high)
+    l, c = _as_2d(low)[0], _as_2d(close)[0]
+    prev_close = np.concatenate([np.full((c.shape[0], 1), np.nan), c[:, :-1]], axis=1)
+    # max() skipping NaN: the first bar has no previous close, so its range is high - low
+    out = np.fmax(np.fmax(np.abs(h - l), np.abs(h - prev_close)), np.abs(prev_close - l))
+    return _shape(out, one_d)
+
+
+def atr(high, low, close, length: int) -> np.ndarray:
+    tr, one_d = _as_2d(true_range(high, low, close))
+    first = _first_valid(tr)
+    start = first + length - 1
+    out = _ewm(tr, _wilder_alpha(length), start, _seed_means(tr, length, start))
+    out[_valid_count(tr) < length + 1] = np.nan # pandas_ta needs length + 1 bars
+    return _shape(out, one_d)
+
+
+# --- Helpers ---
+def _as_2d(values) -> Tuple[np.ndarray, bool]:
+    x = np.asarray(values, dtype=np.float64)
+    if x.ndim == 1:
+        return x[np.newaxis, :], True
+    if x.ndim != 2:
+        raise ValueError(f"Expected a 1-D or 2-D array, got {x.ndim}-D")
+    return x, False
+
+
+def _shape(out: np.ndarray, one_d: bool) -> np.ndarray:
+    return out[0] if one_d else out
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """Column of each row's first non-NaN value (row length when there is none)."""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def _valid_count(x: np.ndarray) -> np.ndarray:
+    return x.shape[1] - _first_valid(x)
+
+
+def _at(x: np.ndarray, column: np.ndarray) -> np.ndarray:
+    """x[row, column[row]], NaN where the column is past the end."""
+    inside = column < x.shape[1]
+    out = np.full(x.shape[0], np.nan)
+    out[inside] = x[inside, column[inside]]
+    return out
+
+
+def _window_means(x: np.ndarray, length: int) -> np.ndarray:
+    """Mean of every `length` window along the time axis (window i ends at column i + length - 1)."""
+    return np.lib.stride_tricks.sliding_window_view(x, length, axis=1).mean(axis=2)
+
+
+def _seed_means(x: np.ndarray, length: int, start: np.ndarray) -> np.ndarray:
+    """SMA of the `length` values ending at column start[row] (NaN when that is past the end)."""
+    if length > x.shape[1]:
+        return np.full(x.shape[0], np.nan)
+    return _at(_window_means(x, length), start - (length - 1))
+
+
+# Smoothing factors exactly as pandas ewm derives them (span / alpha -> center of mass -> alpha)
+def _span_alpha(span: int) -> float:
+    return 1.0 / (1.0 + (span - 1) / 2)
+
+
+def _wilder_alpha(length: int) -> float:
+    alpha = 1.0 / length
+    return 1.0 / (1.0 + (1 - alpha) / alpha)
+
+
+def _ewm(x: np.ndarray, alpha: float, start: np.ndarray, seed: np.ndarray) -> np.ndarray:
+    """
+    pandas ewm(alpha, adjust=False).mean() per row, restarted at column start[row] with value seed[row];
+    NaN before the start. Same arithmetic as pandas, so results match it to the last bit.
+    """
+    rows, columns = x.shape
+    out = np.full((rows, columns), np.nan)
+    old = 1.0 - alpha
+    if rows == 1:
+        first = int(start[0])
+        if first < columns:
+            y = float(seed[0])
+            averaged = [y]
+            for value in x[0, first + 1:].tolist():
+                if y != value:
+                    y = (old * y + alpha * value) / (old + alpha)
+                averaged.append(y)
+            out[0, first:] = averaged
+        return out
+
+    seeded_at = {}
+    for row in np.flatnonzero(start < columns):
+        seeded_at.setdefault(int(start[row]), []).append(row)
+    y = np.full(rows, np.nan)
+    for column in range(min(seeded_at, default=columns), columns):
+        value = x[:, column]
+        np.copyto(y, (old * y + alpha * value) / (old + alpha), where=y != value)
+        seeds = seeded_at.get(column)
+        if seeds is not None:
+            y[seeds] = seed[seeds]
+        out[:, column] = y
+    return out
@@ -0,0 +1,124 @@
+"""
+Intraday polling for near-close BSJP detection.
+
+During the last session, GoAPI bulk prices are polled every INTRADAY_POLL_MINUTES. Each poll
+updates today's in-progress candle per symbol and re-evaluates the full rule set against the
+prior-day indicator state, which is loaded once per session. The update is a handful of numpy
+expressions over all symbols (indicator_state.snapshot_frame), so a poll costs milliseconds of
+CPU even for hundreds of symbols. Every poll is stored in intraday_snapshots.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.settings import INTRADAY_POLL_MINUTES
+from core import indicator_state
+from core.market_calendar import MarketCalendar
+from core.strategy import _evaluate_rules, _build_result
+
+logger = logging.getLogger(__name__)
+
+CANDLE_FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+class IntradayScanner:
+    def __init__(self, db, goapi, ai=None, notifier=None, calendar: Optional[MarketCalendar] = None,
+                 poll_minutes: float = INTRADAY_POLL_MINUTES):
+        self.db = db
+        self.goapi = goapi       # GoApiClient (bulk prices)
+        self.ai = ai             # Optional AIEngine: new BSJP setups are validated before alerting
+        self.notifier = notifier # Optional TelegramNotifier
+        self.calendar = calendar or MarketCalendar()
+        self.poll_seconds = max(1.0, poll_minutes * 60)
+        self.day: Optional[str] = None
+        self.symbols: List[str] = []
+        self.prior = indicator_state.prior_frame([])
+        self.candles = pd.DataFrame(columns=CANDLE_FIELDS, dtype=float)
+        self.alerted = set()
+
+    def start_day(self, symbols: List[str], day: str):
+        """Load prior-day indicator state once and reset today's in-progress candles."""
+        self.day = day
+        self.symbols = list(symbols)
+        states = self.db.get_prior_states(self.symbols, day)
+        self.prior = indicator_state.prior_frame(states.values())
+        self.candles = pd.DataFrame(columns=CANDLE_FIELDS, dtype=float)
+        self.alerted = set()
+        missing = len(self.symbols) - len(states)
+        logger.info(f"Intraday: prior state loaded for {len(states)} symbols for {day}" + (f" ({missing} without history)" if missing else ""))
+
+    def poll(self, now: Optional[datetime] = None) -> pd.DataFrame:
+        """One poll: fetch bulk prices, update in-progress candles, re-evaluate rules, store and alert."""
+        now = now or self.calendar.now()
+        prices = self.goapi.get_bulk_prices(self.symbols, use_cache=False)
+
+        cpu_start = time.process_time()
+        evaluated = self._evaluate(prices)
+        if evaluated.empty:
+            logger.info("Intraday poll: no prices for today yet")
+            return evaluated
+
+        snapshots = evaluated[CANDLE_FIELDS + ["signal_type"]].reset_index()
+        snapshots["ts"] = now.strftime("%Y-%m-%d %H:%M")
+        self.db.add_intraday_snapshots(snapshots)
+
+        new = evaluated[evaluated["bsjp"] & ~evaluated.index.isin(self.alerted)]
+        logger.info(f"Intraday poll {now:%H:%M}: {len(evaluated)} symbols, {int(evaluated['bsjp'].sum())} BSJP "
+                    f"({len(new)} new), {1000 * (time.process_time() - cpu_start):.1f} ms CPU")
+        if not new.empty:
+            self._alert(new)
+        return evaluated
+
+    def _evaluate(self, prices: pd.DataFrame) -> pd.DataFrame:
+        prices = prices[(prices["date"] == self.day) & prices["symbol"].isin(self.prior.index)]
+        if prices.empty:
+            return pd.DataFrame()
+        latest = prices.drop_duplicates("symbol", keep="last").set_index("symbol")[CANDLE_FIELDS].astype(float)
+
+        # Fold into the in-progress candle: keep the first open, widen high/low, volume is cumulative
+        previous = self.candles.reindex(latest.index)
+        latest["open"] = previous["open"].fillna(latest["open"])
+        latest["high"] = np.fmax(latest["high"], previous["high"])
+        latest["low"] = np.fmin(latest["low"], previous["low"])
+        latest["volume"] = np.fmax(latest["volume"], previous["volume"])
+        self.candles = pd.concat([self.candles.drop(latest.index, errors="ignore"), latest])
+
+        return _evaluate_rules(indicator_state.snapshot_frame(self.prior, latest))
+
+    def _alert(self, new: pd.DataFrame):
+        tech_results: Dict[str, Dict[str, Any]] = {}
+        for symbol, row in new.iterrows():
+            result = _build_result(row)
+            result["symbol"] = symbol
+            result["date"] = self.day
+            tech_results[symbol] = result
+        self.alerted.update(tech_results)
+
+        verdicts = self.ai.analyze_signals(tech_results) if self.ai is not None else {}
+        for symbol, tech_result in tech_results.items():
+            verdict = verdicts.get(symbol, {"valid": True, "analysis": "Intraday BSJP setup (no AI validation)"})
+            logger.info(f"[{symbol}] [INTRADAY BSJP] AI verdict: {verdict.get('valid')} - {verdict.get('analysis')}")
+            if verdict.get("valid") and self.notifier is not None:
+                self.notifier.send_alert(symbol, tech_result, verdict.get("trade_plan", {}), verdict.get("analysis", "No analysis provided."))
+
+    def run_session(self, symbols: List[str], until: datetime, stop: Optional[threading.Event] = None):
+        """Poll from now until `until` (market time), every poll_seconds."""
+        stop = stop or threading.Event()
+        self.start_day(symbols, self.calendar.now().strftime("%Y-%m-%d"))
+        while not stop.is_set():
+            started = self.calendar.now()
+            if started >= until:
+                break
+            try:
+                self.poll(started)
+            except Exception as e:
+                logger.error(f"Intraday poll failed: {e}")
+            remaining = (until - self.calendar.now()).total_seconds()
+            stop.wait(max(0.0, min(self.poll_seconds - (self.calendar.now() - started).total_seconds(), remaining)))
+        if hasattr(self.notifier, "flush_digest"):
+            self.notifier.flush_digest()
@@ -0,0 +1,93 @@
+"""
+IDX trading calendar and the daemon's scan schedule (all times in Asia/Jakarta).
+
+Trading days are weekdays that are not in config/holidays.py (or IDX_EXTRA_HOLIDAYS).
+Each trading day has these scans:
+- "intraday" (INTRADAY_MODE): poll bulk prices from INTRADAY_START_TIME until the pre-close (core/intraday.py).
+- "bsjp": BSJP_SCAN_LEAD_MINUTES before the pre-closing auction, so a Beli Sore Jual Pagi
+  entry can still be placed before the close.
+- "full": FULL_SCAN_DELAY_MINUTES after the close, when the daily candle is final.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional
+
+from config.holidays import IDX_HOLIDAYS
+from config.settings import (
+    MARKET_TIMEZONE, IDX_PRECLOSE_TIME, IDX_CLOSE_TIME, IDX_EXTRA_HOLIDAYS,
+    BSJP_SCAN_LEAD_MINUTES, FULL_SCAN_DELAY_MINUTES, INTRADAY_MODE, INTRADAY_START_TIME
+)
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo(MARKET_TIMEZONE)
+except Exception:
+    # Windows without the tzdata package: Jakarta is UTC+7 all year (no DST)
+    MARKET_TZ = timezone(timedelta(hours=7), "WIB")
+
+
+@dataclass
+class ScheduledScan:
+    name: str     # "bsjp" or "full"
+    at: datetime  # Timezone-aware, MARKET_TZ
+
+    @property
+    def day(self) -> date:
+        return self.at.date()
+
+
+class MarketCalendar:
+    def __init__(self, holidays: Optional[Iterable[str]] = None, intraday: bool = INTRADAY_MODE):
+        holidays = list(IDX_HOLIDAYS) + list(IDX_EXTRA_HOLIDAYS) if holidays is None else holidays
+        self.holidays = {date.fromisoformat(d) for d in holidays}
+        self.intraday = intraday
+
+    def now(self) -> datetime:
+        return datetime.now(MARKET_TZ)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def next_trading_day(self, day: date, include: bool = True) -> date:
+        day = day if include else day + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def at(self, day: date, hhmm: str) -> datetime:
+        hour, minute = (int(part) for part in hhmm.split(":"))
+        return datetime.combine(day, time(hour, minute), tzinfo=MARKET_TZ)
+
+    def scans_for(self, day: date):
+        """The day's scans in time order (empty on non-trading days)."""
+        if not self.is_trading_day(day):
+            return []
+        scans = [
+            ScheduledScan("bsjp", self.at(day, IDX_PRECLOSE_TIME) - timedelta(minutes=BSJP_SCAN_LEAD_MINUTES)),
+            ScheduledScan("full", self.at(day, IDX_CLOSE_TIME) + timedelta(minutes=FULL_SCAN_DELAY_MINUTES)),
+        ]
+        if self.intraday:
+            scans.insert(0, ScheduledScan("intraday", self.at(day, INTRADAY_START_TIME)))
+        return scans
+
+    def preclose(self, day: date) -> datetime:
+        return self.at(day, IDX_PRECLOSE_TIME)
+
+    def next_close(self, now: Optional[datetime] = None) -> datetime:
+        """First market close strictly after `now`."""
+        now = (now or self.now()).astimezone(MARKET_TZ)
+        day = self.next_trading_day(now.date())
+        close = self.at(day, IDX_CLOSE_TIME)
+        if close <= now:
+            close = self.at(self.next_trading_day(day, include=False), IDX_CLOSE_TIME)
+        return close
+
+    def next_scan(self, now: Optional[datetime] = None) -> ScheduledScan:
+        """First scheduled scan strictly after `now`."""
+        now = (now or self.now()).astimezone(MARKET_TZ)
+        day = self.next_trading_day(now.date())
+        while True:
+            for scan in self.scans_for(day):
+                if scan.at > now:
+                    return scan
+            day = self.next_trading_day(day, include=False)
@@ -0,0 +1,243 @@
+"""
+Run instrumentation: counters, latency histograms and per-symbol timings, reported at the end of a run
+as JSON (METRICS_DIR/run_report.json) and Prometheus text format (METRICS_DIR/metrics.prom, for the
+node_exporter textfile collector).
+
+All hooks go through the module-level `metrics` object. With METRICS_ENABLED=false every hook returns
+after one attribute check (timer() hands back a shared no-op context manager), so they stay in the code paths.
+
+    with metrics.timer("stage_seconds", symbol="BBCA", stage="analyze"):
+        ...
+    metrics.inc("client_requests_total", client="goapi", outcome="ok")
+    metrics.observe("client_request_seconds", elapsed, client="goapi", endpoint="historical")
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import METRICS_ENABLED, METRICS_DIR
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "saftrade_"
+
+HELP = {
+    "run_seconds": "Wall time of a whole scan run",
+    "stage_seconds": "Time spent per pipeline stage call",
+    "client_request_seconds": "External API call latency",
+    "client_requests_total": "External API calls by outcome",
+    "client_retries_total": "HTTP retries made by the client's retry policy",
+    "circuit_breaker_trips_total": "Provider circuit-breaker trips",
+    "provider_hedges_total": "Hedged history fetches by winning provider",
+    "http_cache_total": "Provider response cache lookups",
+    "rows_written_total": "Rows written to the database",
+    "db_commit_seconds": "Database writer transaction time",
+    "db_write_batches_total": "Transactions committed by the database writer",
+    "ai_cache_total": "AI verdict cache lookups",
+    "ai_tokens_total": "DeepSeek tokens used",
+    "telegram_messages_total": "Telegram deliveries by outcome",
+    "universe_symbols_total": "Symbols left after each universe scan stage",
+}
+
+_NULL_TIMER = nullcontext()
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(BUCKETS) and value > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket (capped at the observed max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for index, count in enumerate(self.counts):
+            upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+            if count and seen + count >= rank:
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count, "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6), "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6), "max": round(self.max, 6),
+        }
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "symbol", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, symbol: Optional[str], labels: Dict[str, str]):
+        self.metrics, self.name, self.symbol, self.labels = metrics, name, symbol, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.observe(self.name, elapsed, **self.labels)
+        if self.symbol is not None:
+            self.metrics.symbol_time(self.symbol, self.labels.get("stage", self.name), elapsed)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = METRICS_ENABLED, directory: str = METRICS_DIR):
+        self.enabled = enabled
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new run (called by the entry points before each scan)."""
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[LabelKey, float] = {}
+            self.histograms: Dict[LabelKey, Histogram] = {}
+            self.symbols: Dict[str, Dict[str, float]] = {} # symbol -> {timing name: seconds}
+
+    # --- Hooks ---
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name: str, symbol: Optional[str] = None, **labels):
+        """
+        Context manager observing the elapsed time into histogram `name`; with `symbol`, also adds it
+        to that symbol's timings in the JSON report (under the stage label, else the metric name).
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, symbol, labels)
+
+    def record_request(self, client: str, endpoint: str, start: float, response=None, ok: Optional[bool] = None):
+        """
+        One external call started at `start` (perf_counter): latency, outcome and urllib3 retries.
+        ok defaults to response.ok; no response (exception) counts as an error.
+        """
+        if not self.enabled:
+            return
+        if ok is None:
+            ok = response is not None and response.ok
+        self.observe("client_request_seconds", time.perf_counter() - start, client=client, endpoint=endpoint)
+        self.inc("client_requests_total", client=client, endpoint=endpoint, outcome="ok" if ok else "error")
+        retried = retries(response)
+        if retried:
+            self.inc("client_retries_total", retried, client=client, endpoint=endpoint)
+
+    def symbol_time(self, symbol: str, name: str, seconds: float):
+        """Per-symbol timing (JSON report only; too many series for Prometheus)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            timings = self.symbols.setdefault(symbol, {})
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    # --- Reports ---
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "finished": datetime.now().isoformat(timespec="seconds"),
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "histograms": [{"name": name, "labels": dict(labels), **histogram.summary()}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+                "symbols": {symbol: {k: round(v, 6) for k, v in timings.items()} for symbol, timings in sorted(self.symbols.items())},
+            }
+
+    def prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} counter"]
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{PREFIX}{name}{_labels(labels)} {value:g}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} histogram"]
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{_labels(labels)} {histogram.count}")
+        lines.append(f"# TYPE {PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, directory: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """Write run_report.json and metrics.prom (atomically). Returns their paths, or None when disabled."""
+        if not self.enabled:
+            return None
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        paths = (os.path.join(directory, "run_report.json"), os.path.join(directory, "metrics.prom"))
+        for path, content in zip(paths, (json.dumps(self.report(), indent=2), self.prometheus())):
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path) # The textfile collector must never read a half-written file
+        logger.info(f"Run metrics written to {paths[0]} and {paths[1]}")
+        return paths
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def retries(response) -> int:
+    """Retries urllib3 made before this response (0 when unknown)."""
+    history = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None)
+    return len(history) if history else 0
+
+
+metrics = Metrics()
@@ -1,44 +1,252 @@
 import logging
+import threading
+import time
 import requests
-from config.settings import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
-from typing import Dict, Any
+from queue import Queue
+from requests.adapters import HTTPAdapter
+from config.settings import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_API_URL, TELEGRAM_MAX_CONCURRENCY,
+    TELEGRAM_RATE_PER_SEC, TELEGRAM_BURST, TELEGRAM_MAX_ATTEMPTS, TELEGRAM_DIGEST_MODE
+)
+from core.metrics import metrics
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+_STOP = object() # Queue sentinel
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, up to `capacity` saved for bursts."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold all sends for `seconds` (Telegram 429 retry_after) and restart from an empty bucket."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 1.0 # One send allowed as soon as the pause ends
+            self.updated = self.paused_until
+
+
 class TelegramNotifier:
-    def __init__(self):
+    """
+    Non-blocking Telegram delivery.
+
+    send_alert() only formats and enqueues; a background worker sends in order through a token bucket,
+    honors 429 retry_after and retries transient errors. With a DBManager, messages go through the
+    telegram_outbox table first, so anything undelivered is resent after a restart.
+    In digest mode alerts are buffered and folded into as few messages as possible by flush_digest().
+    """
+
+    def __init__(self, db=None, digest: bool = TELEGRAM_DIGEST_MODE):
         self.bot_token = TELEGRAM_BOT_TOKEN
         self.chat_id = TELEGRAM_CHAT_ID
-    
+        self.session = self._create_session()
+        self._limiter = threading.BoundedSemaphore(TELEGRAM_MAX_CONCURRENCY)
+        self.db = db # DBManager for the persistent outbox; None keeps the queue in memory only
+        self.digest = digest
+        self._bucket = TokenBucket(TELEGRAM_RATE_PER_SEC, TELEGRAM_BURST)
+        self._queue: Queue = Queue()
+        self._digest_lines: List[str] = []
+        self._digest_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """Pooled keep-alive session sized to the Telegram concurrency limit."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TELEGRAM_MAX_CONCURRENCY)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bot_token and self.chat_id)
+
     def send_alert(self, ticker: str, signal_data: Dict[str, Any], trade_plan: Dict[str, Any], analysis: str):
         """
-        Send a formatted alert to Telegram.
+        Queue a formatted alert for Telegram (returns immediately).
         """
-        if not self.bot_token or not self.chat_id:
+        if not self.enabled:
             logger.warning("Telegram Token or Chat ID missing. Skipping alert.")
             return
 
-        message = self._format_message(ticker, signal_data, trade_plan, analysis)
-        
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        if self.digest:
+            with self._digest_lock:
+                self._digest_lines.append(self._format_digest_line(ticker, signal_data, trade_plan, analysis))
+            return
+
+        self._enqueue([self._format_message(ticker, signal_data, trade_plan, analysis)])
+        logger.info(f"Telegram Alert queued for {ticker}")
+
+    def flush_digest(self):
+        """Fold the alerts buffered in digest mode into as few messages as fit Telegram's length limit."""
+        with self._digest_lock:
+            lines, self._digest_lines = self._digest_lines, []
+        if not lines:
+            return
+
+        header = f"🤖 *Saftrade Digest* ({len(lines)} signals)\n"
+        messages, current = [], header
+        for line in lines:
+            if len(current) + len(line) + 1 > TELEGRAM_MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = header
+            current += "\n" + line
+        messages.append(current)
+        self._enqueue(messages)
+        logger.info(f"Telegram digest of {len(lines)} alerts queued as {len(messages)} message(s)")
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush the digest and wait (up to timeout) for queued messages to be delivered."""
+        self.flush_digest()
+        if self.enabled and self.db is not None:
+            self._start() # Resend leftovers from earlier runs even when this run had no alerts
+        if self._worker is None:
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            logger.warning(f"Telegram delivery still pending after {timeout}s; undelivered alerts stay in the outbox")
+        else:
+            self._worker = None
+
+    # --- Delivery ---
+    def _enqueue(self, texts: List[str]):
+        messages = [{"chat_id": str(self.chat_id), "text": text, "parse_mode": "Markdown", "attempts": 0} for text in texts]
+        if self.db is not None:
+            try:
+                for message, message_id in zip(messages, self.db.add_outbox_messages(messages)):
+                    message["id"] = message_id
+            except Exception as e:
+                logger.error(f"Failed to persist Telegram outbox: {e}")
+        queued = self._start()
+        for message in messages:
+            if message.get("id") is None or message["id"] not in queued:
+                self._queue.put(message)
+
+    def _start(self) -> set:
+        """
+        Start the delivery worker once. On first start, undelivered outbox rows (incl. earlier runs) are queued;
+        returns their ids so callers do not queue them twice.
+        """
+        with self._start_lock:
+            if self._worker is not None:
+                return set()
+            pending = []
+            if self.db is not None:
+                try:
+                    pending = self.db.get_pending_outbox(TELEGRAM_MAX_ATTEMPTS)
+                except Exception as e:
+                    logger.error(f"Failed to load Telegram outbox: {e}")
+            for message in pending:
+                self._queue.put(message)
+            self._worker = threading.Thread(target=self._deliver_worker, name="telegram", daemon=True)
+            self._worker.start()
+            return {message["id"] for message in pending}
+
+    def _deliver_worker(self):
+        while True:
+            message = self._queue.get()
+            if message is _STOP:
+                return
+            self._deliver(message)
+
+    def _deliver(self, message: Dict[str, Any]):
+        """Send one message, retrying 429 (after retry_after) and transient errors up to TELEGRAM_MAX_ATTEMPTS."""
+        attempts, error = message.get("attempts", 0), None
+        while attempts < TELEGRAM_MAX_ATTEMPTS:
+            self._bucket.acquire()
+            attempts += 1
+            ok, retry_after, error = self._post(message)
+            metrics.inc("telegram_messages_total", outcome="sent" if ok else "retry" if retry_after is not None else "rejected")
+            if ok:
+                if message.get("id") is not None:
+                    self._update_outbox(self.db.mark_outbox_sent, message["id"])
+                logger.info("Telegram message delivered")
+                return
+            if retry_after is None:
+                attempts = TELEGRAM_MAX_ATTEMPTS # Not retryable (e.g. 400 Bad Request), not even after a restart
+                break
+            delay = retry_after or 2.0 ** attempts # 429 says how long to wait, otherwise exponential backoff
+            logger.warning(f"Telegram send failed ({error}), retrying in {delay:.1f}s")
+            self._bucket.pause(delay)
+
+        logger.error(f"Failed to send Telegram alert: {error}")
+        metrics.inc("telegram_messages_total", outcome="failed")
+        if message.get("id") is not None:
+            self._update_outbox(self.db.mark_outbox_failed, message["id"], attempts, str(error))
+
+    def _post(self, message: Dict[str, Any]) -> Tuple[bool, Optional[float], Optional[str]]:
+        """
+        One sendMessage call. Returns (delivered, retry_after, error):
+        retry_after is None when not retryable, 0 for transient errors (caller backs off), else Telegram's hint.
+        """
+        url = f"{TELEGRAM_API_URL}/bot{self.bot_token}/sendMessage"
         payload = {
-            "chat_id": self.chat_id,
-            "text": message,
-            "parse_mode": "Markdown"
+            "chat_id": message["chat_id"],
+            "text": message["text"],
+            "parse_mode": message.get("parse_mode")
         }
-        
+        response = None
+        try:
+            with self._limiter:
+                start = time.perf_counter()
+                try:
+                    response = self.session.post(url, json=payload, timeout=10)
+                finally:
+                    metrics.record_request("telegram", "send_message", start, response)
+        except requests.exceptions.RequestException as e:
+            return False, 0.0, str(e)
+
+        if response.ok:
+            return True, None, None
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            return False, retry_after, "429 Too Many Requests"
+        if response.status_code >= 500:
+            return False, 0.0, f"{response.status_code} {response.reason}"
+        return False, None, f"{response.status_code} {response.text[:200]}"
+
+    def _update_outbox(self, method, *args):
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            logger.info(f"Telegram Alert sent for {ticker}")
+            method(*args)
         except Exception as e:
-            logger.error(f"Failed to send Telegram alert: {e}")
+            logger.error(f"Failed to update Telegram outbox: {e}")
 
+    # --- Formatting ---
     def _format_message(self, ticker: str, signal_data: Dict[str, Any], trade_plan: Dict[str, Any], analysis: str) -> str:
         # Extract signal keys that are true
         signals = [k.replace('_', ' ').title() for k, v in signal_data.get('signals', {}).items() if v]
         signal_str = ", ".join(signals)
-        
+
         return f"""
 🤖 *Saftrade Alert*
 **#{ticker}** (Valid Setup)
@@ -57,3 +265,10 @@ Close: {signal_data.get('close', 0)}
 
 _Generated by Saftrade_
 """
+
+    def _format_digest_line(self, ticker: str, signal_data: Dict[str, Any], trade_plan: Dict[str, Any], analysis: str) -> str:
+        return (
+            f"*#{ticker}* {signal_data.get('signal_type', '')} | Close {signal_data.get('close', 0)}\n"
+            f"Entry {trade_plan.get('entry')} | SL {trade_plan.get('stop_loss')} | TP {trade_plan.get('take_profit')}\n"
+            f"_{analysis}_\n"
+        )
@@ -0,0 +1,176 @@
+"""
+Full indicator recomputes (strategy.compute_indicators) spread over a process pool.
+
+The indicator math runs in NumPy kernels (core/indicators.py), but their recursive averages
+loop over the time axis in Python, and the pandas groupby/gather around them holds the GIL
+as well, so threads do not help. Here the panel's symbol codes and OHLCV go into one
+shared-memory float64 block (6 x rows) instead of pickled DataFrames, and each task names
+a contiguous, row-balanced range of whole symbols.
+Workers run the same compute_indicators on their range, so results are identical to the
+in-process computation (every indicator is computed per symbol). Workers either:
+- write their indicator columns into a shared output block (all bars, e.g. backtests), or
+- return one compact float64 record per symbol for the last bar (analyze_batch).
+
+The process count adapts to the panel: one per CPU (ANALYSIS_WORKERS caps it), but never more
+than one per ANALYSIS_MIN_ROWS_PER_WORKER rows or one per symbol; a single process means the
+work stays in-process. With the kernels a serial recompute costs about 1 µs per bar and
+starting the pool about 0.15 s, so the 150k-row default of ANALYSIS_MIN_ROWS_PER_WORKER
+(~0.15 s of serial work) only adds a process once it has at least its own start-up to win back.
+Each process gets about CHUNKS_PER_WORKER tasks to even out uneven histories.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import ANALYSIS_WORKERS, ANALYSIS_MIN_ROWS_PER_WORKER
+from core.strategy import compute_indicators
+
+logger = logging.getLogger(__name__)
+
+INPUT_COLUMNS = ["symbol", "open", "high", "low", "close", "volume"] # symbol as its integer code
+# Columns compute_indicators adds, in its order
+INDICATOR_COLUMNS = [
+    "ema_200", "ema_50", "ema_20", "rsi", "atr", "vol_avg",
+    "prev_close", "prev_rsi", "prev_ema_20", "prev_ema_50",
+]
+CHUNKS_PER_WORKER = 4
+
+
+def plan(symbols: int, rows: int, workers: int = ANALYSIS_WORKERS) -> Tuple[int, int]:
+    """(processes, tasks) for `rows` bars over `symbols` symbols; 1 process = compute in-process."""
+    cpus = workers if workers > 0 else (os.cpu_count() or 1)
+    processes = max(1, min(cpus, symbols, rows // max(1, ANALYSIS_MIN_ROWS_PER_WORKER)))
+    return processes, min(symbols, processes * CHUNKS_PER_WORKER)
+
+
+def compute_indicators_parallel(panel: pd.DataFrame, point_in_time: bool = False,
+                                workers: int = ANALYSIS_WORKERS) -> pd.DataFrame:
+    """compute_indicators over a process pool (same columns and values). `panel` must be sorted by (symbol, date)."""
+    job = _Job.create(panel, workers)
+    if job is None:
+        return compute_indicators(panel, point_in_time)
+    with job:
+        job.run(point_in_time, snapshot=False)
+        df = panel.copy()
+        df[INDICATOR_COLUMNS] = job.output.T
+    return df
+
+
+def latest_indicators(panel: pd.DataFrame, workers: int = ANALYSIS_WORKERS) -> pd.DataFrame:
+    """
+    Last bar of every symbol with its indicator columns, i.e.
+    compute_indicators(panel).groupby("symbol", sort=False).tail(1), computed over a process pool.
+    """
+    job = _Job.create(panel, workers)
+    if job is None:
+        return compute_indicators(panel).groupby("symbol", sort=False).tail(1)
+    with job:
+        records = job.run(point_in_time=False, snapshot=True)
+    df = panel.iloc[job.ends - 1].copy()
+    df[INDICATOR_COLUMNS] = np.vstack(records)
+    return df
+
+
+class _Job:
+    """Shared-memory input (and optional output) for one parallel recompute."""
+
+    def __init__(self, codes: np.ndarray, panel: pd.DataFrame, ends: np.ndarray, processes: int, tasks: int):
+        self.rows = len(panel)
+        self.ends = ends # Row index just past each symbol's last bar
+        self.processes = processes
+        self.bounds = _split(ends, tasks)
+        self._input = SharedMemory(create=True, size=len(INPUT_COLUMNS) * self.rows * 8)
+        self._output: Optional[SharedMemory] = None
+        self.output: Optional[np.ndarray] = None
+        data = np.ndarray((len(INPUT_COLUMNS), self.rows), dtype=np.float64, buffer=self._input.buf)
+        data[0] = codes
+        data[1:] = panel[INPUT_COLUMNS[1:]].to_numpy(dtype=np.float64).T
+        del data # No views may outlive the block
+
+    @classmethod
+    def create(cls, panel: pd.DataFrame, workers: int) -> Optional["_Job"]:
+        """None when the panel is too small for more than one process (or symbols are not contiguous)."""
+        if panel.empty:
+            return None
+        codes, uniques = pd.factorize(panel["symbol"], sort=False)
+        processes, tasks = plan(len(uniques), len(panel), workers)
+        if processes <= 1:
+            return None
+        ends = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True]) + 1
+        if len(ends) != len(uniques):
+            logger.warning("Panel not grouped by symbol; computing indicators in-process")
+            return None
+        return cls(codes, panel, ends, processes, tasks)
+
+    def run(self, point_in_time: bool, snapshot: bool) -> List[np.ndarray]:
+        if not snapshot:
+            self._output = SharedMemory(create=True, size=len(INDICATOR_COLUMNS) * self.rows * 8)
+        tasks = [(self._input.name, self._output.name if self._output else None, self.rows, start, stop, point_in_time)
+                 for start, stop in self.bounds]
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=_context()) as pool:
+            records = list(pool.map(_indicator_task, tasks)) # In task order = symbol order
+        logger.info(f"Indicators for {len(self.ends)} symbols / {self.rows} bars: {len(tasks)} tasks on "
+                    f"{self.processes} processes in {time.perf_counter() - start:.2f}s")
+        if self._output is not None:
+            self.output = np.ndarray((len(INDICATOR_COLUMNS), self.rows), dtype=np.float64, buffer=self._output.buf).copy()
+        return records
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for block in (self._input, self._output):
+            if block is not None:
+                block.close()
+                block.unlink()
+
+
+def _split(ends: np.ndarray, tasks: int) -> List[Tuple[int, int]]:
+    """Cut the rows into about `tasks` ranges of similar size, only at symbol boundaries."""
+    targets = np.linspace(0, ends[-1], tasks + 1)[1:]
+    cuts = np.unique(ends[np.minimum(np.searchsorted(ends, targets), len(ends) - 1)])
+    starts = np.r_[0, cuts[:-1]]
+    return list(zip(starts.tolist(), cuts.tolist()))
+
+
+def _context():
+    # Never fork: the parent may run writer / HTTP threads. Forkserver imports pandas once for all workers.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["core.parallel_analysis"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _indicator_task(task) -> Optional[np.ndarray]:
+    """Worker: indicators for rows [start, stop). Returns last-bar records (snapshot) or writes the output block."""
+    input_name, output_name, rows, start, stop, point_in_time = task
+    block = SharedMemory(name=input_name)
+    try:
+        data = np.ndarray((len(INPUT_COLUMNS), rows), dtype=np.float64, buffer=block.buf)
+        sub = pd.DataFrame({col: data[i, start:stop].copy() for i, col in enumerate(INPUT_COLUMNS)})
+        del data
+    finally:
+        block.close()
+
+    values = compute_indicators(sub, point_in_time)[INDICATOR_COLUMNS].to_numpy(dtype=np.float64)
+    if output_name is None:
+        codes = sub["symbol"].to_numpy()
+        return values[np.r_[codes[1:] != codes[:-1], True]]
+
+    block = SharedMemory(name=output_name)
+    try:
+        out = np.ndarray((len(INDICATOR_COLUMNS), rows), dtype=np.float64, buffer=block.buf)
+        out[:, start:stop] = values.T
+        del out
+    finally:
+        block.close()
+    return None
@@ -0,0 +1,266 @@
+import csv
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from queue import Queue, Empty
+from typing import Any, Dict, List, Optional
+
+from config.settings import FETCH_WORKERS, AI_WORKERS, PIPELINE_QUEUE_SIZE, SIGNALS_CSV, DAILY_APPEND, AI_BATCH_MODE
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object() # Queue sentinel
+
+
+@dataclass
+class ScanResult:
+    index: int # Position in the input list, used to emit results in watchlist order
+    ticker: str
+    tech_result: Optional[Dict[str, Any]] = None
+    ai_result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def is_alert(self) -> bool:
+        return bool(self.ai_result and self.ai_result.get("valid"))
+
+
+class ScanPipeline:
+    """
+    Staged, concurrent scan: fetch -> analyze -> AI validate -> notify.
+
+    - Fetch/analyze and AI validation run on bounded worker pools connected by queues.
+    - Per-service concurrency is capped inside each client (GoAPI, YFinance, DeepSeek, Telegram).
+    - In AI batch mode all signals are collected first, then validated in ranked, token-budgeted
+      multi-ticker requests (AIEngine.analyze_signals).
+    - Results are re-ordered before the notify stage, so alerts and signals.csv rows
+      come out in watchlist order regardless of which worker finished first.
+    """
+
+    def __init__(self, db, planner, analyzer, ai, notifier,
+                 fetch_workers: int = FETCH_WORKERS, ai_workers: int = AI_WORKERS,
+                 csv_file: str = SIGNALS_CSV, daily_append: bool = DAILY_APPEND, ai_batch: bool = AI_BATCH_MODE):
+        self.db = db
+        self.planner = planner
+        self.analyzer = analyzer
+        self.ai = ai
+        self.notifier = notifier
+        self.fetch_workers = max(1, fetch_workers)
+        self.ai_workers = max(1, ai_workers)
+        self.csv_file = csv_file
+        self.daily_append = daily_append
+        self.ai_batch = ai_batch
+        self._needs_update = set() # Symbols still needing a per-symbol fetch after the bulk/batch stage
+        self._signals: Optional[List[str]] = None
+
+    def run(self, tickers: List[str], signals: Optional[List[str]] = None, fetch: bool = True) -> List[ScanResult]:
+        """
+        Scan tickers and return one ScanResult per ticker, in input order.
+        signals (e.g. ["bsjp"]) limits AI validation/alerts to setups where one of those signal flags is set.
+        fetch=False analyzes the stored candles as they are (the caller already fetched them, e.g. UniverseScanner).
+        """
+        if not tickers:
+            return []
+        self._signals = signals
+        self._needs_update = set(self.fetch(tickers)) if fetch else set()
+
+        fetch_q: Queue = Queue()
+        ai_q: Queue = Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        done_q: Queue = Queue()
+        notify_q: Queue = Queue()
+
+        for index, ticker in enumerate(tickers):
+            fetch_q.put(ScanResult(index=index, ticker=ticker))
+
+        fetchers = [
+            threading.Thread(target=self._fetch_worker, args=(fetch_q, ai_q, done_q), name=f"fetch-{i}", daemon=True)
+            for i in range(min(self.fetch_workers, len(tickers)))
+        ]
+        if self.ai_batch:
+            validators = [threading.Thread(target=self._ai_batch_worker, args=(ai_q, done_q), name="ai-batch", daemon=True)]
+        else:
+            validators = [
+                threading.Thread(target=self._ai_worker, args=(ai_q, done_q), name=f"ai-{i}", daemon=True)
+                for i in range(self.ai_workers)
+            ]
+        notifier = threading.Thread(target=self._notify_worker, args=(notify_q,), name="notify", daemon=True)
+
+        for thread in fetchers + validators + [notifier]:
+            thread.start()
+
+        # Close the AI stage once every fetcher has drained its queue
+        def close_ai_stage():
+            for thread in fetchers:
+                thread.join()
+            for _ in validators:
+                ai_q.put(_STOP)
+        threading.Thread(target=close_ai_stage, name="fetch-join", daemon=True).start()
+
+        # Re-order buffer: hand results to the notify stage strictly in input order
+        results: List[Optional[ScanResult]] = [None] * len(tickers)
+        next_index = 0
+        for _ in range(len(tickers)):
+            result = done_q.get()
+            results[result.index] = result
+            while next_index < len(results) and results[next_index] is not None:
+                notify_q.put(results[next_index])
+                next_index += 1
+
+        notify_q.put(_STOP)
+        notifier.join()
+        # Digest mode: fold this run's alerts into as few messages as possible (delivery stays in the background)
+        if hasattr(self.notifier, "flush_digest"):
+            self.notifier.flush_digest()
+        return results
+
+    def fetch(self, tickers: List[str]) -> List[str]:
+        """
+        Bulk-append today's candle first; returns the symbols that still need a per-symbol history fetch.
+        """
+        with metrics.timer("stage_seconds", stage="bulk_fetch"):
+            pending = self.planner.daily_append(tickers) if self.daily_append else list(tickers)
+            if getattr(self.planner.client, "batch_preferred", False):
+                # Circuit breaker tripped: one multi-ticker yfinance download per date range
+                self.planner.update_many(pending)
+                pending = []
+        return pending
+
+    # --- Stages ---
+    def _fetch_worker(self, fetch_q: Queue, ai_q: Queue, done_q: Queue):
+        while True:
+            try:
+                result = fetch_q.get_nowait()
+            except Empty:
+                return
+            try:
+                self._fetch_and_analyze(result)
+            except Exception as e:
+                logger.error(f"[{result.ticker}] Fetch/analysis failed: {e}")
+                result.error = str(e)
+
+            if result.tech_result and result.tech_result["valid"] and self._wanted(result.tech_result):
+                ai_q.put(result)
+            else:
+                done_q.put(result)
+
+    def _fetch_and_analyze(self, result: ScanResult):
+        ticker = result.ticker
+        logger.info(f"--- Processing {ticker} ---")
+
+        # A. Fetch/Update Data
+        # Only the missing tail / holes are requested; indicator state is advanced on upsert.
+        if ticker in self._needs_update:
+            with metrics.timer("stage_seconds", symbol=ticker, stage="fetch"):
+                self.planner.update(ticker)
+
+        state = self.db.get_indicator_state(ticker)
+        if state is None or state["bars"] < 2:
+            logger.warning(f"No history found for {ticker}. Skipping.")
+            return
+
+        # B. Technical Analysis (reads persisted indicator state, no recomputation)
+        with metrics.timer("stage_seconds", symbol=ticker, stage="analyze"):
+            tech_result = self.analyzer.analyze_state(state)
+        result.tech_result = tech_result
+
+        if not tech_result["valid"]:
+            logger.info(f"[{ticker}] Result: {tech_result['reason']}")
+        else:
+            logger.info(f"[{ticker}] [SIGNAL DETECTED] {tech_result['signals']}")
+
+    def _wanted(self, tech_result: Dict[str, Any]) -> bool:
+        if not self._signals:
+            return True
+        return any(tech_result["signals"].get(signal) for signal in self._signals)
+
+    def _ai_worker(self, ai_q: Queue, done_q: Queue):
+        while True:
+            result = ai_q.get()
+            if result is _STOP:
+                return
+            try:
+                # C. AI Validation
+                logger.info(f"[{result.ticker}] Requesting AI Validation...")
+                with metrics.timer("stage_seconds", symbol=result.ticker, stage="ai"):
+                    result.ai_result = self.ai.analyze_signal(result.ticker, result.tech_result)
+                logger.info(f"[{result.ticker}] [AI VERDICT] {result.ai_result.get('valid')} - {result.ai_result.get('analysis')}")
+            except Exception as e:
+                logger.error(f"[{result.ticker}] AI validation failed: {e}")
+                result.error = str(e)
+            done_q.put(result)
+
+    def _ai_batch_worker(self, ai_q: Queue, done_q: Queue):
+        """Collect every signal of the run, then validate them together (ranking needs the full set)."""
+        pending: List[ScanResult] = []
+        while True:
+            result = ai_q.get()
+            if result is _STOP:
+                break
+            pending.append(result)
+        if not pending:
+            return
+
+        # C. AI Validation (batched)
+        try:
+            with metrics.timer("stage_seconds", stage="ai"):
+                verdicts = self.ai.analyze_signals({result.ticker: result.tech_result for result in pending})
+        except Exception as e:
+            logger.error(f"Batched AI validation failed: {e}")
+            verdicts = {}
+        for result in pending:
+            verdict = verdicts.get(result.ticker)
+            if verdict is None:
+                result.error = "No AI verdict"
+            else:
+                result.ai_result = verdict
+                logger.info(f"[{result.ticker}] [AI VERDICT] {verdict.get('valid')} - {verdict.get('analysis')}")
+            done_q.put(result)
+
+    def _notify_worker(self, notify_q: Queue):
+        while True:
+            result = notify_q.get()
+            if result is _STOP:
+                return
+            if result.ai_result is None:
+                continue
+            if not result.is_alert:
+                logger.info(f"[{result.ticker}] AI Rejected the setup.")
+                continue
+            try:
+                with metrics.timer("stage_seconds", symbol=result.ticker, stage="notify"):
+                    self._emit(result)
+            except Exception as e:
+                logger.error(f"[{result.ticker}] Notify stage failed: {e}")
+
+    def _emit(self, result: ScanResult):
+        ticker, tech_result, ai_result = result.ticker, result.tech_result, result.ai_result
+        trade_plan = ai_result.get("trade_plan", {})
+        logger.info(f"[{ticker}] [TRADE PLAN] {trade_plan}")
+
+        # D. Send Notification
+        self.notifier.send_alert(ticker, tech_result, trade_plan, ai_result.get("analysis", "No analysis provided."))
+
+        # E. Log to CSV (PRD Requirement)
+        try:
+            file_exists = os.path.isfile(self.csv_file)
+
+            with open(self.csv_file, mode="a", newline="") as f:
+                writer = csv.writer(f)
+                if not file_exists:
+                    writer.writerow(["date", "ticker", "close", "signal_type", "ai_valid", "entry", "sl", "tp"])
+
+                writer.writerow([
+                    tech_result["date"],
+                    ticker,
+                    tech_result["close"],
+                    tech_result["signals"], # Might want to clean this up string-wise
+                    ai_result.get("valid"),
+                    trade_plan.get("entry"),
+                    trade_plan.get("stop_loss"),
+                    trade_plan.get("take_profit")
+                ])
+            logger.info(f"Signal logged to {self.csv_file}")
+        except Exception as e:
+            logger.error(f"Failed to log to CSV: {e}")
@@ -0,0 +1,133 @@
+"""
+Rolling health of one data provider, with a circuit breaker that recovers.
+
+- closed:    requests flow; the last PROVIDER_HEALTH_WINDOW calls give the latency percentiles
+             and error rate. PROVIDER_BREAKER_FAILURES consecutive failures, or an error rate of
+             PROVIDER_BREAKER_ERROR_RATE over at least PROVIDER_BREAKER_MIN_CALLS calls, opens the circuit.
+- open:      callers skip the provider for PROVIDER_BREAKER_COOLDOWN seconds.
+- half_open: after the cooldown exactly one caller gets through as a probe. Success closes the
+             circuit (fresh window), failure opens it for another cooldown.
+
+Calls still in flight when the circuit opened (other fetch workers, a losing hedged request) may
+report back during the cooldown or the probe. Their outcome only feeds the window: a call is the
+probe only if it started after the cooldown began (its start is derived from the reported latency).
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from config.settings import (
+    PROVIDER_HEALTH_WINDOW, PROVIDER_BREAKER_FAILURES, PROVIDER_BREAKER_ERROR_RATE,
+    PROVIDER_BREAKER_MIN_CALLS, PROVIDER_BREAKER_COOLDOWN
+)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderHealth:
+    def __init__(self, name: str, window: int = PROVIDER_HEALTH_WINDOW, failures: int = PROVIDER_BREAKER_FAILURES,
+                 error_rate: float = PROVIDER_BREAKER_ERROR_RATE, min_calls: int = PROVIDER_BREAKER_MIN_CALLS,
+                 cooldown: float = PROVIDER_BREAKER_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failures = max(1, failures)
+        self.max_error_rate = error_rate
+        self.min_calls = max(1, min_calls)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._calls: deque = deque(maxlen=max(1, window)) # (ok, latency seconds)
+        self._consecutive = 0
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None # Half-open probe in flight since
+        self.trips = 0
+
+    # --- Routing ---
+    @property
+    def available(self) -> bool:
+        """False only while the circuit is open and cooling down (no side effects)."""
+        with self._lock:
+            return self.state != OPEN or self._clock() - self.opened_at >= self.cooldown
+
+    def allow(self) -> bool:
+        """
+        May this call use the provider? Open -> half-open once the cooldown is over, and then only one probe
+        is let through (another one if the probe never reports back within a cooldown).
+        A True answer must be followed by record_success() or record_failure().
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self.probe_started = None
+            if self.probe_started is not None and now - self.probe_started < self.cooldown:
+                return False
+            self.probe_started = now
+            return True
+
+    # --- Outcomes ---
+    def record_success(self, latency: float) -> bool:
+        """Returns True when this success (the half-open probe) closed the circuit."""
+        with self._lock:
+            recovered = self.state == HALF_OPEN and self._is_probe(latency)
+            if recovered:
+                self.state, self.probe_started = CLOSED, None
+                self._calls.clear() # Judge the recovered provider on fresh calls only
+            self._calls.append((True, latency))
+            self._consecutive = 0
+            return recovered
+
+    def record_failure(self, latency: Optional[float] = None) -> bool:
+        """Returns True when this failure opened the circuit (a trip)."""
+        with self._lock:
+            self._calls.append((False, latency))
+            self._consecutive += 1
+            if self.state == HALF_OPEN:
+                tripped = self._is_probe(latency) # Failed probe
+            elif self.state == CLOSED:
+                tripped = self._consecutive >= self.failures or (
+                    len(self._calls) >= self.min_calls and self._error_rate() >= self.max_error_rate)
+            else:
+                tripped = False
+            if tripped:
+                self.state, self.opened_at, self.probe_started = OPEN, self._clock(), None
+                self.trips += 1
+            return tripped
+
+    def _is_probe(self, latency: Optional[float]) -> bool:
+        """Did a call ending now with this latency start after the circuit opened? (Unknown latency: assume so.)"""
+        if self.probe_started is None:
+            return False
+        if latency is None:
+            return True
+        # No call is admitted while open, so calls started before the cooldown's midpoint predate the trip
+        return self._clock() - latency >= self.opened_at + self.cooldown / 2
+
+    # --- Stats ---
+    def latency_quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """q-quantile of recent successful call latencies; None with fewer than min_samples."""
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._calls if ok)
+        if len(latencies) < max(1, min_samples):
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    def _error_rate(self) -> float:
+        return sum(not ok for ok, _ in self._calls) / len(self._calls) if self._calls else 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        p50, p95 = self.latency_quantile(0.5), self.latency_quantile(0.95)
+        with self._lock:
+            return {"provider": self.name, "state": self.state, "calls": len(self._calls),
+                    "error_rate": round(self._error_rate(), 3), "trips": self.trips,
+                    "p50_ms": None if p50 is None else round(1000 * p50, 1),
+                    "p95_ms": None if p95 is None else round(1000 * p95, 1)}
@@ -0,0 +1,144 @@
+"""
+On-disk cache for provider responses (GoAPI history / prices / companies, YFinance downloads).
+
+Entries live in one SQLite file (HTTP_CACHE_PATH) as zlib-compressed JSON, keyed on
+provider, endpoint and request parameters (symbols, date range; never the API key).
+Expiry follows the IDX calendar:
+- a range that ends before today (Asia/Jakarta) is final and never expires;
+- anything covering today is kept until the next market close, or HTTP_CACHE_LIVE_TTL seconds if that is sooner.
+Above HTTP_CACHE_MAX_MB the least recently used entries are evicted.
+
+Only successful, non-empty responses are stored; errors always go back to the network.
+Delete the file (or call clear()) to start over.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from config.settings import HTTP_CACHE_ENABLED, HTTP_CACHE_PATH, HTTP_CACHE_MAX_MB, HTTP_CACHE_LIVE_TTL
+from core.market_calendar import MarketCalendar
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    expires_at REAL,          -- Unix time; NULL = never (final data)
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used);
+"""
+
+
+class ResponseCache:
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_mb: float = HTTP_CACHE_MAX_MB,
+                 live_ttl: float = HTTP_CACHE_LIVE_TTL, calendar: Optional[MarketCalendar] = None):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.live_ttl = live_ttl
+        self.calendar = calendar or MarketCalendar()
+        self.stats: Counter = Counter() # hit / miss / expired / store / evict
+        self._lock = threading.Lock()
+        # One connection shared by the client threads; the lock serializes it
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(provider: str, endpoint: str, **params) -> str:
+        raw = json.dumps([provider, endpoint, params], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def expires_at(self, to_date: Optional[str] = None) -> Optional[float]:
+        """Expiry for a response whose range ends at `to_date` (None = open-ended / latest prices)."""
+        now = self.calendar.now()
+        if to_date and date.fromisoformat(str(to_date)[:10]) < now.date():
+            return None
+        expires = self.calendar.next_close(now).timestamp()
+        if self.live_ttl > 0:
+            expires = min(expires, now.timestamp() + self.live_ttl)
+        return expires
+
+    def get(self, key: str, provider: str = "http") -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, size, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] is not None and row[0] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= row[1]
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["miss"] += 1
+            else:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.stats["hit"] += 1
+        metrics.inc("http_cache_total", provider=provider, result="miss" if row is None else "hit")
+        return None if row is None else json.loads(zlib.decompress(row[2]))
+
+    def put(self, key: str, provider: str, endpoint: str, value: Any, expires_at: Optional[float]):
+        body = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, endpoint, expires_at, last_used, size, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, endpoint, expires_at, time.time(), len(body), body))
+            self._size += len(body) - (old[0] if old else 0)
+            self.stats["store"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the bound (caller holds the lock)."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        self._conn.execute("BEGIN")
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if self._size <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            evicted += 1
+        self._conn.execute("COMMIT")
+        self.stats["evict"] += evicted
+        logger.info(f"HTTP cache over {self.max_bytes / 2**20:.0f} MB: evicted {evicted} least recently used entries")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    def summary(self) -> Dict[str, object]:
+        """Hit/miss counters of this process plus the file's current size (for logs and status output)."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            stats = dict(self.stats)
+        lookups = stats.get("hit", 0) + stats.get("miss", 0)
+        return {**stats, "hit_rate": round(stats.get("hit", 0) / lookups, 3) if lookups else 0.0,
+                "entries": entries, "size_mb": round(self._size / 2**20, 2)}
+
+
+@lru_cache(maxsize=None)
+def _shared(path: str) -> ResponseCache:
+    return ResponseCache(path)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, or None when HTTP_CACHE_ENABLED is off (callers then always hit the network)."""
+    return _shared(HTTP_CACHE_PATH) if HTTP_CACHE_ENABLED else None
@@ -1,143 +1,288 @@
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from config.settings import (
     RSI_OVERSOLD, VOLUME_SPIKE_FACTOR, EMA_LONG, EMA_MEDIUM, EMA_SHORT,
     VOL_BREAKOUT_FACTOR, MIN_PRICE_CHANGE,
-    BSJP_CLOSE_THRESHOLD, BSJP_MIN_VOLUME
+    BSJP_CLOSE_THRESHOLD, BSJP_MIN_VOLUME,
+    RSI_LENGTH, ATR_LENGTH, VOLUME_SMA_LENGTH, ANALYSIS_WORKERS
 )
+from core import indicator_state, indicators
+
+# Columns the rule set reads: latest candle + indicators, and the previous bar's values
+SNAPSHOT_COLUMNS = indicator_state.SNAPSHOT_COLUMNS
+
 
 class TechnicalAnalyzer:
-    def __init__(self):
-        pass
+    def __init__(self, workers: int = ANALYSIS_WORKERS):
+        self.workers = workers # analyze_batch process pool (core/parallel_analysis.py); 1 = in-process
 
     def analyze(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
         Analyze a single stock's dataframe for swing trading setup.
-        Expected DF columns: 'open', 'high', 'low', 'close', 'volume'
+        Expected DF columns: 'open', 'high', 'low', 'close', 'volume' (a candle frame works as-is)
         """
         if len(df) < EMA_LONG:
-            # Fallback for young stocks or short history -> Check Breakout only? 
+            # Fallback for young stocks or short history -> Check Breakout only?
             # For now, let's just return limitation, but normally we'd allow breakout check.
             pass
 
-        # Calculate Indicators
+        # Calculate Indicators (core/indicators.py kernels, same definitions as pandas_ta)
+        close = df['close'].to_numpy(dtype=float)
+
         # EMA
         if len(df) >= EMA_LONG:
-            df['ema_200'] = ta.ema(df['close'], length=EMA_LONG)
+            df['ema_200'] = indicators.ema(close, EMA_LONG)
         else:
             df['ema_200'] = 0 # Placeholder
-            
-        df['ema_50'] = ta.ema(df['close'], length=EMA_MEDIUM)
-        df['ema_20'] = ta.ema(df['close'], length=EMA_SHORT)
-        
+
+        df['ema_50'] = indicators.ema(close, EMA_MEDIUM)
+        df['ema_20'] = indicators.ema(close, EMA_SHORT)
+
         # RSI
-        df['rsi'] = ta.rsi(df['close'], length=14)
-        
+        df['rsi'] = indicators.rsi(close, RSI_LENGTH)
+
         # ATR (for Volatility/SL)
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=14)
-        
+        df['atr'] = indicators.atr(df['high'], df['low'], close, ATR_LENGTH)
+
         # Volume SMA
-        df['vol_avg'] = ta.sma(df['volume'], length=20)
+        df['vol_avg'] = indicators.sma(df['volume'], VOLUME_SMA_LENGTH)
 
         # Get latest candle (assuming DF is sorted ascending, last row is today)
         latest = df.iloc[-1]
         prev = df.iloc[-2]
 
-        # --- Criteria Checks ---
-        
-        # 1. Trend: Price > EMA 200
-        is_uptrend = (latest['close'] > latest['ema_200']) if latest['ema_200'] > 0 else False
-        
-        # 2. Momentum:
-        # A) RSI crosses above 30 (Oversold Bounce)
-        rsi_bounce = (prev['rsi'] < RSI_OVERSOLD) and (latest['rsi'] >= RSI_OVERSOLD)
-        
-        # B) Golden Cross (EMA20 > EMA50)
-        golden_cross = (prev['ema_20'] < prev['ema_50']) and (latest['ema_20'] > latest['ema_50'])
-        
-        # Combined Momentum signal (OR condition per PRD)
-        momentum_signal = rsi_bounce or golden_cross
-        
-        # 3. Volume Spike
-        is_volume_spike = latest['volume'] > (latest['vol_avg'] * VOLUME_SPIKE_FACTOR)
-        
-        # --- NEW: Volatility Breakout (Gorengan Mode) ---
-        # Logic: 
-        # 1. Volume > 2x Avg
-        # 2. Price Change > 3% (approx)
-        # 3. Close > Open (Green Candle)
-        
-        price_change_pct = (latest['close'] - prev['close']) / prev['close']
-        is_breakout_vol = latest['volume'] > (latest['vol_avg'] * VOL_BREAKOUT_FACTOR)
-        is_strong_move = price_change_pct > MIN_PRICE_CHANGE
-        is_green = latest['close'] > latest['open']
-        
-        is_volatility_breakout = is_breakout_vol and is_strong_move and is_green
-
-        # --- NEW: BSJP (Beli Sore Jual Pagi) ---
-        # Logic:
-        # 1. Close > Open (Green Candle)
-        # 2. Strong Close: Close is in the top 10% of the day's range
-        # 3. Volume > Average
-        
-        day_range = latest['high'] - latest['low']
-        if day_range > 0:
-            strong_close_ratio = (latest['close'] - latest['low']) / day_range
-            is_strong_close = strong_close_ratio >= BSJP_CLOSE_THRESHOLD
+        snapshot = {col: latest[col] for col in SNAPSHOT_COLUMNS if not col.startswith("prev_")}
+        snapshot.update({f"prev_{col}": prev[col] for col in ("close", "rsi", "ema_20", "ema_50")})
+        # NaN (indicator not computable on short history) makes every check evaluate to False
+        snap = pd.DataFrame([snapshot]).astype(float)
+
+        result = _build_result(_evaluate_rules(snap).iloc[0])
+        if "date" in df.columns:
+            result["date"] = _format_date(latest["date"])
         else:
-            is_strong_close = False # Doji or Flat
-            
-        is_uptrend_short = latest['close'] > latest['ema_20'] if latest['ema_20'] > 0 else False
-        is_volume_ok = latest['volume'] > (latest['vol_avg'] * BSJP_MIN_VOLUME)
-        
-        is_bsjp = is_green and is_strong_close and is_volume_ok and is_uptrend_short
-
-        # --- Final Decision ---
-        # Swing Setup OR Breakout Setup OR BSJP
-        is_swing_setup = is_uptrend and momentum_signal and is_volume_spike
-        
-        is_valid_setup = is_swing_setup or is_volatility_breakout or is_bsjp
-        
-        reason = []
-        if not is_swing_setup: 
-            reason.append("Not Swing Setup")
-        if not is_volatility_breakout:
-            reason.append("Not Volatility Breakout")
-        if not is_bsjp:
-            reason.append("Not BSJP")
-
-        # Determine Signal Type
-        signal_type = "None"
-        if is_bsjp:
-            signal_type = "BSJP (Overnight Gap)"
-            if is_volatility_breakout: signal_type += " + Breakout"
-        elif is_volatility_breakout:
-            signal_type = "Volatility Breakout"
-            if is_swing_setup: signal_type += " + Swing"
-        elif is_swing_setup:
-            signal_type = "Trend Swing"
-
-        return {
-            "valid": is_valid_setup,
-            "signal_type": signal_type,
-            "symbol": "UNKNOWN", 
-            "date": str(latest.name) if isinstance(latest.name, (str, pd.Timestamp)) else "today",
-            "close": latest['close'],
-            "indicators": {
-                "ema_200": latest['ema_200'],
-                "rsi": latest['rsi'],
-                "atr": latest['atr'],
-                "volume_ratio": latest['volume'] / latest['vol_avg'] if latest['vol_avg'] else 0,
-                "price_change": price_change_pct
-            },
-            "signals": {
-                "uptrend": bool(is_uptrend),
-                "rsi_bounce": bool(rsi_bounce),
-                "golden_cross": bool(golden_cross),
-                "volume_spike": bool(is_volume_spike),
-                "vol_breakout": bool(is_volatility_breakout),
-                "bsjp": bool(is_bsjp)
-            },
-            "reason": "; ".join(reason) if not is_valid_setup else f"Valid: {signal_type}"
-        }
+            result["date"] = str(latest.name) if isinstance(latest.name, (str, pd.Timestamp)) else "today"
+        if "symbol" in df.columns:
+            result["symbol"] = latest["symbol"]
+        return result
+
+    def analyze_batch(self, panel: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze many stocks at once from a long-format (symbol, date) panel.
+        Expected columns (or index levels): 'symbol', 'date', 'open', 'high', 'low', 'close', 'volume'
+
+        Indicators are computed with the 2-D kernels of core/indicators.py (same definitions as pandas_ta),
+        on a process pool for large panels, and the rules are evaluated as boolean column expressions
+        over one snapshot row per symbol.
+        Returns {symbol: result} in order of first appearance, each result shaped like analyze().
+        """
+        if "symbol" not in panel.columns:
+            panel = panel.reset_index()
+        if panel.empty:
+            return {}
+
+        order = pd.unique(panel["symbol"])
+        panel = panel.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+
+        from core.parallel_analysis import latest_indicators # Imports this module back
+        snap = latest_indicators(panel, self.workers).set_index("symbol")
+        snap = _evaluate_rules(snap[SNAPSHOT_COLUMNS + ["date"]]).reindex(order)
+
+        results = {}
+        for symbol, row in snap.iterrows():
+            result = _build_result(row)
+            result["symbol"] = symbol
+            result["date"] = _format_date(row["date"])
+            results[symbol] = result
+        return results
+
+    def analyze_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze a symbol from its persisted streaming indicator state (DBManager.get_indicator_state).
+        Reads the latest/previous indicator values directly, no history or recomputation needed.
+        """
+        return self.analyze_states([state])[state["symbol"]]
+
+    def analyze_states(self, states: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Vectorized analyze_state over many symbols. Returns {symbol: result}."""
+        states = list(states)
+        if not states:
+            return {}
+        snap = pd.DataFrame(
+            [indicator_state.snapshot(state) for state in states],
+            index=[state["symbol"] for state in states],
+            columns=SNAPSHOT_COLUMNS,
+        ).astype(float)
+        snap = _evaluate_rules(snap)
+
+        results = {}
+        for state, (symbol, row) in zip(states, snap.iterrows()):
+            result = _build_result(row)
+            result["symbol"] = symbol
+            result["date"] = state["last_date"]
+            results[symbol] = result
+        return results
+
+
+def compute_indicators(panel: pd.DataFrame, point_in_time: bool = False) -> pd.DataFrame:
+    """
+    Add indicator and previous-bar columns to a panel sorted by (symbol, date).
+    The panel is laid out as (symbols x time) matrices, each history right-aligned, and run through
+    the 2-D kernels of core/indicators.py (pandas_ta definitions), without a Python loop over symbols.
+
+    By default the history-length gates (EMA200 placeholder, RSI/ATR warm-up) use each symbol's full length,
+    like analyze() on the latest bar. With point_in_time=True every bar only sees the bars up to itself,
+    which is what a backtest needs.
+    """
+    df = panel.copy()
+    symbol = df["symbol"]
+    grouped = df.groupby(symbol, sort=False)
+    pos = grouped.cumcount()
+    length = grouped["close"].transform("size")
+    size = pos + 1 if point_in_time else length
+
+    # Row / column of every bar in the (symbols x time) matrices
+    row = grouped.ngroup().to_numpy()
+    column = (pos + (length.max() - length)).to_numpy()
+    shape = (row.max() + 1, int(length.max()))
+
+    def matrix(col: str) -> np.ndarray:
+        values = np.full(shape, np.nan)
+        values[row, column] = df[col].to_numpy(dtype=float)
+        return values
+
+    def bars(values: np.ndarray) -> pd.Series:
+        return pd.Series(values[row, column], index=df.index)
+
+    close, high, low = matrix("close"), matrix("high"), matrix("low")
+    df["ema_200"] = bars(indicators.ema(close, EMA_LONG)).where(size >= EMA_LONG, 0) # Placeholder like analyze()
+    df["ema_50"] = bars(indicators.ema(close, EMA_MEDIUM)).where(size >= EMA_MEDIUM)
+    df["ema_20"] = bars(indicators.ema(close, EMA_SHORT)).where(size >= EMA_SHORT)
+    df["rsi"] = bars(indicators.rsi(close, RSI_LENGTH)).where(size > RSI_LENGTH)
+    df["atr"] = bars(indicators.atr(high, low, close, ATR_LENGTH)).where(size > ATR_LENGTH)
+    df["vol_avg"] = bars(indicators.sma(matrix("volume"), VOLUME_SMA_LENGTH))
+
+    df["prev_close"] = grouped["close"].shift(1)
+    for col in ("rsi", "ema_20", "ema_50"):
+        df[f"prev_{col}"] = df.groupby(symbol, sort=False)[col].shift(1)
+    return df
+
+
+def _evaluate_rules(snap: pd.DataFrame) -> pd.DataFrame:
+    """
+    Evaluate the swing, volatility breakout and BSJP rules as boolean column expressions.
+    `snap` holds one row per symbol (or per bar) with SNAPSHOT_COLUMNS. NaN inputs evaluate to False.
+    """
+    out = snap.copy()
+    close, open_, high, low = out["close"], out["open"], out["high"], out["low"]
+    volume, vol_avg = out["volume"], out["vol_avg"]
+
+    # --- Criteria Checks ---
+
+    # 1. Trend: Price > EMA 200
+    out["uptrend"] = (out["ema_200"] > 0) & (close > out["ema_200"])
+
+    # 2. Momentum:
+    # A) RSI crosses above 30 (Oversold Bounce)
+    out["rsi_bounce"] = (out["prev_rsi"] < RSI_OVERSOLD) & (out["rsi"] >= RSI_OVERSOLD)
+
+    # B) Golden Cross (EMA20 > EMA50)
+    out["golden_cross"] = (out["prev_ema_20"] < out["prev_ema_50"]) & (out["ema_20"] > out["ema_50"])
+
+    # Combined Momentum signal (OR condition per PRD)
+    momentum_signal = out["rsi_bounce"] | out["golden_cross"]
+
+    # 3. Volume Spike
+    out["volume_spike"] = volume > (vol_avg * VOLUME_SPIKE_FACTOR)
+
+    # --- Volatility Breakout (Gorengan Mode) ---
+    # Logic:
+    # 1. Volume > 2x Avg
+    # 2. Price Change > 3% (approx)
+    # 3. Close > Open (Green Candle)
+    out["price_change"] = (close - out["prev_close"]) / out["prev_close"]
+    is_green = close > open_
+    out["vol_breakout"] = (volume > (vol_avg * VOL_BREAKOUT_FACTOR)) & (out["price_change"] > MIN_PRICE_CHANGE) & is_green
+
+    # --- BSJP (Beli Sore Jual Pagi) ---
+    # Logic:
+    # 1. Close > Open (Green Candle)
+    # 2. Strong Close: Close is in the top 10% of the day's range
+    # 3. Volume > Average
+    day_range = high - low
+    strong_close_ratio = (close - low) / day_range.where(day_range > 0) # Doji or Flat -> NaN -> False
+    is_strong_close = strong_close_ratio >= BSJP_CLOSE_THRESHOLD
+    is_uptrend_short = (out["ema_20"] > 0) & (close > out["ema_20"])
+    is_volume_ok = volume > (vol_avg * BSJP_MIN_VOLUME)
+    out["bsjp"] = is_green & is_strong_close & is_volume_ok & is_uptrend_short
+
+    # --- Final Decision ---
+    # Swing Setup OR Breakout Setup OR BSJP
+    out["swing"] = out["uptrend"] & momentum_signal & out["volume_spike"]
+    out["valid"] = out["swing"] | out["vol_breakout"] | out["bsjp"]
+
+    out["volume_ratio"] = (volume / vol_avg.where(vol_avg != 0)).where(vol_avg != 0, 0)
+
+    # Determine Signal Type
+    out["signal_type"] = np.select(
+        [
+            out["bsjp"] & out["vol_breakout"],
+            out["bsjp"],
+            out["vol_breakout"] & out["swing"],
+            out["vol_breakout"],
+            out["swing"],
+        ],
+        [
+            "BSJP (Overnight Gap) + Breakout",
+            "BSJP (Overnight Gap)",
+            "Volatility Breakout + Swing",
+            "Volatility Breakout",
+            "Trend Swing",
+        ],
+        default="None",
+    )
+    return out
+
+
+def _build_result(row: pd.Series) -> Dict[str, Any]:
+    """Shape one evaluated snapshot row into the analyze() result dict."""
+    is_valid_setup = bool(row["valid"])
+    signal_type = row["signal_type"]
+
+    reason = []
+    if not row["swing"]:
+        reason.append("Not Swing Setup")
+    if not row["vol_breakout"]:
+        reason.append("Not Volatility Breakout")
+    if not row["bsjp"]:
+        reason.append("Not BSJP")
+
+    return {
+        "valid": is_valid_setup,
+        "signal_type": signal_type,
+        "symbol": "UNKNOWN",
+        "date": "today",
+        "close": row["close"],
+        "indicators": {
+            "ema_200": row["ema_200"],
+            "rsi": row["rsi"],
+            "atr": row["atr"],
+            "volume_ratio": row["volume_ratio"],
+            "price_change": row["price_change"]
+        },
+        "signals": {
+            "uptrend": bool(row["uptrend"]),
+            "rsi_bounce": bool(row["rsi_bounce"]),
+            "golden_cross": bool(row["golden_cross"]),
+            "volume_spike": bool(row["volume_spike"]),
+            "vol_breakout": bool(row["vol_breakout"]),
+            "bsjp": bool(row["bsjp"])
+        },
+        "reason": "; ".join(reason) if not is_valid_setup else f"Valid: {signal_type}"
+    }
+
+
+def _format_date(value) -> str:
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    return str(value)
@@ -0,0 +1,122 @@
+"""
+Universe mode: scan the whole IDX listing (~900 names) instead of the watchlist.
+
+Stages, each seeing only the survivors of the previous one:
+1. Fetch: candles are brought up to date in chunks of UNIVERSE_CHUNK_SIZE symbols (bulk daily append,
+   per-symbol history only for the rest), so only one chunk of candles is in memory at a time.
+2. Prefilter: one SQL aggregate over daily_candles (DBManager.prefilter_symbols) drops stale,
+   cheap, illiquid and quiet names. The volume check is the weakest volume condition of the
+   requested rules, so it never drops a symbol that could have signalled.
+3. Analyze -> AI validate -> notify: ScanPipeline.run on the survivors, without fetching again.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config.settings import (
+    UNIVERSE_CHUNK_SIZE, UNIVERSE_MIN_PRICE, UNIVERSE_MIN_AVG_VALUE, UNIVERSE_LIQUIDITY_DAYS,
+    VOLUME_SMA_LENGTH, VOLUME_SPIKE_FACTOR, VOL_BREAKOUT_FACTOR, BSJP_MIN_VOLUME
+)
+from config.watchlist import WATCHLIST
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Signal flag -> volume / vol_avg ratio it requires (see strategy._evaluate_rules)
+VOLUME_FACTORS = {"swing": VOLUME_SPIKE_FACTOR, "vol_breakout": VOL_BREAKOUT_FACTOR, "bsjp": BSJP_MIN_VOLUME}
+
+
+@dataclass
+class UniverseReport:
+    counts: Dict[str, int] = field(default_factory=dict) # Stage name -> symbols left, in stage order
+    survivors: List[str] = field(default_factory=list)   # Symbols passed to the full analysis
+    results: list = field(default_factory=list)          # ScanResult per survivor
+
+    def summary(self) -> str:
+        return " -> ".join(f"{stage} {count}" for stage, count in self.counts.items())
+
+
+class UniverseScanner:
+    def __init__(self, db, pipeline, chunk_size: int = UNIVERSE_CHUNK_SIZE, min_price: float = UNIVERSE_MIN_PRICE,
+                 min_avg_value: float = UNIVERSE_MIN_AVG_VALUE, liquidity_days: int = UNIVERSE_LIQUIDITY_DAYS):
+        self.db = db
+        self.pipeline = pipeline # ScanPipeline (its planner/client do the fetching)
+        self.chunk_size = max(1, chunk_size)
+        self.min_price = min_price
+        self.min_avg_value = min_avg_value
+        self.liquidity_days = liquidity_days
+
+    def load_universe(self) -> List[str]:
+        """Listed symbols from GoAPI, else every symbol already stored, else the watchlist."""
+        client = self.pipeline.planner.client
+        if not getattr(client, "use_fallback_mode", True):
+            symbols = client.goapi.get_companies()
+            if symbols:
+                return symbols
+            logger.warning("GoAPI company list unavailable, using stored symbols")
+        return self.db.get_symbols() or list(WATCHLIST)
+
+    def run(self, symbols: Optional[List[str]] = None, signals: Optional[List[str]] = None,
+            fetch: bool = True) -> UniverseReport:
+        symbols = list(dict.fromkeys(symbols or self.load_universe()))
+        report = UniverseReport()
+        report.counts["universe"] = len(symbols)
+
+        # 1. Fetch, chunk by chunk
+        start = time.perf_counter()
+        if fetch:
+            failed = self.fetch(symbols)
+            report.counts["fetched"] = len(symbols) - failed
+            logger.info(f"Universe fetch: {len(symbols)} symbols in {time.perf_counter() - start:.1f}s ({failed} failed)")
+
+        # 2. SQL prefilter
+        start = time.perf_counter()
+        volume_factor = min(VOLUME_FACTORS[s] for s in signals if s in VOLUME_FACTORS) if signals else min(VOLUME_FACTORS.values())
+        with metrics.timer("stage_seconds", stage="prefilter"):
+            screen = self.db.prefilter_symbols(
+                symbols, self.min_price, self.min_avg_value, volume_factor,
+                days=self.liquidity_days, volume_days=VOLUME_SMA_LENGTH
+            )
+        passed = set()
+        if not screen.empty:
+            report.counts["stored"] = len(screen)
+            for column, stage in (("is_current", "current"), ("price_ok", "price"),
+                                  ("liquidity_ok", "liquidity"), ("volume_ok", "volume")):
+                report.counts[stage] = int(screen[column].sum())
+            passed = set(screen.loc[screen["volume_ok"], "symbol"])
+        report.survivors = [s for s in symbols if s in passed]
+        logger.info(f"Universe prefilter: {len(report.survivors)}/{len(symbols)} survivors in {1000 * (time.perf_counter() - start):.0f} ms")
+
+        # 3. Full analysis, AI validation and alerts on survivors only
+        report.results = self.pipeline.run(report.survivors, signals=signals, fetch=False)
+        report.counts["signals"] = sum(1 for r in report.results if r.tech_result and r.tech_result["valid"])
+        report.counts["ai_validated"] = sum(1 for r in report.results if r.ai_result is not None)
+        report.counts["alerts"] = sum(1 for r in report.results if r.is_alert)
+        for stage, count in report.counts.items():
+            metrics.inc("universe_symbols_total", count, stage=stage)
+        logger.info(f"Universe scan: {report.summary()}")
+        return report
+
+    def fetch(self, symbols: List[str]) -> int:
+        """Bring candles up to date chunk by chunk. Returns the number of symbols whose fetch failed."""
+        failed = 0
+        workers = self.pipeline.fetch_workers
+        for i in range(0, len(symbols), self.chunk_size):
+            chunk = symbols[i:i + self.chunk_size]
+            pending = self.pipeline.fetch(chunk)
+            if pending:
+                with ThreadPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                    failed += sum(not ok for ok in executor.map(self._update, pending))
+            logger.info(f"Universe fetch: {min(i + self.chunk_size, len(symbols))}/{len(symbols)} symbols")
+        return failed
+
+    def _update(self, symbol: str) -> bool:
+        try:
+            with metrics.timer("stage_seconds", symbol=symbol, stage="fetch"):
+                self.pipeline.planner.update(symbol)
+            return True
+        except Exception as e:
+            logger.error(f"[{symbol}] Fetch failed: {e}")
+            return False
@@ -1,75 +1,132 @@
-import yfinance as yf
 import pandas as pd
 import logging
-from typing import List, Optional
-from database.db_manager import DailyCandle
+import threading
+import time
+from typing import Dict, List, Optional
+from database.db_manager import empty_candle_frame, to_candle_frame
 from datetime import datetime
+from config.settings import YFINANCE_MAX_CONCURRENCY
+from core.metrics import metrics
+from core.response_cache import get_response_cache
 
 logger = logging.getLogger(__name__)
 
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
 class YFinanceClient:
-    def get_historical_data(self, symbol: str, from_date: str = None, to_date: str = None) -> List[DailyCandle]:
+    def __init__(self):
+        self._limiter = threading.BoundedSemaphore(YFINANCE_MAX_CONCURRENCY)
+        self.cache = get_response_cache() # None unless HTTP_CACHE_ENABLED
+
+    def get_historical_data(self, symbol: str, from_date: str = None, to_date: str = None) -> pd.DataFrame:
         """
         Fetch historical data from Yahoo Finance.
         Handles symbol conversion (e.g., BBCA -> BBCA.JK).
         """
+        return self.get_historical_data_batch([symbol], from_date, to_date)
+
+    def get_historical_data_batch(self, symbols: List[str], from_date: str = None, to_date: str = None) -> pd.DataFrame:
+        """
+        Fetch historical data for many symbols with a single yf.download call.
+        Returns one candle frame sorted by (symbol, date); symbols without data are absent.
+        Non-empty results are kept in the response cache (when enabled), like GoAPI responses.
+        """
+        if not symbols:
+            return empty_candle_frame()
+
+        cache = self.cache
+        if cache is not None:
+            key = cache.key("yfinance", "download", symbols=sorted(symbols), start=from_date, end=to_date)
+            cached = cache.get(key, "yfinance")
+            if cached is not None:
+                return to_candle_frame(pd.DataFrame(cached))
+
         # Convert symbol to YF format (add .JK for Indonesia)
-        yf_symbol = f"{symbol}.JK"
-        
-        logger.info(f"Fetching YFinance data for {yf_symbol}...")
-        
+        yf_symbols = {f"{symbol}.JK": symbol for symbol in symbols}
+
+        logger.info(f"Fetching YFinance data for {len(yf_symbols)} symbols...")
+
         try:
             # Fetch data
             # YF expects YYYY-MM-DD
-            df = yf.download(yf_symbol, start=from_date, end=to_date, progress=False)
-            
-            if df.empty:
-                logger.warning(f"No YFinance data found for {yf_symbol}")
-                return []
-            
-            # Fix: Handle MultiIndex columns (Common in new yfinance)
-            # e.g. columns might be ('Close', 'SCMA.JK')
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.droplevel(1)
-            
-            candles = []
-            # YFinance returns DateTime index. Reset it to access Date column.
-            df = df.reset_index()
-            
-            for _, row in df.iterrows():
+            import yfinance as yf # Imported on first use: only needed in fallback mode
+            with self._limiter:
+                start, df = time.perf_counter(), None
                 try:
-                    # YFinance columns are MultiIndex if multiple tickers, but singular here.
-                    # Standard columns: Date, Open, High, Low, Close, Adj Close, Volume
-                    # We use 'Close' or 'Adj Close'? Standard is usually Adj Close for backtesting, 
-                    # but GoAPI might return raw close. Let's stick to 'Close' for consistency with signal detection 
-                    # unless user specifies. 'Close' is raw.
-                    
-                    # Handle potential header issues (sometimes lowercase)
-                    date_val = row['Date'].strftime("%Y-%m-%d")
-                    
-                    # Extract scalar values safely
-                    open_val = float(row['Open'].iloc[0]) if isinstance(row['Open'], pd.Series) else float(row['Open'])
-                    high_val = float(row['High'].iloc[0]) if isinstance(row['High'], pd.Series) else float(row['High'])
-                    low_val = float(row['Low'].iloc[0]) if isinstance(row['Low'], pd.Series) else float(row['Low'])
-                    close_val = float(row['Close'].iloc[0]) if isinstance(row['Close'], pd.Series) else float(row['Close'])
-                    vol_val = int(row['Volume'].iloc[0]) if isinstance(row['Volume'], pd.Series) else int(row['Volume'])
-                    
-                    candles.append(DailyCandle(
-                        symbol=symbol, # Store as original symbol (BBCA) not BBCA.JK
-                        date=date_val,
-                        open=open_val,
-                        high=high_val,
-                        low=low_val,
-                        close=close_val,
-                        volume=vol_val
-                    ))
-                except Exception as row_err:
-                    # logger.debug(f"Skipping row due to error: {row_err}")
-                    continue
-                    
-            logger.info(f"Retrieved {len(candles)} candles from YFinance")
+                    df = yf.download(list(yf_symbols), start=from_date, end=to_date, progress=False, group_by="column")
+                finally:
+                    metrics.record_request("yfinance", "download", start, ok=df is not None)
+
+            if df is None or df.empty:
+                logger.warning(f"No YFinance data found for {list(yf_symbols)}")
+                return empty_candle_frame()
+
+            long_df = self._to_long(df, list(yf_symbols))
+            candles = self._to_candle_frame(long_df, yf_symbols)
+
+            returned = set(candles["symbol"])
+            missing = [s for s in symbols if s not in returned]
+            if missing:
+                logger.warning(f"No YFinance data found for {missing}")
+            logger.info(f"Retrieved {len(candles)} candles from YFinance for {len(returned)} symbols")
+            if cache is not None and not candles.empty:
+                cache.put(key, "yfinance", "download", {col: candles[col].tolist() for col in candles.columns},
+                          cache.expires_at(to_date))
             return candles
-            
+
         except Exception as e:
-            logger.error(f"YFinance Error for {symbol}: {e}")
-            return []
+            logger.error(f"YFinance Error for {symbols}: {e}")
+            return empty_candle_frame()
+
+    @staticmethod
+    def _to_long(df: pd.DataFrame, yf_symbols: List[str]) -> pd.DataFrame:
+        """
+        Reshape the yf.download frame into one row per (Ticker, Date).
+        New yfinance returns MultiIndex columns (Price, Ticker) even for one ticker;
+        older versions return flat columns for a single ticker.
+        """
+        if isinstance(df.columns, pd.MultiIndex):
+            level = "Ticker" if "Ticker" in df.columns.names else 1
+            long_df = df.stack(level=level, future_stack=True)
+            long_df.index.names = ["Date", "Ticker"]
+        else:
+            long_df = df.copy()
+            long_df["Ticker"] = yf_symbols[0]
+            long_df.index.name = "Date"
+            long_df = long_df.set_index("Ticker", append=True)
+        return long_df.reset_index()
+
+    @staticmethod
+    def _to_candle_frame(long_df: pd.DataFrame, yf_symbols: Dict[str, str]) -> pd.DataFrame:
+        """Column-wise conversion with explicit NaN handling."""
+        # YFinance columns: Date, Open, High, Low, Close, (Adj Close), Volume
+        # We use 'Close' (raw) for consistency with GoAPI and signal detection.
+        prices = long_df[PRICE_COLUMNS]
+
+        # Rows with no prices at all are dates the ticker did not trade (or was not listed yet)
+        no_trade = prices.isna().all(axis=1)
+        # Rows with only some prices are broken quotes: drop them, but say so
+        partial = prices.isna().any(axis=1) & ~no_trade
+        if partial.any():
+            dropped = long_df.loc[partial, "Ticker"].value_counts().to_dict()
+            logger.warning(f"Dropping {int(partial.sum())} YFinance rows with incomplete OHLC: {dropped}")
+
+        df = long_df.loc[~(no_trade | partial)]
+        if df.empty:
+            return empty_candle_frame()
+
+        # Volume may be missing on otherwise valid rows -> treat as zero volume
+        volume = df["Volume"]
+        if volume.isna().any():
+            logger.debug(f"{int(volume.isna().sum())} YFinance rows without volume, using 0")
+
+        candles = to_candle_frame(pd.DataFrame({
+            "symbol": df["Ticker"].map(yf_symbols), # Store as original symbol (BBCA) not BBCA.JK
+            "date": pd.to_datetime(df["Date"]),
+            "open": df["Open"],
+            "high": df["High"],
+            "low": df["Low"],
+            "close": df["Close"],
+            "volume": volume.fillna(0),
+        }))
+        return candles.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
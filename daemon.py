@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from main import build_pipeline, configure_logging
+from config.watchlist import WATCHLIST
+from config.settings import DAEMON_POLL_SECONDS, DAEMON_TRIGGER_FILE, TELEGRAM_FLUSH_TIMEOUT, SCAN_UNIVERSE
+from database.db_manager import DBManager
+from core.market_calendar import MarketCalendar
+from core.intraday import IntradayScanner
+from core.universe import UniverseScanner
+from core.metrics import metrics
+
+logger = logging.getLogger("daemon")
+
+# Scan name -> signal filter passed to ScanPipeline.run ("intraday" runs IntradayScanner instead)
+SCANS = {"intraday": ["bsjp"], "bsjp": ["bsjp"], "full": None}
+
+
+class ScanDaemon:
+    """
+    Resident scanner: imports, DB engine, HTTP sessions, the AI/Telegram clients and the
+    indicator states are set up once and reused by every scan.
+
+    Scans follow the IDX calendar (core/market_calendar.py): intraday BSJP polling in the last
+    session (GoAPI only), a pre-close BSJP scan and a post-close full scan on each trading day.
+    Creating DAEMON_TRIGGER_FILE runs a scan right away (file content "intraday" or "bsjp",
+    anything else for a full scan). With SCAN_UNIVERSE the full scan covers the whole IDX listing.
+    """
+
+    def __init__(self, tickers: List[str], calendar: Optional[MarketCalendar] = None,
+                 trigger_file: str = DAEMON_TRIGGER_FILE, poll_seconds: int = DAEMON_POLL_SECONDS):
+        self.tickers = tickers
+        self.calendar = calendar or MarketCalendar()
+        self.trigger_file = trigger_file
+        self.poll_seconds = max(1, poll_seconds)
+        self._stop = threading.Event()
+
+        self.db = DBManager(cache_states=True) # Sole writer while resident -> keep states in memory
+        self.db.init_db()
+        self.pipeline = build_pipeline(self.db)
+        client = self.pipeline.planner.client
+        self.intraday = IntradayScanner(self.db, client.goapi, self.pipeline.ai, self.pipeline.notifier, self.calendar)
+        self.universe = UniverseScanner(self.db, self.pipeline) if SCAN_UNIVERSE else None
+
+    def warm_up(self):
+        """Load indicator states into memory so the first scan does no rebuilds."""
+        start = time.perf_counter()
+        states = self.db.get_indicator_states(self.tickers)
+        logger.info(f"Warm-up: {len(states)}/{len(self.tickers)} indicator states loaded in {time.perf_counter() - start:.2f}s")
+
+    def run_forever(self):
+        self.warm_up()
+        while not self._stop.is_set():
+            scan = self.calendar.next_scan()
+            logger.info(f"Next scheduled scan: {scan.name} at {scan.at:%Y-%m-%d %H:%M %Z}")
+            name = self._wait_until(scan.at)
+            if self._stop.is_set():
+                break
+            self.run_scan(name or scan.name)
+
+    def run_scan(self, name: str):
+        if name == "intraday":
+            self.run_intraday()
+            return
+        logger.info(f"=== Starting {name} scan ===")
+        metrics.reset()
+        start = time.perf_counter()
+        try:
+            with metrics.timer("run_seconds", scan=name):
+                if name == "full" and self.universe is not None:
+                    results = self.universe.run().results
+                else:
+                    results = self.pipeline.run(self.tickers, signals=SCANS.get(name))
+            alerts = sum(1 for result in results if result.is_alert)
+            logger.info(f"=== {name} scan done in {time.perf_counter() - start:.1f}s, {alerts} alert(s) ===")
+            logger.info(f"Provider health: {self.pipeline.planner.client.health_report()}")
+            if self.pipeline.planner.client.goapi.cache is not None:
+                logger.info(f"HTTP cache: {self.pipeline.planner.client.goapi.cache.summary()}")
+        except Exception as e:
+            logger.error(f"{name} scan failed: {e}")
+        finally:
+            self._write_metrics()
+
+    def _write_metrics(self):
+        try:
+            metrics.write_reports()
+        except OSError as e:
+            logger.error(f"Failed to write run metrics: {e}")
+
+    def run_intraday(self):
+        """Poll bulk prices until the pre-close. Needs GoAPI; otherwise the scheduled BSJP scan covers it."""
+        if self.pipeline.planner.client.use_fallback_mode:
+            logger.warning("Intraday mode needs GoAPI bulk prices (fallback mode active), skipping")
+            return
+        now = self.calendar.now()
+        until = self.calendar.preclose(now.date())
+        if now >= until:
+            return
+        logger.info(f"=== Intraday BSJP polling until {until:%H:%M} ===")
+        try:
+            self.intraday.run_session(self.tickers, until, self._stop)
+        except Exception as e:
+            logger.error(f"Intraday session failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.pipeline.notifier.close(timeout=TELEGRAM_FLUSH_TIMEOUT)
+        self.db.close()
+
+    def _wait_until(self, when: datetime) -> Optional[str]:
+        """Sleep until `when`; returns a scan name early if the trigger file appears."""
+        while not self._stop.is_set():
+            if os.path.exists(self.trigger_file):
+                return self._consume_trigger()
+            remaining = (when - self.calendar.now()).total_seconds()
+            if remaining <= 0:
+                return None
+            self._stop.wait(min(remaining, self.poll_seconds))
+        return None
+
+    def _consume_trigger(self) -> str:
+        try:
+            with open(self.trigger_file) as f:
+                content = f.read().strip().lower()
+            os.remove(self.trigger_file)
+        except OSError as e:
+            logger.warning(f"Could not read trigger file {self.trigger_file}: {e}")
+            content = ""
+        name = content if content in SCANS else "full"
+        logger.info(f"Trigger file found, running {name} scan now")
+        return name
+
+
+def main():
+    configure_logging()
+    logger.info("Starting Saftrade - Daemon Mode")
+    daemon = ScanDaemon(WATCHLIST)
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Daemon stopped by user.")
+    finally:
+        daemon.stop()
+        daemon.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
-from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import BigInteger, Column
+import json
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Set, Tuple, Union
+import pandas as pd
+from sqlalchemy import BigInteger, Column, Index, event, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Field, SQLModel, create_engine, Session, select
-from config.settings import SQLITE_URL
+from config.settings import (
+    SQLITE_URL, CANDLE_BACKEND, PARQUET_DIR, PARQUET_PARTITION, DB_WRITE_QUEUE,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_MB
+)
+from core import indicator_state
+from core.metrics import metrics
 
 # --- Models ---
 class DailyCandle(SQLModel, table=True):
     __tablename__: str = "daily_candles"
+    __table_args__ = (
+        # Covering index for panel reads: (symbol, date) seek + every column the analyzer reads
+        Index("ix_daily_candles_panel", "symbol", "date", "open", "high", "low", "close", "volume", "change", "change_pct"),
+    )
     
     # Composite Primary Key: symbol + date
     symbol: str = Field(primary_key=True, index=True)
@@ -23,50 +37,490 @@ class DailyCandle(SQLModel, table=True):
     
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class IndicatorState(SQLModel, table=True):
+    """
+    Streaming indicator state per symbol (see core/indicator_state.py).
+    Advanced incrementally on append; rebuilt from daily_candles when a past candle is revised.
+    """
+    __tablename__: str = "indicator_state"
+
+    symbol: str = Field(primary_key=True)
+    last_date: str # YYYY-MM-DD of the latest folded candle
+    bars: int
+
+    # Latest candle
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int = Field(sa_column=Column(BigInteger))
+    prev_close: Optional[float] = None
+
+    close_sum: float = 0.0
+    ema_200: Optional[float] = None
+    ema_50: Optional[float] = None
+    ema_20: Optional[float] = None
+    prev_ema_20: Optional[float] = None
+    prev_ema_50: Optional[float] = None
+
+    avg_gain: Optional[float] = None
+    avg_loss: Optional[float] = None
+    rsi: Optional[float] = None
+    prev_rsi: Optional[float] = None
+
+    tr_sum: float = 0.0
+    atr: Optional[float] = None
+
+    volume_window: str = "[]" # JSON list of the last VOLUME_SMA_LENGTH volumes
+    vol_avg: Optional[float] = None
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AIVerdict(SQLModel, table=True):
+    """
+    Cached DeepSeek verdicts, so a rerun on the same day does not pay for the same prompt twice.
+    Keyed by ticker, candle date, signal type and a hash of the request payload (technical inputs).
+    """
+    __tablename__: str = "ai_verdicts"
+
+    cache_key: str = Field(primary_key=True) # sha256 of symbol|date|signal_type|input_hash
+    symbol: str = Field(index=True)
+    candle_date: str
+    signal_type: str
+    input_hash: str
+    verdict: str # JSON of the parsed AI response
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True) # Size eviction drops least recently used
+
+class OutboxMessage(SQLModel, table=True):
+    """
+    Telegram messages waiting for delivery (see core/notifier.py).
+    Rows are written before sending and marked sent afterwards, so undelivered alerts survive a restart.
+    """
+    __tablename__: str = "telegram_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    chat_id: str
+    text: str
+    parse_mode: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = Field(default=None, index=True)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IntradaySnapshot(SQLModel, table=True):
+    """
+    In-progress daily candle per symbol at each intraday poll (core/intraday.py), kept for later review.
+    WITHOUT ROWID: the (symbol, ts) key is the table, no separate rowid B-tree.
+    """
+    __tablename__: str = "intraday_snapshots"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    symbol: str = Field(primary_key=True)
+    ts: str = Field(primary_key=True) # YYYY-MM-DD HH:MM, market time of the poll
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int = Field(sa_column=Column(BigInteger))
+    signal_type: str = "None" # Rule-set verdict for the in-progress candle
+
+class EmptyRange(SQLModel, table=True):
+    """
+    Date spans a provider answered without candles (before a late listing, real suspensions),
+    so the fetch planner stops requesting those gaps on every run (core/fetch_planner.py).
+    """
+    __tablename__: str = "empty_ranges"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    symbol: str = Field(primary_key=True)
+    from_date: str = Field(primary_key=True) # YYYY-MM-DD; no candles strictly between from_date and to_date
+    to_date: str
+
+# Column order used for plain tuple rows, bulk writes and candle frames
+CANDLE_COLUMNS = ["symbol", "date", "open", "high", "low", "close", "volume", "change", "change_pct"]
+CandleRow = Union[DailyCandle, Dict[str, Any], Sequence[Any]]
+
+# --- Columnar Candles ---
+# Providers return, DBManager stores and TechnicalAnalyzer reads candles as a DataFrame
+# with these columns/dtypes. DailyCandle objects are only built where the ORM needs them.
+CANDLE_DTYPES = {
+    "symbol": "object",
+    "date": "object", # YYYY-MM-DD string, same as the DB key
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "int64",
+    "change": "float64",
+    "change_pct": "float64",
+}
+
+def empty_candle_frame() -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in CANDLE_DTYPES.items()})
+
+def to_candle_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize a frame with at least symbol, date, open, high, low, close, volume
+    into the canonical candle frame (column order, dtypes, optional columns filled with NaN).
+    """
+    if df is None or df.empty:
+        return empty_candle_frame()
+    df = df.copy()
+    for col in ("change", "change_pct"):
+        if col not in df.columns:
+            df[col] = float("nan")
+    if pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    else:
+        df["date"] = df["date"].astype(str)
+    df["symbol"] = df["symbol"].astype(str)
+    return df[CANDLE_COLUMNS].astype(CANDLE_DTYPES).reset_index(drop=True)
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {**state, "volume_window": list(state["volume_window"])}
+
+def _candle_key(row: Dict[str, Any]) -> tuple:
+    return row["symbol"], row["date"]
+
 # --- Database Engine ---
-# check_same_thread=False is needed for SQLite if accessed from multiple threads (e.g., API + Cron)
-engine = create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
+@lru_cache(maxsize=None)
+def get_engine():
+    """The process-wide engine, created on first use (importing this module opens nothing)."""
+    # check_same_thread=False is needed for SQLite if accessed from multiple threads (e.g., API + Cron)
+    engine = create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _configure_connection)
+    return engine
+
+def _configure_connection(dbapi_connection, connection_record):
+    """Per-connection pragmas: WAL lets readers run alongside the (single) writer; busy_timeout covers other processes."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={-SQLITE_CACHE_MB * 1024}") # Negative = KiB
+    cursor.close()
 
 class DBManager:
-    def __init__(self):
-        self.engine = engine
+    def __init__(self, cache_states: bool = False, backend: str = CANDLE_BACKEND, write_queue: bool = DB_WRITE_QUEUE):
+        self.engine = get_engine()
+        # All writes go through one batching writer thread (database/writer.py), or run inline
+        if write_queue:
+            from database.writer import get_writer
+            self.writer = get_writer(self.engine)
+        else:
+            self.writer = None
+        # Candle storage: the daily_candles table, or Parquet files (database/parquet_store.py).
+        # Everything else (indicator states, AI verdicts, outbox, intraday snapshots) stays in SQLite.
+        if backend == "parquet":
+            from database.parquet_store import ParquetCandleStore # pyarrow is only needed here
+            self.store = ParquetCandleStore(PARQUET_DIR, PARQUET_PARTITION)
+        elif backend == "sqlite":
+            self.store = None
+        else:
+            raise ValueError(f"Unknown candle backend {backend!r} (expected 'sqlite' or 'parquet')")
+        # Optional in-process copy of indicator_state (long-running daemon). Only safe while this
+        # process is the sole writer; it is refreshed on every state write made through this manager.
+        self._state_cache: Optional[Dict[str, Dict[str, Any]]] = {} if cache_states else None
+        self._cache_lock = threading.Lock()
 
     def init_db(self):
-        """Create tables if they don't exist."""
+        """Create tables (and indexes added to existing tables) if they don't exist."""
         SQLModel.metadata.create_all(self.engine)
+        for index in DailyCandle.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
 
-    def upsert_candles(self, candles: List[DailyCandle]):
+    # --- Writes ---
+    def _write(self, fn, payload, wait: bool = True, merge: bool = False, merge_key=None, on_error=None):
         """
-        Bulk upsert candles. 
-        Since SQLite doesn't have a native "ON DUPLICATE KEY UPDATE" in standard SQL without custom syntax,
-        and SQLModel/SQLAlchemy support for it varies by dialect, 
-        we will use a simple strategy: determine which exist and update, or just replace.
-        
-        For simplicity and robustness with SQLite:
-        We will iterate and merge. For high performance bulk with SQLite, we could use native INSERT OR REPLACE.
+        Run fn(conn, payload) in a write transaction: through the writer queue when enabled
+        (wait=True blocks for the commit ack, wait=False returns once queued), else inline.
         """
-        with Session(self.engine) as session:
-            for candle in candles:
-                # Merge checks primary key. If exists, updates. If not, inserts.
-                session.merge(candle)
-            session.commit()
+        if self.writer is not None:
+            ticket = self.writer.submit(fn, payload, merge=merge, merge_key=merge_key, on_error=on_error)
+            return ticket.wait() if wait else None
+        try:
+            with metrics.timer("db_commit_seconds", mode="inline"), self.engine.begin() as conn:
+                return fn(conn, payload)
+        except Exception:
+            if on_error is not None:
+                on_error()
+            raise
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued writes are committed. Returns False on timeout."""
+        return self.writer.flush(timeout) if self.writer is not None else True
+
+    def close(self, timeout: Optional[float] = None):
+        """Commit queued writes and stop the writer thread."""
+        if self.writer is not None:
+            self.writer.close(timeout)
+
+    def upsert_candles(self, candles: Union[Iterable[CandleRow], pd.DataFrame]) -> int:
+        """
+        Bulk upsert candles using SQLite's native INSERT ... ON CONFLICT(symbol, date) DO UPDATE.
+        All rows go through a single executemany inside one transaction.
+
+        Accepts:
+        - DailyCandle objects
+        - plain rows: dicts keyed by column name, or tuples in CANDLE_COLUMNS order
+        - a DataFrame with (at least) symbol, date, open, high, low, close, volume columns
+
+        Returns the number of rows written (once committed; concurrent upserts are merged by the writer).
+        """
+        rows = self._to_rows(candles)
+        if not rows:
+            return 0
+        # Merged with concurrent upserts: one row per candle, the last submitted.
+        # Rolled back: cached states may be ahead of the table
+        self._write(self._upsert_rows, rows, merge=True, merge_key=_candle_key, on_error=self.clear_state_cache)
+        metrics.inc("rows_written_total", len(rows), table="daily_candles")
+        return len(rows)
+
+    def _upsert_rows(self, conn, rows: List[Dict[str, Any]]) -> int:
+        table = DailyCandle.__table__
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.symbol, table.c.date],
+            set_={col: stmt.excluded[col] for col in CANDLE_COLUMNS[2:] + ["updated_at"]},
+        )
+        states, revised = self._load_states_for_write(conn, rows)
+        if self.store is None:
+            conn.execute(stmt, rows)
+        else:
+            self.store.upsert(pd.DataFrame(rows, columns=CANDLE_COLUMNS))
+        self._refresh_indicator_state(conn, rows, states, revised)
+        return len(rows)
+
+    @staticmethod
+    def _to_rows(candles: Union[Iterable[CandleRow], pd.DataFrame]) -> List[Dict[str, Any]]:
+        """Normalize supported inputs into executemany parameter dicts (native Python types only)."""
+        now = datetime.utcnow()
+
+        if isinstance(candles, pd.DataFrame):
+            if candles.empty:
+                return []
+            df = candles
+            if pd.api.types.is_datetime64_any_dtype(df["date"]):
+                dates = df["date"].dt.strftime("%Y-%m-%d")
+            else:
+                dates = df["date"].astype(str)
+            # .tolist() converts numpy scalars to Python types, which sqlite3 can bind
+            columns = {
+                "symbol": df["symbol"].astype(str).tolist(),
+                "date": dates.tolist(),
+                "open": df["open"].astype(float).tolist(),
+                "high": df["high"].astype(float).tolist(),
+                "low": df["low"].astype(float).tolist(),
+                "close": df["close"].astype(float).tolist(),
+                "volume": df["volume"].astype("int64").tolist(),
+            }
+            for col in ("change", "change_pct"):
+                if col in df.columns:
+                    columns[col] = df[col].astype(object).where(df[col].notna(), None).tolist()
+                else:
+                    columns[col] = [None] * len(df)
+            rows = [dict(zip(CANDLE_COLUMNS, values)) for values in zip(*(columns[c] for c in CANDLE_COLUMNS))]
+            for row in rows:
+                row["updated_at"] = now
+            return rows
+
+        rows = []
+        for candle in candles:
+            if isinstance(candle, DailyCandle):
+                row = {col: getattr(candle, col) for col in CANDLE_COLUMNS}
+            elif isinstance(candle, dict):
+                row = {col: candle.get(col) for col in CANDLE_COLUMNS}
+            else:
+                row = dict(zip(CANDLE_COLUMNS, candle))
+                for col in CANDLE_COLUMNS[len(row):]:
+                    row[col] = None
+            row["updated_at"] = now
+            rows.append(row)
+        return rows
             
     def get_latest_candle(self, symbol: str) -> Optional[DailyCandle]:
+        if self.store is not None:
+            history = self.store.history(symbol)
+            return self._to_candles(history.tail(1))[0] if not history.empty else None
         with Session(self.engine) as session:
             statement = select(DailyCandle).where(DailyCandle.symbol == symbol).order_by(DailyCandle.date.desc()).limit(1)
             result = session.exec(statement).first()
             return result
 
-    def get_history(self, symbol: str, limit: int = 365) -> List[DailyCandle]:
+    def get_history_frame(self, symbol: str, limit: int = 365, from_date: Optional[str] = None) -> pd.DataFrame:
+        """Like get_history, but returns a candle frame (no ORM objects)."""
+        return self.get_panel([symbol], lookback=limit, from_date=from_date)
+
+    def get_panel(self, symbols: List[str], lookback: int = 365, from_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        Last `lookback` candles for many symbols in a single SQL query, as a typed candle frame.
+        Rows are grouped by symbol (in the order given) and sorted by date ASC within each symbol.
+
+        Per symbol, the first date of the window is found with one index seek (LIMIT 1 OFFSET lookback-1),
+        then the window is range-scanned from ix_daily_candles_panel without touching table rows.
+        The symbol list is passed as a single JSON parameter, so list length is not bound by SQLite's parameter limit.
+        """
+        if self.store is not None:
+            return self.store.panel(symbols, lookback=lookback, from_date=from_date)
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols or lookback <= 0:
+            return empty_candle_frame()
+
+        columns = ", ".join(f"d.{col}" for col in CANDLE_COLUMNS)
+        date_filter = "AND d.date >= :from_date" if from_date else ""
+        statement = text(f"""
+            WITH wanted(symbol, pos) AS (
+                SELECT value, key FROM json_each(:symbols)
+            ),
+            window_start AS MATERIALIZED (
+                SELECT symbol, pos, COALESCE((
+                    SELECT date FROM daily_candles c
+                    WHERE c.symbol = wanted.symbol
+                    ORDER BY date DESC LIMIT 1 OFFSET :skip
+                ), '') AS first_date
+                FROM wanted
+            )
+            SELECT {columns}
+            FROM window_start w
+            CROSS JOIN daily_candles d ON d.symbol = w.symbol AND d.date >= w.first_date {date_filter}
+            ORDER BY w.pos, d.date
+        """)
+        params = {"symbols": json.dumps(symbols), "skip": lookback - 1}
+        if from_date:
+            params["from_date"] = from_date
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement, params).all()
+        if not rows:
+            return empty_candle_frame()
+        return to_candle_frame(pd.DataFrame(rows, columns=CANDLE_COLUMNS))
+
+    def get_symbols(self) -> List[str]:
+        """Every symbol with stored candles."""
+        if self.store is not None:
+            return self.store.symbols()
+        with self.engine.connect() as conn:
+            return list(conn.execute(text("SELECT DISTINCT symbol FROM daily_candles ORDER BY symbol")).scalars())
+
+    def prefilter_symbols(self, symbols: List[str], min_price: float, min_avg_value: float,
+                          volume_factor: float, days: int = 20, volume_days: int = 20) -> pd.DataFrame:
+        """
+        Cheap universe screen in one aggregate query over the last `days` candles per symbol.
+        Returns one row per symbol with candles: last_date, last_close, last_volume, avg_volume, avg_value
+        and pass flags, each including the previous ones:
+        - is_current: traded on the latest stored date (not suspended / stale)
+        - price_ok: last close >= min_price
+        - liquidity_ok: average daily traded value (close * volume) over `days` candles >= min_avg_value
+        - volume_ok: last volume > volume_factor * the `volume_days` volume average incl. the last day
+          (the strategy's vol_avg, so no setup is lost when volume_factor is the smallest rule factor)
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return pd.DataFrame()
+        if self.store is not None:
+            return self._prefilter_panel(symbols, min_price, min_avg_value, volume_factor, days, volume_days)
+        statement = text("""
+            WITH wanted(symbol) AS (SELECT value FROM json_each(:symbols)),
+            latest AS (SELECT MAX(date) AS day FROM daily_candles),
+            recent AS (
+                SELECT d.symbol, d.date, d.close, d.volume,
+                       ROW_NUMBER() OVER (PARTITION BY d.symbol ORDER BY d.date DESC) AS rn
+                FROM wanted w JOIN daily_candles d ON d.symbol = w.symbol
+                WHERE d.date >= date((SELECT day FROM latest), :since)
+            ),
+            stats AS (
+                SELECT symbol,
+                       MAX(CASE WHEN rn = 1 THEN date END) AS last_date,
+                       MAX(CASE WHEN rn = 1 THEN close END) AS last_close,
+                       MAX(CASE WHEN rn = 1 THEN volume END) AS last_volume,
+                       AVG(CASE WHEN rn <= :volume_days THEN volume END) AS avg_volume,
+                       AVG(CASE WHEN rn <= :days THEN close * volume END) AS avg_value,
+                       SUM(rn <= :volume_days) AS volume_bars
+                FROM recent WHERE rn <= MAX(:days, :volume_days) GROUP BY symbol
+            )
+            SELECT s.*,
+                   s.last_date = l.day AS is_current,
+                   s.last_date = l.day AND s.last_close >= :min_price AS price_ok,
+                   s.last_date = l.day AND s.last_close >= :min_price AND s.avg_value >= :min_avg_value AS liquidity_ok,
+                   s.last_date = l.day AND s.last_close >= :min_price AND s.avg_value >= :min_avg_value
+                       AND s.volume_bars = :volume_days AND s.last_volume > :volume_factor * s.avg_volume AS volume_ok
+            FROM stats s, latest l
+        """)
+        params = {
+            "symbols": json.dumps(symbols), "days": days, "volume_days": volume_days,
+            "since": f"-{max(days, volume_days) * 2 + 14} days", # Calendar bound covering that many trading days incl. holidays
+            "min_price": min_price, "min_avg_value": min_avg_value, "volume_factor": volume_factor,
+        }
+        with self.engine.connect() as conn:
+            result = conn.execute(statement, params)
+            frame = pd.DataFrame(result.all(), columns=list(result.keys()))
+        for col in ("is_current", "price_ok", "liquidity_ok", "volume_ok"):
+            frame[col] = frame[col].astype(bool)
+        return frame
+
+    def _prefilter_panel(self, symbols: List[str], min_price: float, min_avg_value: float,
+                         volume_factor: float, days: int, volume_days: int) -> pd.DataFrame:
+        """prefilter_symbols for the Parquet backend: the same aggregates over a columnar panel read."""
+        latest = self.store.max_date()
+        window = max(days, volume_days)
+        panel = self.get_panel(symbols, lookback=window)
+        if latest is None or panel.empty:
+            return pd.DataFrame()
+        since = (datetime.strptime(latest, "%Y-%m-%d") - timedelta(days=window * 2 + 14)).strftime("%Y-%m-%d")
+        panel = panel[panel["date"] >= since]
+        panel = panel.assign(
+            from_end=panel.groupby("symbol", sort=False).cumcount(ascending=False),
+            value=panel["close"] * panel["volume"],
+        )
+        grouped = panel.groupby("symbol", sort=False)
+        last = grouped.tail(1).set_index("symbol")
+        frame = pd.DataFrame({
+            "last_date": last["date"],
+            "last_close": last["close"],
+            "last_volume": last["volume"],
+            "avg_volume": panel[panel["from_end"] < volume_days].groupby("symbol", sort=False)["volume"].mean(),
+            "avg_value": panel[panel["from_end"] < days].groupby("symbol", sort=False)["value"].mean(),
+            "volume_bars": grouped["from_end"].apply(lambda n: int((n < volume_days).sum())),
+        }).rename_axis("symbol").reset_index()
+        frame["is_current"] = frame["last_date"] == latest
+        frame["price_ok"] = frame["is_current"] & (frame["last_close"] >= min_price)
+        frame["liquidity_ok"] = frame["price_ok"] & (frame["avg_value"] >= min_avg_value)
+        frame["volume_ok"] = (frame["liquidity_ok"] & (frame["volume_bars"] == volume_days)
+                              & (frame["last_volume"] > volume_factor * frame["avg_volume"]))
+        return frame
+
+    def get_candle_dates(self, symbol: str, from_date: Optional[str] = None) -> List[str]:
+        """
+        Dates (YYYY-MM-DD, ASC) stored for a symbol. Used by the fetch planner's gap scan.
+        Only the date column is selected, so this stays cheap even for long histories.
+        """
+        if self.store is not None:
+            return self.store.history(symbol, from_date=from_date)["date"].tolist()
+        with Session(self.engine) as session:
+            statement = select(DailyCandle.date).where(DailyCandle.symbol == symbol)
+            if from_date:
+                statement = statement.where(DailyCandle.date >= from_date)
+            statement = statement.order_by(DailyCandle.date)
+            return list(session.exec(statement).all())
+
+    def get_history(self, symbol: str, limit: int = 365, from_date: Optional[str] = None) -> List[DailyCandle]:
         """
         Fetch the last 'limit' candles for a symbol, sorted by date ASC.
+        If from_date is given, only candles on/after that date are returned.
         Optimized: Fetch last N descending, then reverse in Python.
         """
+        if self.store is not None:
+            return self._to_candles(self.store.panel([symbol], lookback=limit, from_date=from_date))
         with Session(self.engine) as session:
             # Fetch latest N candles (Date DESC)
+            statement = select(DailyCandle).where(DailyCandle.symbol == symbol)
+            if from_date:
+                statement = statement.where(DailyCandle.date >= from_date)
             statement = (
-                select(DailyCandle)
-                .where(DailyCandle.symbol == symbol)
+                statement
                 .order_by(DailyCandle.date.desc())
                 .limit(limit)
             )
@@ -74,3 +528,334 @@ class DBManager:
             
             # Reverse to get Chronological Order (Oldest -> Newest) for Pandas
             return list(reversed(results))
+
+    @staticmethod
+    def _to_candles(frame: pd.DataFrame) -> List[DailyCandle]:
+        records = frame[CANDLE_COLUMNS].astype(object).where(frame[CANDLE_COLUMNS].notna(), None).to_dict("records")
+        return [DailyCandle(**record) for record in records]
+
+    # --- Empty Ranges (fetch planner) ---
+    def get_empty_ranges(self, symbol: str) -> List[Tuple[str, str]]:
+        """(from_date, to_date) spans known to hold no candles for a symbol, ASC."""
+        table = EmptyRange.__table__
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.from_date, table.c.to_date).where(table.c.symbol == symbol).order_by(table.c.from_date)
+            ).all()
+        return [(row.from_date, row.to_date) for row in rows]
+
+    def add_empty_ranges(self, symbol: str, ranges: List[Tuple[str, str]]) -> int:
+        """Remember spans the provider returned no candles for. Queued, not awaited."""
+        if not ranges:
+            return 0
+        rows = [{"symbol": symbol, "from_date": start, "to_date": end} for start, end in ranges]
+        self._write(self._insert_empty_ranges, rows, wait=False, merge=True)
+        metrics.inc("rows_written_total", len(rows), table="empty_ranges")
+        return len(rows)
+
+    @staticmethod
+    def _insert_empty_ranges(conn, rows: List[Dict[str, Any]]) -> int:
+        conn.execute(EmptyRange.__table__.insert().prefix_with("OR REPLACE"), rows)
+        return len(rows)
+
+    # --- AI Verdict Cache ---
+    def get_ai_verdict(self, cache_key: str, ttl_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Cached verdict for a key, or None if missing or older than ttl_seconds.
+        Marking the entry as used is queued without waiting, so a cache hit never waits on other writes.
+        """
+        table = AIVerdict.__table__
+        now = datetime.utcnow()
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.verdict, table.c.created_at).where(table.c.cache_key == cache_key)
+            ).first()
+        if row is None:
+            return None
+        if (now - row.created_at).total_seconds() > ttl_seconds:
+            self._write(lambda conn, key: conn.execute(table.delete().where(table.c.cache_key == key)), cache_key)
+            return None
+        self._write(lambda conn, key: conn.execute(table.update().where(table.c.cache_key == key).values(last_used_at=now)),
+                    cache_key, wait=False)
+        return json.loads(row.verdict)
+
+    def put_ai_verdict(self, cache_key: str, symbol: str, candle_date: str, signal_type: str, input_hash: str,
+                       verdict: Dict[str, Any], ttl_seconds: float, max_entries: int):
+        """
+        Store (or replace) a verdict, then evict expired entries and the least recently used beyond max_entries.
+        """
+        now = datetime.utcnow()
+        values = {
+            "cache_key": cache_key, "symbol": symbol, "candle_date": candle_date, "signal_type": signal_type,
+            "input_hash": input_hash, "verdict": json.dumps(verdict), "created_at": now, "last_used_at": now,
+        }
+        self._write(self._put_ai_verdict, (values, ttl_seconds, max_entries))
+        metrics.inc("rows_written_total", table="ai_verdicts")
+
+    @staticmethod
+    def _put_ai_verdict(conn, payload):
+        values, ttl_seconds, max_entries = payload
+        table = AIVerdict.__table__
+        now = values["created_at"]
+        stmt = sqlite_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.cache_key],
+            set_={col: stmt.excluded[col] for col in values if col != "cache_key"},
+        )
+        conn.execute(stmt)
+        conn.execute(table.delete().where(table.c.created_at < now - timedelta(seconds=ttl_seconds)))
+        if max_entries > 0:
+            keep = select(table.c.cache_key).order_by(table.c.last_used_at.desc()).limit(max_entries)
+            conn.execute(table.delete().where(table.c.cache_key.not_in(keep)))
+
+    # --- Intraday Snapshots ---
+    def add_intraday_snapshots(self, snapshots: pd.DataFrame) -> int:
+        """Store one poll's snapshots (columns: symbol, ts, open, high, low, close, volume, signal_type). Queued, not awaited."""
+        if snapshots.empty:
+            return 0
+        columns = ["symbol", "ts", "open", "high", "low", "close", "volume", "signal_type"]
+        rows = snapshots[columns].astype({"volume": "int64"}).to_dict("records")
+        rows = [{**row, "volume": int(row["volume"])} for row in rows]
+        self._write(self._insert_snapshots, rows, wait=False, merge=True)
+        metrics.inc("rows_written_total", len(rows), table="intraday_snapshots")
+        return len(rows)
+
+    @staticmethod
+    def _insert_snapshots(conn, rows: List[Dict[str, Any]]) -> int:
+        conn.execute(IntradaySnapshot.__table__.insert().prefix_with("OR REPLACE"), rows)
+        return len(rows)
+
+    def get_intraday_snapshots(self, day: str, symbol: Optional[str] = None) -> pd.DataFrame:
+        """Snapshots of one day (YYYY-MM-DD), optionally for one symbol, ordered by symbol and time."""
+        table = IntradaySnapshot.__table__
+        statement = select(table).where(table.c.ts >= day, table.c.ts < f"{day}~") # '~' sorts after any time
+        if symbol:
+            statement = statement.where(table.c.symbol == symbol)
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement.order_by(table.c.symbol, table.c.ts)).all()
+        return pd.DataFrame(rows, columns=[col.name for col in table.columns])
+
+    # --- Telegram Outbox ---
+    def add_outbox_messages(self, messages: List[Dict[str, Any]]) -> List[int]:
+        """Persist messages (chat_id, text, parse_mode) for delivery. Returns their outbox ids, in order."""
+        if not messages:
+            return []
+        ids = self._write(self._insert_outbox, messages)
+        metrics.inc("rows_written_total", len(ids), table="telegram_outbox")
+        return ids
+
+    @staticmethod
+    def _insert_outbox(conn, messages: List[Dict[str, Any]]) -> List[int]:
+        table = OutboxMessage.__table__
+        now = datetime.utcnow()
+        ids = []
+        for message in messages:
+            result = conn.execute(table.insert().values(
+                chat_id=message["chat_id"], text=message["text"], parse_mode=message.get("parse_mode"),
+                attempts=0, created_at=now,
+            ))
+            ids.append(result.inserted_primary_key[0])
+        return ids
+
+    def get_pending_outbox(self, max_attempts: int) -> List[Dict[str, Any]]:
+        """Unsent messages that have not exhausted their attempts, oldest first."""
+        table = OutboxMessage.__table__
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.chat_id, table.c.text, table.c.parse_mode, table.c.attempts)
+                .where(table.c.sent_at.is_(None), table.c.attempts < max_attempts)
+                .order_by(table.c.id)
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def mark_outbox_sent(self, message_id: int):
+        table = OutboxMessage.__table__
+        values = {"sent_at": datetime.utcnow()}
+        self._write(lambda conn, id_: conn.execute(table.update().where(table.c.id == id_).values(**values)), message_id, wait=False)
+
+    def mark_outbox_failed(self, message_id: int, attempts: int, error: str):
+        table = OutboxMessage.__table__
+        values = {"attempts": attempts, "last_error": error[:500]}
+        self._write(lambda conn, id_: conn.execute(table.update().where(table.c.id == id_).values(**values)), message_id, wait=False)
+
+    # --- Indicator State ---
+    def get_indicator_state(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Latest streaming indicator state for a symbol (core/indicator_state.py format).
+        Built from stored candles on first access if missing.
+        """
+        return self.get_indicator_states([symbol]).get(symbol)
+
+    def get_indicator_states(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        states = self._cached_states(symbols)
+        wanted = [s for s in symbols if s not in states]
+        if wanted:
+            with self.engine.connect() as conn:
+                loaded = self._select_states(conn, wanted)
+                missing = [s for s in wanted if s not in loaded]
+                rebuilt = [self._rebuild_state(conn, s) for s in missing]
+                rebuilt = [state for state in rebuilt if state is not None]
+            if rebuilt:
+                # Persisted in the background; a state written by an upsert in the meantime wins
+                self._write(self._insert_missing_states, rebuilt, wait=False, merge=True)
+                loaded.update({state["symbol"]: state for state in rebuilt})
+            self._cache_states(loaded.values())
+            states.update(loaded)
+        return {s: states[s] for s in symbols if s in states}
+
+    def _cached_states(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        if self._state_cache is None:
+            return {}
+        with self._cache_lock:
+            # Copies: callers (and incremental updates) mutate states in place
+            return {s: _copy_state(self._state_cache[s]) for s in symbols if s in self._state_cache}
+
+    def _cache_states(self, states: Iterable[Dict[str, Any]]):
+        if self._state_cache is None:
+            return
+        with self._cache_lock:
+            for state in states:
+                self._state_cache[state["symbol"]] = _copy_state(state)
+
+    def clear_state_cache(self):
+        if self._state_cache is not None:
+            with self._cache_lock:
+                self._state_cache.clear()
+
+    def get_prior_states(self, symbols: List[str], day: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Indicator states as of the last candle BEFORE `day` (YYYY-MM-DD), for evaluating an in-progress candle.
+        Stored states are used as-is unless they already include `day` (e.g. a partial candle from daily append);
+        those are recomputed from the earlier candles and not persisted.
+        """
+        states = self.get_indicator_states(symbols)
+        stale = [s for s, state in states.items() if state["last_date"] >= day]
+        if stale:
+            with self.engine.connect() as conn:
+                for symbol in stale:
+                    state = self._rebuild_state(conn, symbol, before=day)
+                    if state is None:
+                        states.pop(symbol)
+                    else:
+                        states[symbol] = state
+        return states
+
+    def rebuild_indicator_state(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Recompute a symbol's state from its full stored history."""
+        with self.engine.connect() as conn:
+            state = self._rebuild_state(conn, symbol)
+        if state is not None:
+            self._write(self._write_states, [state])
+        return state
+
+    def _load_states_for_write(self, conn, rows: List[Dict[str, Any]]):
+        """
+        Before an upsert: load current states and detect revisions, i.e. rows dated at or before
+        a symbol's last folded candle that are new or differ from what is stored.
+        """
+        by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_symbol.setdefault(row["symbol"], []).append(row)
+
+        states = self._select_states(conn, list(by_symbol))
+        revised: Set[str] = set()
+        for symbol, state in states.items():
+            past = {row["date"]: row for row in by_symbol[symbol] if row["date"] <= state["last_date"]}
+            if not past:
+                continue
+            stored = self._stored_candles(conn, symbol, list(past))
+            if len(stored) != len(past):
+                revised.add(symbol) # Hole filled before the latest candle
+                continue
+            for date, open_, high, low, close, volume in stored:
+                new = past[date]
+                if (open_, high, low, close, volume) != (new["open"], new["high"], new["low"], new["close"], new["volume"]):
+                    revised.add(symbol)
+                    break
+        return states, revised
+
+    def _refresh_indicator_state(self, conn, rows: List[Dict[str, Any]], states: Dict[str, Dict[str, Any]], revised: Set[str]):
+        """After an upsert: O(1) per appended candle, full rebuild only for revised/new symbols."""
+        by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_symbol.setdefault(row["symbol"], []).append(row)
+
+        updated = []
+        for symbol, symbol_rows in by_symbol.items():
+            state = states.get(symbol)
+            if state is None or symbol in revised:
+                state = self._rebuild_state(conn, symbol)
+            else:
+                # One step per date: the upsert keeps the last row of a date given twice, so does the state
+                appended = {r["date"]: r for r in symbol_rows if r["date"] > state["last_date"]}
+                if not appended:
+                    continue
+                indicator_state.build_state(symbol, [appended[date] for date in sorted(appended)], state)
+            if state is not None:
+                updated.append(state)
+        self._write_states(conn, updated)
+
+    def _rebuild_state(self, conn, symbol: str, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if self.store is not None:
+            history = self.store.history(symbol, before=before)
+            candles = history[["date", "open", "high", "low", "close", "volume"]].to_dict("records")
+        else:
+            table = DailyCandle.__table__
+            statement = (
+                select(table.c.date, table.c.open, table.c.high, table.c.low, table.c.close, table.c.volume)
+                .where(table.c.symbol == symbol)
+            )
+            if before:
+                statement = statement.where(table.c.date < before)
+            candles = conn.execute(statement.order_by(table.c.date)).mappings().all()
+        if not candles:
+            return None
+        return indicator_state.build_state(symbol, candles)
+
+    def _stored_candles(self, conn, symbol: str, dates: List[str]) -> List[tuple]:
+        """(date, open, high, low, close, volume) of a symbol's stored candles on `dates`."""
+        if self.store is not None:
+            history = self.store.history(symbol, from_date=min(dates))
+            history = history[history["date"].isin(dates)]
+            return list(history[["date", "open", "high", "low", "close", "volume"]].itertuples(index=False, name=None))
+        table = DailyCandle.__table__
+        return conn.execute(
+            select(table.c.date, table.c.open, table.c.high, table.c.low, table.c.close, table.c.volume)
+            .where(table.c.symbol == symbol, table.c.date.in_(dates))
+        ).all()
+
+    @staticmethod
+    def _select_states(conn, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not symbols:
+            return {}
+        table = IndicatorState.__table__
+        result = conn.execute(select(table).where(table.c.symbol.in_(symbols))).mappings().all()
+        states = {}
+        for row in result:
+            state = dict(row)
+            state.pop("updated_at", None)
+            state["volume_window"] = json.loads(state["volume_window"])
+            states[state["symbol"]] = state
+        return states
+
+    def _write_states(self, conn, states: List[Dict[str, Any]]):
+        if not states:
+            return
+        self._cache_states(states)
+        table = IndicatorState.__table__
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.symbol],
+            set_={col.name: stmt.excluded[col.name] for col in table.columns if col.name != "symbol"},
+        )
+        conn.execute(stmt, self._state_params(states))
+
+    def _insert_missing_states(self, conn, states: List[Dict[str, Any]]):
+        """Persist lazily rebuilt states unless the symbol already has one (written by a later upsert)."""
+        stmt = sqlite_insert(IndicatorState.__table__).on_conflict_do_nothing(index_elements=["symbol"])
+        conn.execute(stmt, self._state_params(states))
+
+    @staticmethod
+    def _state_params(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return [{**state, "volume_window": json.dumps(state["volume_window"]), "updated_at": now} for state in states]
@@ -0,0 +1,228 @@
+"""
+Columnar candle store: daily candles kept as Parquet files instead of the daily_candles table.
+
+Layout under `root` (PARQUET_PARTITION):
+- "year":   year=2025/candles.parquet, every symbol of that year sorted by (symbol, date).
+            Few, large files: full-universe / multi-year reads (backtests) touch a handful of files.
+- "symbol": symbol=BBCA/candles.parquet, one symbol's full history.
+            Small files: an upsert only rewrites the symbols it touches.
+
+Files are read memory-mapped into Arrow tables, which are kept in memory until the file changes
+(checked by mtime/size), so repeated reads are column slices instead of SQL row materialization.
+Upserts rewrite the affected partition files atomically (write to a temp file, then os.replace).
+
+Only candles live here; indicator states, AI verdicts and the outbox stay in SQLite.
+pyarrow is imported lazily, so it is only needed with CANDLE_BACKEND=parquet (the `parquet` extra).
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database.db_manager import CANDLE_COLUMNS, empty_candle_frame, to_candle_frame
+
+logger = logging.getLogger(__name__)
+
+FILE_NAME = "candles.parquet"
+PARTITIONS = ("year", "symbol")
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The Parquet candle backend needs pyarrow: poetry install -E parquet (or pip install 'saftrade[parquet]')") from e
+    return pa, pc, pq
+
+
+class ParquetCandleStore:
+    def __init__(self, root: str, partition: str = "year"):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown Parquet partitioning {partition!r} (expected one of {PARTITIONS})")
+        self.pa, self.pc, self.pq = _arrow()
+        self.root = root
+        self.partition = partition
+        self.schema = self.pa.schema([
+            ("symbol", self.pa.string()), ("date", self.pa.string()),
+            ("open", self.pa.float64()), ("high", self.pa.float64()), ("low", self.pa.float64()),
+            ("close", self.pa.float64()), ("volume", self.pa.int64()),
+            ("change", self.pa.float64()), ("change_pct", self.pa.float64()),
+        ])
+        self._tables: Dict[str, Tuple[Tuple[int, int], Any]] = {} # Partition key -> (file signature, pa.Table)
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Writes ---
+    def upsert(self, candles: pd.DataFrame) -> int:
+        """Insert or replace candles by (symbol, date). Returns the number of input rows."""
+        frame = to_candle_frame(candles)
+        if frame.empty:
+            return 0
+        keys = frame["date"].str[:4] if self.partition == "year" else frame["symbol"]
+        with self._lock:
+            for key, part in frame.groupby(keys.to_numpy(), sort=False):
+                existing = self._table(key)
+                merged = part if existing is None else pd.concat([existing.to_pandas(), part], ignore_index=True)
+                merged = merged.drop_duplicates(["symbol", "date"], keep="last").sort_values(["symbol", "date"])
+                self._write(key, merged)
+        return len(frame)
+
+    def _write(self, key: str, frame: pd.DataFrame):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = self.pa.Table.from_pandas(frame[CANDLE_COLUMNS], schema=self.schema, preserve_index=False)
+        tmp = f"{path}.tmp"
+        self.pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        self._tables[key] = (self._signature(path), table)
+
+    # --- Reads ---
+    def read(self, symbols: Optional[List[str]] = None, from_date: Optional[str] = None,
+             before: Optional[str] = None):
+        """Matching candles as one Arrow table: partitions in key order, each sorted by (symbol, date)."""
+        tables = []
+        for key in self._keys(symbols, from_date, before):
+            table = self._table(key)
+            if table is None:
+                continue
+            masks = []
+            if symbols is not None and self.partition == "year":
+                masks.append(self.pc.is_in(table["symbol"], value_set=self.pa.array(symbols, self.pa.string())))
+            if from_date:
+                masks.append(self.pc.greater_equal(table["date"], from_date))
+            if before:
+                masks.append(self.pc.less(table["date"], before))
+            if masks:
+                mask = masks[0]
+                for other in masks[1:]:
+                    mask = self.pc.and_(mask, other)
+                if not self.pc.all(mask).as_py(): # Whole-partition reads (the full universe) skip the copy
+                    table = table.filter(mask)
+            if table.num_rows:
+                tables.append(table)
+        if not tables:
+            return self.schema.empty_table()
+        return self.pa.concat_tables(tables)
+
+    def panel(self, symbols: List[str], lookback: int = 365, from_date: Optional[str] = None) -> pd.DataFrame:
+        """Last `lookback` candles per symbol (same contract as DBManager.get_panel)."""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols or lookback <= 0:
+            return empty_candle_frame()
+        table = self.read(symbols, from_date=from_date) # Both filters keep a date suffix, so order does not matter
+        if not table.num_rows:
+            return empty_candle_frame()
+
+        # Partitions are (symbol, date) sorted and concatenated in date order per symbol,
+        # so a stable sort on the caller's symbol position keeps dates ascending within each symbol.
+        position = self.pc.index_in(table["symbol"], value_set=self.pa.array(symbols, self.pa.string())).to_numpy()
+        order = np.argsort(position, kind="stable")
+        position = position[order]
+        # Rows from the end of each symbol's block: keep the last `lookback`
+        from_end = np.searchsorted(position, position, side="right") - np.arange(len(position))
+        keep = order[from_end <= lookback]
+        if len(keep) < table.num_rows or np.any(keep[1:] < keep[:-1]):
+            table = table.take(keep)
+        return self._frame(table)
+
+    def history(self, symbol: str, from_date: Optional[str] = None, before: Optional[str] = None) -> pd.DataFrame:
+        """All of one symbol's candles, date ASC."""
+        table = self.read([symbol], from_date=from_date, before=before)
+        return self._frame(table.sort_by("date")) if table.num_rows else empty_candle_frame()
+
+    @staticmethod
+    def _frame(table) -> pd.DataFrame:
+        """Arrow table in the store schema -> candle frame (the schema already has the CANDLE_DTYPES)."""
+        return table.to_pandas(split_blocks=True)
+
+    def symbols(self) -> List[str]:
+        if self.partition == "symbol":
+            return self._partition_keys()
+        symbols = set()
+        for key in self._partition_keys():
+            table = self._table(key)
+            if table is not None:
+                symbols.update(self.pc.unique(table["symbol"]).to_pylist())
+        return sorted(symbols)
+
+    def max_date(self) -> Optional[str]:
+        dates = []
+        keys = self._partition_keys()
+        for key in (keys[-1:] if self.partition == "year" else keys):
+            table = self._table(key)
+            if table is not None and table.num_rows:
+                dates.append(self.pc.max(table["date"]).as_py())
+        return max(dates) if dates else None
+
+    # --- Partitions ---
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{self.partition}={key}", FILE_NAME)
+
+    def _partition_keys(self) -> List[str]:
+        prefix = f"{self.partition}="
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name[len(prefix):] for name in names if name.startswith(prefix) and os.path.exists(os.path.join(self.root, name, FILE_NAME)))
+
+    def _keys(self, symbols: Optional[List[str]], from_date: Optional[str], before: Optional[str]) -> List[str]:
+        if self.partition == "symbol":
+            stored = set(self._partition_keys())
+            return [s for s in dict.fromkeys(symbols) if s in stored] if symbols is not None else sorted(stored)
+        keys = self._partition_keys()
+        if from_date:
+            keys = [key for key in keys if key >= from_date[:4]]
+        if before:
+            keys = [key for key in keys if key <= before[:4]]
+        return keys
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _table(self, key: str):
+        """Partition as an Arrow table (memory-mapped read, kept until the file changes); None if absent."""
+        path = self._path(key)
+        try:
+            signature = self._signature(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            table = self.pq.read_table(path, memory_map=True, schema=self.schema)
+            self._tables[key] = (signature, table)
+            return table
+
+
+def migrate_from_sqlite(engine, store: ParquetCandleStore, chunk_symbols: int = 100) -> int:
+    """
+    One-shot copy of every daily_candles row into the Parquet store, `chunk_symbols` symbols at a time
+    (bounded memory). Idempotent: re-running replaces the same (symbol, date) rows. Returns rows copied.
+    """
+    with engine.connect() as conn:
+        symbols = list(conn.execute(text("SELECT DISTINCT symbol FROM daily_candles ORDER BY symbol")).scalars())
+    columns = ", ".join(CANDLE_COLUMNS)
+    statement = text(f"""
+        SELECT {columns} FROM daily_candles
+        WHERE symbol IN (SELECT value FROM json_each(:symbols))
+        ORDER BY symbol, date
+    """)
+    copied = 0
+    for i in range(0, len(symbols), chunk_symbols):
+        chunk = symbols[i:i + chunk_symbols]
+        with engine.connect() as conn:
+            rows = conn.execute(statement, {"symbols": json.dumps(chunk)}).all()
+        copied += store.upsert(pd.DataFrame(rows, columns=CANDLE_COLUMNS))
+        logger.info(f"Migrated {min(i + chunk_symbols, len(symbols))}/{len(symbols)} symbols ({copied} candles)")
+    return copied
@@ -0,0 +1,213 @@
+"""
+Single-writer queue for the SQLite database.
+
+Every write made through DBManager is handed to one background thread, which drains the queue
+and commits everything it finds (up to DB_WRITE_BATCH_MAX operations, waiting DB_WRITE_LINGER_MS
+for more) in ONE transaction. Consecutive operations of the same kind (e.g. candle upserts from
+several fetch workers) are merged into one statement; with a merge key, an item repeated across
+the merged writes (the same candle upserted twice) is passed once, its last copy. Writers therefore never contend for the
+SQLite write lock, and a commit (fsync) is paid per batch instead of per call.
+
+Each submission returns a WriteTicket: wait() blocks until its batch is committed (the ack) and
+re-raises the operation's error. flush() waits until everything queued so far is committed.
+Readers do not go through the queue; with WAL they read the last committed snapshot without blocking.
+"""
+import atexit
+import logging
+import threading
+import time
+from queue import Empty, Queue
+from typing import Any, Callable, List, Optional
+
+from config.settings import DB_WRITE_BATCH_MAX, DB_WRITE_LINGER_MS
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object() # Queue sentinel
+
+
+class WriteTicket:
+    """Acknowledgement of one queued write."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until committed (or failed); returns the operation's result or raises its error."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Database write not committed within {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _finish(self, result: Any = None, error: Optional[BaseException] = None):
+        self.result, self.error = result, error
+        self._done.set()
+
+
+class _Write:
+    __slots__ = ("fn", "payload", "merge", "merge_key", "on_error", "ticket")
+
+    def __init__(self, fn: Callable, payload: Any, merge: bool, merge_key: Optional[Callable], on_error: Optional[Callable]):
+        self.fn = fn               # fn(conn, payload) -> result
+        self.payload = payload
+        self.merge = merge         # payload is a list; consecutive writes with the same fn run as one call
+        self.merge_key = merge_key # item -> identity; merged items with the same key keep only the last
+        self.on_error = on_error # Called when the write is rolled back (e.g. drop caches that ran ahead)
+        self.ticket = WriteTicket()
+
+
+class DBWriter:
+    def __init__(self, engine, batch_max: int = DB_WRITE_BATCH_MAX, linger_ms: float = DB_WRITE_LINGER_MS):
+        self.engine = engine
+        self.batch_max = max(1, batch_max)
+        self.linger = max(0.0, linger_ms / 1000)
+        self._queue: Queue = Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0 # Committed transactions (for logs/benchmarks)
+        self.writes = 0  # Operations committed
+
+    def submit(self, fn: Callable, payload: Any, merge: bool = False, merge_key: Optional[Callable] = None,
+               on_error: Optional[Callable] = None) -> WriteTicket:
+        """Queue fn(conn, payload) for the writer thread; returns its ticket immediately."""
+        write = _Write(fn, payload, merge, merge_key, on_error)
+        self._start()
+        self._queue.put(write)
+        return write.ticket
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every write queued before this call is committed. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        try:
+            self.submit(lambda conn, payload: None, None).wait(timeout) # FIFO: done once all earlier writes are
+        except TimeoutError:
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Commit what is queued and stop the thread (a later submit starts a new one)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Database writer still busy after {timeout}s")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = [first], False
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_max:
+                try:
+                    write = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except Empty:
+                    break
+                if write is _STOP:
+                    stop = True
+                    break
+                batch.append(write)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[_Write]):
+        groups = self._group(batch)
+        try:
+            with metrics.timer("db_commit_seconds", mode="queue"), self.engine.begin() as conn:
+                results = [self._apply(conn, group) for group in groups]
+        except Exception as e:
+            logger.warning(f"Batched write of {len(batch)} operations failed ({e}), retrying one by one")
+            for write in batch:
+                self._commit_one(write)
+            return
+        for group, result in zip(groups, results):
+            self._finish(group, result)
+        self.batches += 1
+        self.writes += len(batch)
+        metrics.inc("db_write_batches_total")
+
+    def _commit_one(self, write: _Write):
+        try:
+            with self.engine.begin() as conn:
+                result = self._apply(conn, [write])
+        except Exception as e:
+            logger.error(f"Database write {getattr(write.fn, '__name__', write.fn)} failed: {e}")
+            if write.on_error is not None:
+                write.on_error()
+            write.ticket._finish(error=e)
+            return
+        self._finish([write], result)
+        self.batches += 1
+        self.writes += 1
+        metrics.inc("db_write_batches_total")
+
+    @staticmethod
+    def _group(batch: List[_Write]) -> List[List[_Write]]:
+        """Consecutive mergeable writes with the same function form one group (order is kept)."""
+        groups: List[List[_Write]] = []
+        for write in batch:
+            last = groups[-1][-1] if groups else None
+            if write.merge and last is not None and last.merge and last.fn == write.fn:
+                groups[-1].append(write)
+            else:
+                groups.append([write])
+        return groups
+
+    @staticmethod
+    def _apply(conn, group: List[_Write]) -> Any:
+        if len(group) == 1:
+            return group[0].fn(conn, group[0].payload)
+        merged = [item for write in group for item in write.payload]
+        key = group[0].merge_key
+        if key is not None:
+            # Later writes win, as if the group had run one by one
+            merged = list({key(item): item for item in merged}.values())
+        return group[0].fn(conn, merged)
+
+    @staticmethod
+    def _finish(group: List[_Write], result: Any):
+        if len(group) == 1:
+            group[0].ticket._finish(result)
+            return
+        for write in group: # Merged writes: each ticket acknowledges its own items
+            write.ticket._finish(len(write.payload))
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(engine) -> DBWriter:
+    """The process-wide writer for an engine (one writer thread per database)."""
+    with _writers_lock:
+        writer = _writers.get(id(engine))
+        if writer is None:
+            writer = _writers[id(engine)] = DBWriter(engine)
+        return writer
+
+
+@atexit.register
+def _close_writers():
+    # Commit writes still queued at interpreter exit (e.g. fire-and-forget cache updates)
+    for writer in list(_writers.values()):
+        writer.close(timeout=30)
@@ -1,6 +1,6 @@
 import yfinance as yf
 import pandas as pd
-import pandas_ta as ta
+from core import indicators
 from datetime import datetime, timedelta
 
 # BSJP Constants
@@ -23,7 +23,7 @@ def debug_bsjp():
     
     # Calculate Vol Avg
     # YFinance uses Capitalized columns: 'Close', 'Open', 'Volume'
-    df['vol_avg'] = ta.sma(df['Volume'], length=20)
+    df['vol_avg'] = indicators.sma(df['Volume'], 20)
     
     latest = df.iloc[-1]
     
@@ -59,4 +59,4 @@ def debug_bsjp():
         print("\nRESULT: NOT VALID")
 
 if __name__ == "__main__":
-    debug_bumi_bsjp()
+    debug_bsjp()
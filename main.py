@@ -1,25 +1,47 @@
 import logging
 import sys
 from config.watchlist import WATCHLIST
-from database.db_manager import DBManager
-from core.strategy import TechnicalAnalyzer
-from core.ai_engine import AIEngine
-from core.notifier import TelegramNotifier
-import pandas as pd
 
-# Configure Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log", encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Heavy modules (pandas, SQLModel, requests, ...) are imported where a stage needs them,
+# so importing this module (e.g. from daemon.py or a quick status command) stays cheap.
 logger = logging.getLogger(__name__)
 
+def configure_logging():
+    """app.log + stdout (called by the entry points, not at import)."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("app.log", encoding='utf-8'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+def build_pipeline(db):
+    """Wire up the scan components (shared by main() and the daemon)."""
+    # Use DataProvider for Redundancy (GoAPI -> YFinance)
+    from core.data_provider import DataProvider
+    from core.fetch_planner import FetchPlanner
+    from core.pipeline import ScanPipeline
+    from core.strategy import TechnicalAnalyzer
+    from core.ai_engine import AIEngine
+    from core.notifier import TelegramNotifier
+    client = DataProvider()
+    planner = FetchPlanner(db, client)
+
+    analyzer = TechnicalAnalyzer()
+    ai = AIEngine(db) # Verdicts are cached in SQLite
+    notifier = TelegramNotifier(db) # Alerts go through a persistent outbox
+    return ScanPipeline(db, planner, analyzer, ai, notifier)
+
 def main():
+    from config.settings import TELEGRAM_FLUSH_TIMEOUT, SCAN_UNIVERSE
+    from core.metrics import metrics
+    from database.db_manager import DBManager
+
+    configure_logging()
     logger.info("Starting Saftrade - Full Pipeline")
+    metrics.reset()
     
     # 1. Initialize Database
     try:
@@ -30,107 +52,32 @@ def main():
         logger.critical(f"Database init failed: {e}")
         return
 
-    # 2. Select Targets
-    target_stocks = WATCHLIST
-    logger.info(f"Processing stocks: {target_stocks}")
+    # 2. Initialize Components
+    pipeline = build_pipeline(db)
 
-    # 3. Initialize Components
-    # Use DataProvider for Redundancy (GoAPI -> YFinance)
-    from core.data_provider import DataProvider
-    client = DataProvider()
-    
-    analyzer = TechnicalAnalyzer()
-    ai = AIEngine()
-    notifier = TelegramNotifier()
-
-    # 4. Process Loop
-    for ticker in target_stocks:
-        logger.info(f"--- Processing {ticker} ---")
-        
-        # A. Fetch/Update Data
-        # For MVP, we need history to calculate ema200. 
-        # In a real daily run, we'd have history in DB and just append today.
-        # Here we'll fetch full history to ensure we can run indicators.
-        logger.info("Fetching history...")
-        
-        # Calculate 1 year ago for seeding
-        from datetime import datetime, timedelta
-        # to_date needs to be tomorrow because yfinance 'end' is exclusive
-        to_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        from_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
-        
-        history = client.get_historical_data(ticker, from_date=from_date, to_date=to_date)
-        
-        if not history:
-            logger.warning(f"No history found for {ticker}. Skipping.")
-            continue
-            
-        # Save to DB (optional, but good practice)
-        db.upsert_candles(history)
-        
-        # Convert to DataFrame
-        import pandas as pd
-        data_dicts = [h.model_dump() for h in history]
-        df = pd.DataFrame(data_dicts)
-        if df.empty: 
-            continue
-            
-        # Ensure Types and Sort
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date').reset_index(drop=True)
-        
-        # B. Technical Analysis
-        logger.info("Running Technical Analysis...")
-        tech_result = analyzer.analyze(df)
-        
-        if not tech_result['valid']:
-            logger.info(f"Result: {tech_result['reason']}")
-            continue
-            
-        logger.info(f"[SIGNAL DETECTED] {tech_result['signals']}")
-        
-        # C. AI Validation
-        logger.info("Requesting AI Validation...")
-        ai_result = ai.analyze_signal(ticker, tech_result)
-        
-        logger.info(f"[AI VERDICT] {ai_result.get('valid')} - {ai_result.get('analysis')}")
-        
-        if ai_result.get('valid'):
-            trade_plan = ai_result.get('trade_plan', {})
-            logger.info(f"[TRADE PLAN] {trade_plan}")
-            
-            # D. Send Notification
-            logger.info("Sending Telegram Alert...")
-            notifier.send_alert(ticker, tech_result, trade_plan, ai_result.get('analysis', 'No analysis provided.'))
-            
-            # E. Log to CSV (PRD Requirement)
-            try:
-                import csv
-                import os
-                
-                csv_file = "signals.csv"
-                file_exists = os.path.isfile(csv_file)
-                
-                with open(csv_file, mode='a', newline='') as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(["date", "ticker", "close", "signal_type", "ai_valid", "entry", "sl", "tp"])
-                    
-                    writer.writerow([
-                        tech_result['date'],
-                        ticker,
-                        tech_result['close'],
-                        tech_result['signals'], # Might want to clean this up string-wise
-                        ai_result.get('valid'),
-                        trade_plan.get('entry'),
-                        trade_plan.get('stop_loss'),
-                        trade_plan.get('take_profit')
-                    ])
-                logger.info("Signal logged to signals.csv")
-            except Exception as e:
-                logger.error(f"Failed to log to CSV: {e}")
+    # 3. Run the staged pipeline (fetch -> analyze -> AI validate -> notify)
+    with metrics.timer("run_seconds", scan="universe" if SCAN_UNIVERSE else "watchlist"):
+        if SCAN_UNIVERSE:
+            # Whole IDX listing: chunked fetch + SQL prefilter, only survivors are analyzed
+            from core.universe import UniverseScanner
+            UniverseScanner(db, pipeline).run()
         else:
-            logger.info("AI Rejected the setup.")
+            target_stocks = WATCHLIST
+            logger.info(f"Processing stocks: {target_stocks}")
+            pipeline.run(target_stocks)
+        logger.info(f"Provider health: {pipeline.planner.client.health_report()}")
+        if pipeline.planner.client.goapi.cache is not None:
+            logger.info(f"HTTP cache: {pipeline.planner.client.goapi.cache.summary()}")
+
+        # Alerts are delivered in the background; give them a bounded time before exiting
+        pipeline.notifier.close(timeout=TELEGRAM_FLUSH_TIMEOUT)
+        db.close() # Commit writes still queued (outbox updates, cached verdicts)
+
+    # 4. Run report (METRICS_ENABLED): JSON + Prometheus textfile
+    try:
+        metrics.write_reports()
+    except OSError as e:
+        logger.error(f"Failed to write run metrics: {e}")
 
     logger.info("Batch Process Complete.")
 
@@ -0,0 +1,28 @@
+import argparse
+import logging
+import sys
+import time
+from config.settings import DB_PATH, PARQUET_DIR, PARQUET_PARTITION
+from database.db_manager import get_engine
+from database.parquet_store import ParquetCandleStore, migrate_from_sqlite
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Copy daily_candles from {DB_PATH} into the Parquet candle store.")
+    parser.add_argument("--dir", default=PARQUET_DIR, help="Parquet store root (default: PARQUET_DIR)")
+    parser.add_argument("--partition", default=PARQUET_PARTITION, choices=["year", "symbol"], help="Partitioning (default: PARQUET_PARTITION)")
+    parser.add_argument("--chunk", type=int, default=100, help="Symbols copied per chunk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    copied = migrate_from_sqlite(get_engine(), ParquetCandleStore(args.dir, args.partition), chunk_symbols=args.chunk)
+    print(f"Copied {copied} candles to {args.dir} in {time.perf_counter() - start:.1f}s")
+    print("Set CANDLE_BACKEND=parquet (and the same PARQUET_DIR / PARQUET_PARTITION) to use it.")
+
+if __name__ == "__main__":
+    main()
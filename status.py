@@ -0,0 +1,65 @@
+import argparse
+import csv
+import os
+import sqlite3
+from collections import deque
+from config.settings import get_settings
+
+# Quick read-only status: stdlib only (no pandas/SQLModel/requests), so it starts in tens of milliseconds.
+
+QUERIES = [
+    ("Candles", "SELECT COUNT(*) FROM daily_candles"),
+    ("Symbols", "SELECT COUNT(*) FROM indicator_state"),
+    ("Latest candle", "SELECT MAX(date) FROM daily_candles"),
+    ("Cached AI verdicts", "SELECT COUNT(*) FROM ai_verdicts"),
+    ("Telegram pending", "SELECT COUNT(*) FROM telegram_outbox WHERE sent_at IS NULL AND attempts < :max_attempts"),
+    ("Telegram failed", "SELECT COUNT(*) FROM telegram_outbox WHERE sent_at IS NULL AND attempts >= :max_attempts"),
+    ("Last intraday poll", "SELECT MAX(ts) FROM intraday_snapshots"),
+]
+
+def db_status(settings) -> list:
+    if not os.path.exists(settings.DB_PATH):
+        return [("Database", f"{settings.DB_PATH} (not created yet)")]
+    rows = [("Database", f"{settings.DB_PATH} ({os.path.getsize(settings.DB_PATH) / 1e6:.1f} MB)")]
+    conn = sqlite3.connect(f"file:{settings.DB_PATH}?mode=ro", uri=True)
+    try:
+        for label, query in QUERIES:
+            if settings.CANDLE_BACKEND != "sqlite" and "daily_candles" in query:
+                rows.append((label, f"see {settings.PARQUET_DIR} ({settings.CANDLE_BACKEND} backend)"))
+                continue
+            try:
+                value = conn.execute(query, {"max_attempts": settings.TELEGRAM_MAX_ATTEMPTS}).fetchone()[0]
+            except sqlite3.OperationalError: # Table not created by this version yet
+                value = None
+            rows.append((label, "-" if value is None else value))
+    finally:
+        conn.close()
+    return rows
+
+def last_signals(path: str, count: int) -> list:
+    if not os.path.isfile(path):
+        return []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return []
+        return [dict(zip(header, row)) for row in deque(reader, maxlen=count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Show database status and the latest logged signals.")
+    parser.add_argument("-n", "--signals", type=int, default=10, help="Number of recent signals to show (default: 10)")
+    args = parser.parse_args()
+    settings = get_settings()
+
+    for label, value in db_status(settings):
+        print(f"{label:<20} {value}")
+
+    signals = last_signals(settings.SIGNALS_CSV, args.signals)
+    print(f"\nLast {len(signals)} signal(s) from {settings.SIGNALS_CSV}:")
+    for signal in signals:
+        print(f"  {signal.get('date')}  {signal.get('ticker'):<6} close {signal.get('close')}  "
+              f"entry {signal.get('entry')}  sl {signal.get('sl')}  tp {signal.get('tp')}")
+
+if __name__ == "__main__":
+    main()